@@ -0,0 +1,575 @@
+"""
+Benchmarks for the hot paths of the settings sync.
+
+Usage:
+    python benchmarks.py locate [screenshot.png]
+    python benchmarks.py search [screenshot.png ...]
+    python benchmarks.py ocr [heroes]
+    python benchmarks.py preprocess
+    python benchmarks.py curve [points]
+    python benchmarks.py capture [seconds]
+    python benchmarks.py e2e <recordings_dir> [results.json] [runs]
+    python benchmarks.py simulate [WIDTHxHEIGHT] [results.json] [runs] [latency] [noise]
+
+When no screenshot is given, a synthetic 'Change Hero' page is composed from the hero card templates.
+The e2e benchmark replays a recordings directory (see replay.py) and the simulate benchmark drives the
+simulated client (see simulator.py), both run headless.
+The capture benchmark needs a display, on a headless Linux machine run it under Xvfb:
+
+    xvfb-run -s "-screen 0 2560x1440x24" python benchmarks.py capture
+"""
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from locator import HEROES_DIR, HeroLocator
+from runner import link_shared_files
+from utils import to_grayscale
+
+
+def compose_hero_grid(heroes_dir=HEROES_DIR, width=2560, height=1440):
+    """
+    Compose a synthetic 'Change Hero' page by tiling every hero card template onto a blank canvas.
+    The canvas grows beyond the given size if the templates do not fit.
+
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :param width: The minimum width of the canvas.
+    :type width: int
+    :param height: The minimum height of the canvas.
+    :type height: int
+    :return: The composed screenshot.
+    :rtype: PIL.Image
+    """
+    cards = [
+        Image.open(os.path.join(heroes_dir, filename)).convert("RGB")
+        for filename in sorted(os.listdir(heroes_dir))
+        if filename.endswith(".png")
+    ]
+    card_w = max(card.width for card in cards)
+    card_h = max(card.height for card in cards)
+    cols = max(1, width // card_w)
+    rows = -(-len(cards) // cols)
+
+    canvas = Image.new("RGB", (max(width, cols * card_w), max(height, rows * card_h)), (84, 98, 124))
+    for i, card in enumerate(cards):
+        canvas.paste(card, ((i % cols) * card_w, (i // cols) * card_h))
+    return canvas
+
+
+def timed(fn, repeat):
+    """
+    Run a function several times and return the best wall time alongside its last result.
+
+    :param fn: The function to run, taking no arguments.
+    :type fn: callable
+    :param repeat: The number of times to run the function.
+    :type repeat: int
+    :return: A tuple containing the best time in seconds and the last result.
+    :rtype: tuple
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_locate(screenshot_path=None, repeat=3):
+    """
+    Compare locating every hero card one template at a time against a single HeroLocator pass.
+    The one at a time search converts the screenshot for every template and searches all of it at full resolution,
+    like the pag.locate loop the locator replaced. Nothing is sent to the screen, so it runs headless.
+
+    :param screenshot_path: The path to a screenshot of the 'Change Hero' page. Defaults to a synthetic page.
+    :type screenshot_path: str
+    :param repeat: The number of runs to take the best time from.
+    :type repeat: int
+    :return: None
+    """
+    repeat = int(repeat)
+    screenshot = Image.open(screenshot_path).convert("RGB") if screenshot_path else compose_hero_grid()
+    filenames = [
+        os.path.join(HEROES_DIR, filename) for filename in sorted(os.listdir(HEROES_DIR)) if filename.endswith(".png")
+    ]
+
+    single = HeroLocator(coarse_factor=1)
+    single_time, _ = timed(
+        lambda: [single.match_template(to_grayscale(screenshot), single.get_template_key(path)) for path in filenames],
+        repeat,
+    )
+
+    # template loading is included so the comparison is like for like
+    locator_time, matches = timed(lambda: HeroLocator().locate_all(screenshot), repeat)
+    found = sum(1 for match in matches.values() if match and match["centre"])
+
+    print(f"screenshot: {screenshot.width}x{screenshot.height}, heroes: {len(filenames)}")
+    print(f"match_template loop:    {single_time * 1000:.1f} ms")
+    print(f"HeroLocator.locate_all: {locator_time * 1000:.1f} ms ({found} found)")
+    print(f"speedup: {single_time / locator_time:.1f}x")
+
+
+def bench_search(*screenshot_paths):
+    """
+    Compare the exhaustive full resolution search of the whole frame against the coarse-to-fine search
+    of the hero grid, checking every card is found in the same place with the same confidence threshold.
+
+    :param screenshot_paths: Paths to screenshots of the 'Change Hero' page. Defaults to a synthetic page,
+                             which is searched as a whole as its cards do not follow the game's layout.
+    :type screenshot_paths: str
+    :return: None
+    """
+    from layout import Layout
+
+    screenshots = [(path, Image.open(path)) for path in screenshot_paths] or [("synthetic", compose_hero_grid())]
+    for label, screenshot in screenshots:
+        roi = None
+        scale = 1.0
+        if screenshot_paths:
+            layout = Layout((screenshot.width, screenshot.height))
+            roi, scale = layout.area("hero_grid"), layout.template_scale
+
+        exhaustive = HeroLocator(scale=scale, coarse_factor=1)
+        coarse = HeroLocator(scale=scale, roi=roi)
+        exhaustive_time, expected = timed(lambda: exhaustive.locate_all(screenshot), 3)
+        coarse_time, matches = timed(lambda: coarse.locate_all(screenshot), 3)
+
+        # templates which do not fit in the region of interest are not searched for at all
+        not_searched = {"centre": None, "confidence": None}
+        expected = {path: match or not_searched for path, match in expected.items()}
+        matches = {path: match or not_searched for path, match in matches.items()}
+        mismatches = []
+        for path, match in expected.items():
+            found = matches[path]
+            if bool(match["centre"]) != bool(found["centre"]):
+                mismatches.append((os.path.basename(path), match["confidence"], found["confidence"]))
+            elif match["centre"] and np.hypot(*np.subtract(match["centre"], found["centre"])) > 2:
+                mismatches.append((os.path.basename(path), match["centre"], found["centre"]))
+
+        print(f"{label}: {screenshot.width}x{screenshot.height}, roi: {roi}")
+        print(f"  exhaustive:     {exhaustive_time * 1000:.1f} ms ({sum(1 for m in expected.values() if m['centre'])} found)")
+        print(f"  coarse-to-fine: {coarse_time * 1000:.1f} ms ({sum(1 for m in matches.values() if m['centre'])} found)")
+        print(f"  speedup: {exhaustive_time / coarse_time:.1f}x, mismatches: {mismatches or 'none'}")
+
+
+def render_text_crop(text, size, fill=0, background=255):
+    """
+    Render text onto a blank crop, standing in for a captured field of the hero panel.
+
+    :param text: The text to render.
+    :type text: str
+    :param size: The (width, height) of the crop.
+    :type size: tuple
+    :param fill: The text colour.
+    :type fill: int
+    :param background: The background colour.
+    :type background: int
+    :return: The rendered crop.
+    :rtype: PIL.Image
+    """
+    img = Image.new("L", size, background)
+    font = ImageFont.load_default(size=int(size[1] * 0.7))
+    ImageDraw.Draw(img).text((4, size[1] // 2), text, fill=fill, font=font, anchor="lm")
+    return img
+
+
+def bench_ocr(heroes=37):
+    """
+    Compare reading the sensitivity and name crops of every hero with one tesseract call per crop
+    against a stitched BatchOCR run, and against long-lived engines from an OCRWorkerPool when tesserocr is installed.
+
+    :param heroes: The number of heroes to simulate.
+    :type heroes: int
+    :return: None
+    """
+    import pytesseract
+
+    from ocr import BatchOCR, OCRWorkerPool
+    from utils import clean_string
+
+    heroes = int(heroes)
+    crops = []
+    for i in range(heroes):
+        crops.append(((i, "sensitivity"), render_text_crop(f"{1 + (i % 9)}.{i * 7 % 100:02d}", (100, 30)), "sensitivity"))
+        crops.append(((i, "name"), render_text_crop(f"HERO {chr(65 + i % 26)}", (315, 45), fill=255, background=40), "hero_name"))
+
+    start = time.perf_counter()
+    single = {key: clean_string(pytesseract.image_to_string(img)) for key, img, _ in crops}
+    single_time = time.perf_counter() - start
+    print(f"crops: {len(crops)}")
+    print(f"image_to_string per crop: {single_time * 1000:.0f} ms ({len(crops) / single_time:.1f} crops/s)")
+
+    pool = OCRWorkerPool()
+    runs = [("BatchOCR stitched", None)]
+    if pool.in_process:
+        runs.append(("BatchOCR worker pool", pool))
+
+    for label, run_pool in runs:
+        batch = BatchOCR(pool=run_pool)
+        for key, img, profile in crops:
+            batch.add(key, img, profile)
+        start = time.perf_counter()
+        batched = batch.run()
+        batch_time = time.perf_counter() - start
+
+        agree = sum(1 for key in single if single[key] == batched[key])
+        print(f"{label + ':':<25} {batch_time * 1000:.0f} ms ({len(crops) / batch_time:.1f} crops/s)")
+        print(f"{'':<25} speedup: {single_time / batch_time:.1f}x, matching output: {agree}/{len(crops)}")
+    pool.close()
+
+
+def legacy_preprocess(img):
+    """
+    The original three channel implementation of utils.preprocess, kept as a baseline.
+    """
+    img_np = np.array(img.convert("RGB"))
+    filtered_mask = np.zeros_like(img_np[:, :, 0], dtype=bool)
+    for color_code in [(255, 255, 255)]:
+        color_difference = np.sum(np.abs(img_np[:, :, :3] - np.array(color_code)), axis=2)
+        filtered_mask |= color_difference <= 60
+    filtered_mask_expanded = np.repeat(np.expand_dims(filtered_mask, axis=2), 3, axis=2)
+    filtered_image_np = np.where(filtered_mask_expanded, img_np, 0)
+    return Image.fromarray(cv2.threshold(filtered_image_np, 127, 255, cv2.THRESH_BINARY_INV)[1])
+
+
+def bench_preprocess():
+    """
+    Compare the original preprocess against the single channel rewrite, with and without reused buffers,
+    on the sensitivity and name crop sizes and a full screen frame.
+
+    :return: None
+    """
+    from utils import PreprocessBuffers, preprocess
+
+    rng = np.random.default_rng(0)
+    sizes = [("sensitivity crop", (100, 30), 2000), ("name crop", (315, 45), 1000), ("full screen", (2560, 1440), 10)]
+    for label, (width, height), runs in sizes:
+        frame = rng.integers(150, 256, (height, width, 3), dtype=np.uint8)
+        img = Image.fromarray(frame)
+        buffers = PreprocessBuffers()
+
+        same = np.array_equal(np.asarray(legacy_preprocess(img))[:, :, 0], np.asarray(preprocess(img)))
+        print(f"{label} {width}x{height} (same output: {same})")
+        for name, fn in [
+            ("legacy", lambda: legacy_preprocess(img)),
+            ("preprocess", lambda: preprocess(img)),
+            ("preprocess, buffers", lambda: preprocess(frame, buffers=buffers, as_array=True)),
+        ]:
+            best, _ = timed(lambda: [fn() for _ in range(runs)], 3)
+            print(f"  {name:<20} {best / runs * 1000:.3f} ms")
+
+
+def legacy_get_curve(start_pos, end_pos, num_points, get_resolution):
+    """
+    The original per point implementation of gen_curve.get_curve, kept as a baseline.
+    The screen resolution is looked up for every point, as it used to be.
+    """
+    def get_screen_xy(cart_x, cart_y):
+        width, height = get_resolution()
+        return (cart_x + (width / 2), -cart_y + (height / 2))
+
+    def get_cart_xy(screen_x, screen_y):
+        width, height = get_resolution()
+        return (screen_x - (width / 2), -(screen_y - (height / 2)))
+
+    def recta(x1, y1, x2, y2):
+        if x1 == x2:
+            x2 += 1
+        if y1 == y2:
+            y2 += 1
+        a = (y1 - y2) / (x1 - x2)
+        return (a, y1 - a * x1)
+
+    xa, ya = get_cart_xy(*start_pos)
+    xc, yc = get_cart_xy(*end_pos)
+    xb = random.randint(int(min(xa, xc)), int(max(xa, xc)))
+    yb = random.randint(int(min(ya, yc)), int(max(ya, yc)))
+
+    (x1, y1, x2, y2) = (xa, ya, xb, yb)
+    (a1, b1) = recta(xa, ya, xb, yb)
+    (a2, b2) = recta(xb, yb, xc, yc)
+    points = []
+    for i in range(0, num_points):
+        if x1 == x2:
+            continue
+        (a, b) = recta(x1, y1, x2, y2)
+        x = i * (x2 - x1) / num_points + x1
+        points.append(get_screen_xy(x, a * x + b))
+        x1 += (xb - xa) / num_points
+        y1 = a1 * x1 + b1
+        x2 += (xc - xb) / num_points
+        y2 = a2 * x2 + b2
+    return points
+
+
+def bench_curve(points=50, curves=2000):
+    """
+    Measure how many cursor curves per second the vectorised generator builds, against the original per point loop.
+
+    :param points: The number of points on each curve. 50 points is a cursor move of 2500 pixels.
+    :type points: int
+    :param curves: The number of curves to build.
+    :type curves: int
+    :return: None
+    """
+    from gen_curve import CURVE_STYLES, get_curve_array
+
+    points, curves = int(points), int(curves)
+    ends = [((random.randint(0, 2559), random.randint(0, 1439)), (random.randint(0, 2559), random.randint(0, 1439))) for _ in range(curves)]
+
+    # the original went through ctypes for every resolution lookup, a plain function is a generous stand-in
+    runs = [("legacy loop", lambda start, end: legacy_get_curve(start, end, points, lambda: (2560, 1440)))]
+    for style in CURVE_STYLES:
+        runs.append((f"vectorised {style}", lambda start, end, style=style: get_curve_array(start, end, points, style)))
+
+    print(f"{curves} curves of {points} points")
+    for label, fn in runs:
+        best, _ = timed(lambda: [fn(start, end) for start, end in ends], 3)
+        print(f"  {label:<20} {curves / best:,.0f} curves/s")
+
+
+def bench_capture(seconds=2.0):
+    """
+    Measure captures per second of every capture backend, for the whole screen and for the sensitivity
+    and name fields alone, against pyautogui's full screen capture cropped to each field.
+
+    :param seconds: Roughly how long to capture for with each backend and area.
+    :type seconds: float
+    :return: None
+    """
+    from capture import get_capture_backend, mss
+    from layout import Layout
+
+    layout = Layout()
+    areas = [("full screen", None), ("sensitivity", layout.area("sensitivity")), ("name", layout.area("hero_name"))]
+    backends = ["pyautogui"] + (["mss"] if mss is not None else [])
+    seconds = float(seconds)
+
+    def rate(fn):
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            fn()
+            count += 1
+        return count / (time.perf_counter() - start)
+
+    import pyautogui
+
+    print(f"{layout.resolution[0]}x{layout.resolution[1]}")
+    for label, area in areas:
+        print(label)
+        if area is not None:
+            left, top, width, height = area
+            full = rate(lambda: np.asarray(pyautogui.screenshot())[top:top + height, left:left + width])
+            print(f"  {'full then crop':<20} {full:,.1f} captures/s")
+        for name in backends:
+            backend = get_capture_backend(name)
+            print(f"  {name:<20} {rate(lambda: backend.grab(area)):,.1f} captures/s")
+            backend.close()
+
+
+class StageTimer:
+    def __init__(self):
+        """
+        Initialize a StageTimer object, which adds up the wall time spent in methods grouped into stages.
+        """
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def patch(self, stages):
+        """
+        Time methods for the duration of the context, by wrapping them on their classes.
+
+        :param stages: A list of (stage, class, method name) tuples.
+        :type stages: list
+        :return: None
+        """
+        originals = []
+        for stage, owner, name in stages:
+            original = getattr(owner, name)
+            originals.append((owner, name, original))
+
+            def timed_method(*args, original=original, stage=stage, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+            setattr(owner, name, timed_method)
+        try:
+            yield
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+
+@contextlib.contextmanager
+def isolated_workdir():
+    """
+    Run in a temporary directory holding only the hero card templates and the prebuilt bundle and glyph set,
+    so every run starts with empty caches and never touches the real ones.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        link_shared_files(workdir)
+        os.chdir(workdir)
+        try:
+            yield workdir
+        finally:
+            os.chdir(cwd)
+
+
+def get_commit():
+    """
+    Get the current git commit, so results can be compared between commits.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_e2e(screen, source, results_path, runs):
+    """
+    Run whole captures and applies against a stand-in for the screen, with pyautogui replaced by a
+    recording input backend which keeps the pauses of the turbo profile. Wall time is reported per stage
+    and per hero, and saved as JSON alongside the commit. The first run starts with empty caches.
+    When the screen can check settings, as the simulator can, every run also reports the heroes it got wrong.
+
+    :param screen: The stand-in for the screen, such as a replay.ReplayScreen.
+    :type screen: ReplayScreen
+    :param source: What the screen is, saved with the results.
+    :type source: dict
+    :param results_path: The path to save the results to.
+    :type results_path: str
+    :param runs: The number of capture and apply runs.
+    :type runs: int
+    :return: None
+    """
+    import main
+    from input_backend import RecordingBackend
+    from locator import HeroLocator
+    from ocr import BatchOCR
+
+    stages = [
+        ("navigate", main.HeroManager, "get_all_heroes_screenshot"),
+        ("locate", HeroLocator, "locate_all"),
+        ("ocr", BatchOCR, "run"),
+        ("ocr", main.ScreenController, "get_text_from_position"),
+        ("ocr", main.HeroManager, "read_panel"),
+        ("typing", main.HeroManager, "enter_sensitivity"),
+    ]
+    results = {
+        "commit": get_commit(),
+        **source,
+        "resolution": list(screen.layout.resolution),
+        "heroes": len(screen.cards),
+        "runs": [],
+    }
+    check = getattr(screen, "check", None)
+
+    with isolated_workdir():
+        for run in range(int(runs)):
+            for direction in ("get", "set"):
+                screen.reset()
+                backend = RecordingBackend("turbo", screen=screen, realtime=True)
+                timer = StageTimer()
+                start = time.perf_counter()
+                with timer.patch(stages):
+                    if direction == "get":
+                        data = main.get_sensitivity_data(False, layout=screen.layout, backend=backend, capture=screen)
+                    else:
+                        data = [{"id": hero_id, "sensitivity": "4.20"} for hero_id in screen.cards]
+                        main.set_sensitivity_data(data, False, layout=screen.layout, backend=backend, capture=screen)
+                wall = time.perf_counter() - start
+
+                stage_times = {stage: round(seconds, 4) for stage, seconds in timer.stages.items()}
+                stage_times["other"] = round(max(0.0, wall - sum(timer.stages.values())), 4)
+                results["runs"].append({
+                    "run": run,
+                    "direction": direction,
+                    "wall": round(wall, 4),
+                    "input": backend.get_report(wall),
+                    "stages": stage_times,
+                    "per_hero": {hero_id: round(seconds, 4) for hero_id, seconds in screen.get_hero_times().items()},
+                })
+                if check:
+                    results["runs"][-1]["mismatches"] = check(data)
+                print(f"run {run} {direction}: {wall:.2f} s, " + ", ".join(f"{k} {v:.2f} s" for k, v in stage_times.items()))
+
+    with open(results_path, "w") as fn:
+        json.dump(results, fn, indent=1)
+    print("results saved to", results_path)
+
+
+def bench_e2e(recordings_dir, results_path="e2e_results.json", runs=2):
+    """
+    Run the end to end benchmark against a replay of recorded screenshots, see run_e2e.
+    Recorded panels never show the typed value, so every apply also times the slow entry fallback.
+
+    :param recordings_dir: The recordings directory, see replay.py.
+    :type recordings_dir: str
+    :param results_path: The path to save the results to.
+    :type results_path: str
+    :param runs: The number of capture and apply runs.
+    :type runs: int
+    :return: None
+    """
+    from replay import ReplayScreen
+
+    screen = ReplayScreen.from_dir(recordings_dir)
+    run_e2e(screen, {"recordings": os.path.abspath(recordings_dir)}, results_path, runs)
+
+
+def bench_simulate(resolution="2560x1440", results_path="e2e_results.json", runs=2, latency=0.0, noise=0.0):
+    """
+    Run the end to end benchmark against the simulated client, see run_e2e and simulator.py.
+
+    :param resolution: The resolution of the simulated screen, as WIDTHxHEIGHT.
+    :type resolution: str
+    :param results_path: The path to save the results to.
+    :type results_path: str
+    :param runs: The number of capture and apply runs.
+    :type runs: int
+    :param latency: How long the simulated screen takes to redraw in seconds.
+    :type latency: float
+    :param noise: The standard deviation of the noise added to every grab, in grey levels.
+    :type noise: float
+    :return: None
+    """
+    from simulator import SimulatedClient
+
+    width, height = (int(v) for v in resolution.split("x"))
+    screen = SimulatedClient((width, height), latency=float(latency), noise=float(noise), seed=0)
+    source = {"simulator": {"latency": float(latency), "noise": float(noise)}}
+    run_e2e(screen, source, results_path, runs)
+
+
+BENCHMARKS = {
+    "locate": bench_locate,
+    "search": bench_search,
+    "ocr": bench_ocr,
+    "preprocess": bench_preprocess,
+    "curve": bench_curve,
+    "capture": bench_capture,
+    "e2e": bench_e2e,
+    "simulate": bench_simulate,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    import mss
+except ImportError:
+    # mss is optional, without it screenshots are taken with pyautogui
+    mss = None
+
+
+def crop(frame, area):
+    """
+    Get an area of a frame as a view, without copying any pixels.
+
+    :param frame: The frame, as returned by a capture backend.
+    :type frame: numpy.ndarray
+    :param area: The area in the format (left, top, width, height).
+    :type area: tuple
+    :return: A view of the area.
+    :rtype: numpy.ndarray
+    """
+    left, top, width, height = area
+    return frame[top:top + height, left:left + width]
+
+
+class CaptureBackend:
+    """Takes screenshots as RGB NumPy arrays of shape (height, width, 3)."""
+
+    name = None
+
+    def grab(self, area=None):
+        """
+        Capture the screen, or only an area of it.
+
+        :param area: The area in the format (left, top, width, height). Defaults to the whole screen.
+        :type area: tuple
+        :return: The capture in RGB.
+        :rtype: numpy.ndarray
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MSSCapture(CaptureBackend):
+    name = "mss"
+
+    def __init__(self):
+        """
+        Initialize an MSSCapture object, which grabs only the requested area straight from the display
+        (GDI on Windows, XGetImage/XShm on Linux) instead of capturing the whole screen and cropping it.
+        A grabber is kept per thread, as they cannot be shared between threads.
+        """
+        if mss is None:
+            raise RuntimeError("mss is not installed")
+        self.local = threading.local()
+        self.grabbers = []
+
+    def get_grabber(self):
+        """
+        Get the grabber of the current thread, creating it on first use.
+        """
+        grabber = getattr(self.local, "grabber", None)
+        if grabber is None:
+            grabber = self.local.grabber = mss.mss()
+            self.grabbers.append(grabber)
+        return grabber
+
+    def grab(self, area=None):
+        grabber = self.get_grabber()
+        if area is None:
+            # the first monitor is the union of every screen, the second is the primary one
+            monitor = grabber.monitors[1]
+        else:
+            left, top, width, height = area
+            monitor = {"left": int(left), "top": int(top), "width": int(width), "height": int(height)}
+        shot = grabber.grab(monitor)
+        # the raw BGRA pixels are viewed in place and converted in a single pass
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB)
+
+    def close(self):
+        for grabber in self.grabbers:
+            grabber.close()
+        self.grabbers = []
+
+
+class PyAutoGUICapture(CaptureBackend):
+    name = "pyautogui"
+
+    def __init__(self):
+        """
+        Initialize a PyAutoGUICapture object, the fallback when mss is not installed.
+        """
+        # imported here so the rest of the script can be used without a display
+        import pyautogui
+
+        self.pag = pyautogui
+
+    def grab(self, area=None):
+        if area is not None:
+            area = tuple(int(v) for v in area)
+        return np.asarray(self.pag.screenshot(region=area).convert("RGB"))
+
+
+class ReplayCapture(CaptureBackend):
+    name = "replay"
+
+    def __init__(self, frames):
+        """
+        Initialize a ReplayCapture object, which serves areas of recorded frames instead of the screen.
+        Every grab reads the current frame, call advance to move on to the next one.
+
+        :param frames: The recorded frames, as image paths, PIL images or RGB arrays.
+        :type frames: list
+        :return: None
+        """
+        self.frames = [self.load_frame(frame) for frame in frames]
+        if not self.frames:
+            raise ValueError("a replay needs at least one frame")
+        self.index = 0
+
+    @classmethod
+    def from_dir(cls, frames_dir):
+        """
+        Create a replay of every png in a directory, in order of their filenames.
+
+        :param frames_dir: The directory of recorded frames.
+        :type frames_dir: str
+        :return: The replay.
+        :rtype: ReplayCapture
+        """
+        names = sorted(name for name in os.listdir(frames_dir) if name.endswith(".png"))
+        return cls([os.path.join(frames_dir, name) for name in names])
+
+    @staticmethod
+    def load_frame(frame):
+        if isinstance(frame, str):
+            frame = Image.open(frame)
+        if not isinstance(frame, np.ndarray):
+            frame = np.asarray(frame.convert("RGB"))
+        return frame[:, :, :3]
+
+    def advance(self):
+        """
+        Move on to the next frame, staying on the last one once the replay has finished.
+
+        :return: True if there was a next frame.
+        :rtype: bool
+        """
+        if self.index + 1 >= len(self.frames):
+            return False
+        self.index += 1
+        return True
+
+    def grab(self, area=None):
+        frame = self.frames[self.index]
+        if area is None:
+            return frame
+        return crop(frame, area)
+
+
+def get_capture_backend(name=None):
+    """
+    Create a capture backend by name, defaulting to the fastest one available.
+
+    :param name: "mss" or "pyautogui". Defaults to mss when it is installed.
+    :type name: str
+    :return: The capture backend.
+    :rtype: CaptureBackend
+    """
+    if name is None:
+        name = "mss" if mss is not None else "pyautogui"
+    if name == "mss":
+        return MSSCapture()
+    if name == "pyautogui":
+        return PyAutoGUICapture()
+    raise ValueError(f"unknown capture backend {name}, expected 'mss' or 'pyautogui'")
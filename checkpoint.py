@@ -0,0 +1,142 @@
+import json
+import os
+import re
+import tempfile
+import threading
+
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+
+
+def get_checkpoint_path(filename, direction, target=None):
+    """
+    Get the path of the checkpoint kept alongside a settings file while it is captured or applied.
+
+    Args:
+        filename (str): The path of the settings file.
+        direction (str): "get" for a capture or "set" for an apply, which are checkpointed separately.
+        target (str): The account or session the run is against, such as the name of a runner job.
+                      Runs against different targets from the same settings file keep separate checkpoints.
+
+    Returns:
+        str: The path of the checkpoint.
+    """
+    if target is None:
+        return f"{filename}.{direction}{CHECKPOINT_SUFFIX}"
+    target = re.sub(r"[^\w.-]+", "_", str(target))
+    return f"{filename}.{direction}.{target}{CHECKPOINT_SUFFIX}"
+
+
+def write_json_atomic(path, data):
+    """
+    Write JSON to a file in one step. It is written to a temporary file next to it first and renamed over it,
+    so the file is never left half written. Every write gets its own temporary file, so runs writing the same
+    file at once never write into each other's.
+
+    Args:
+        path (str): The path of the file.
+        data: The data to write.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f"{filename}.", suffix=".tmp", delete=False) as fn:
+        try:
+            json.dump(data, fn)
+            fn.flush()
+            os.fsync(fn.fileno())
+        except BaseException:
+            fn.close()
+            os.remove(fn.name)
+            raise
+    os.replace(fn.name, path)
+
+
+class Checkpoint:
+    def __init__(self, path, target=None):
+        """
+        Initialize a Checkpoint object, an append-only JSON lines file holding a settings record for every hero
+        done so far. Each record is on disk as soon as it is added, so a run that is killed can resume from it.
+        The first line names the target it belongs to.
+        Records already in the file are loaded, and a record cut short by a crash is dropped.
+
+        :param path: The path of the checkpoint, see get_checkpoint_path.
+        :type path: str
+        :param target: The account or session the checkpoint belongs to.
+        :type target: str
+        :raises ValueError: If the checkpoint in the file belongs to a different target.
+        :return: None
+        """
+        self.path = path
+        self.target = target
+        self.lock = threading.Lock()
+        self.records = {}
+        self.load()
+
+    def load(self):
+        """
+        Read the records in the checkpoint, truncating anything after the last complete line.
+        Later records of a hero replace earlier ones.
+
+        :raises ValueError: If the checkpoint belongs to a different target.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as fn:
+            content = fn.read()
+            end = content.rfind(b"\n") + 1
+            records = []
+            for line in content[:end].splitlines():
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+            # the first line names the target, checkpoints without one were made without a target
+            target = records[0].get("target") if records and "id" not in records[0] else None
+            if records and target != self.target:
+                raise ValueError(f"{self.path} is the checkpoint of {target!r}, not {self.target!r}")
+            if end < len(content):
+                # new records must start on a fresh line
+                fn.truncate(end)
+        for record in records:
+            if "id" in record:
+                self.records[record["id"]] = record
+
+    def __contains__(self, hero_id):
+        return hero_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        """
+        Append the record of a hero and sync it to disk, starting the file with its target.
+
+        :param record: The settings record, with at least an "id".
+        :type record: dict
+        :return: None
+        """
+        with self.lock:
+            with open(self.path, "a") as fn:
+                if fn.tell() == 0:
+                    fn.write(json.dumps({"target": self.target}) + "\n")
+                fn.write(json.dumps(record) + "\n")
+                fn.flush()
+                os.fsync(fn.fileno())
+            self.records[record["id"]] = record
+
+    def get_records(self):
+        """
+        Get every record in the checkpoint, in the order the heroes were first added.
+
+        :return: A list of settings records.
+        :rtype: list
+        """
+        with self.lock:
+            return list(self.records.values())
+
+    def remove(self):
+        """
+        Delete the checkpoint, once the run it belongs to has finished.
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.records = {}
@@ -0,0 +1,127 @@
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from locator import HeroLocator
+
+# the locator and the shared frame of each worker process, set up once by init_worker
+worker_locator = None
+worker_frames = {}
+
+
+def init_worker(locator_kwargs):
+    """
+    Set up a worker process, loading the hero card templates once for the whole session.
+    """
+    global worker_locator
+    worker_locator = HeroLocator(**locator_kwargs)
+
+
+def attach_frame(descriptor):
+    """
+    View the frame published by the session in shared memory, without copying it.
+    Only the latest block is kept attached, older blocks are released. The block is reused for frames of
+    different sizes, so the view is keyed by the whole descriptor rather than the name of the block.
+
+    :param descriptor: The (name, shape, dtype) of the shared frame.
+    :type descriptor: tuple
+    :return: The frame.
+    :rtype: numpy.ndarray
+    """
+    name, shape, dtype = descriptor
+    descriptor = (name, tuple(shape), dtype)
+    if name not in worker_frames:
+        for block, _, _ in worker_frames.values():
+            block.close()
+        worker_frames.clear()
+        worker_frames[name] = (shared_memory.SharedMemory(name=name), None, None)
+    block, attached, frame = worker_frames[name]
+    if attached != descriptor:
+        frame = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        worker_frames[name] = (block, descriptor, frame)
+    return frame
+
+
+def match_in_worker(descriptor, keys):
+    """
+    Match hero card templates in the shared grayscale frame.
+
+    :return: A dictionary mapping each template key to its match, see HeroLocator.match_all.
+    :rtype: dict
+    """
+    return worker_locator.match_all(attach_frame(descriptor), keys)
+
+
+class FramePool:
+    def __init__(self, locator_kwargs=None, workers=None):
+        """
+        Initialize a FramePool object, a pool of worker processes started once per session for CPU bound frame work.
+        Frames are published in shared memory, which the workers read without copying,
+        and only small results such as coordinates and scores are sent back.
+
+        :param locator_kwargs: The arguments of the HeroLocator each worker matches templates with.
+                               The cache is left out, as matches are cached by the session.
+        :type locator_kwargs: dict
+        :param workers: The number of worker processes. Defaults to the number of cores.
+        :type workers: int
+        :return: None
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_worker, initargs=(locator_kwargs or {},)
+        )
+        self.block = None
+        self.descriptor = None
+
+    def publish(self, frame):
+        """
+        Copy a frame into shared memory, reusing the block while frames fit in it.
+
+        :param frame: The frame.
+        :type frame: numpy.ndarray
+        :return: The (name, shape, dtype) descriptor workers attach to the frame with.
+        :rtype: tuple
+        """
+        if self.block is None or self.block.size < frame.nbytes:
+            self.release()
+            self.block = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        shared = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.block.buf)
+        shared[...] = frame
+        self.descriptor = (self.block.name, frame.shape, frame.dtype.str)
+        return self.descriptor
+
+    def match_all(self, haystack, keys):
+        """
+        Match hero card templates in a grayscale screenshot, split across the workers.
+
+        :param haystack: The grayscale screenshot.
+        :type haystack: numpy.ndarray
+        :param keys: The template keys of the hero cards to search for.
+        :type keys: list
+        :return: A dictionary mapping each key to its match.
+        :rtype: dict
+        """
+        descriptor = self.publish(haystack)
+        chunks = [keys[i::self.workers] for i in range(self.workers) if keys[i::self.workers]]
+        located = {}
+        for result in self.executor.map(match_in_worker, [descriptor] * len(chunks), chunks):
+            located.update(result)
+        return located
+
+    def release(self):
+        """
+        Free the shared memory block.
+        """
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory.
+        """
+        self.executor.shutdown()
+        self.release()
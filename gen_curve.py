@@ -1,76 +1,115 @@
-import ctypes
-import matplotlib.pyplot as plt
-import random
-
-
-def get_monitor_resolution():
-    user32 = ctypes.windll.user32
-    return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
-
-
-def get_screen_xy(cart_x, cart_y):
-    width, height = get_monitor_resolution()
-    screen_x = cart_x + (width / 2)
-    screen_y = -cart_y + (height / 2)
-    return (screen_x, screen_y)
-
-
-def get_cart_xy(screen_x, screen_y):
+import numpy as np
+
+from utils import get_monitor_resolution
+
+CURVE_STYLES = ("lines", "bezier")
+# points per pixel travelled, the same as one point every 50 pixels
+CURVE_DENSITY = 1 / 50
+RNG = np.random.default_rng()
+
+
+def get_num_points(start_pos, end_pos, density=CURVE_DENSITY):
+    """
+    Get the number of points for a curve between two positions.
+
+    :param start_pos: The (x, y) position the curve starts at.
+    :type start_pos: tuple
+    :param end_pos: The (x, y) position the curve ends at.
+    :type end_pos: tuple
+    :param density: The number of points per pixel of straight line distance.
+    :type density: float
+    :return: The number of points.
+    :rtype: int
+    """
+    return int(np.hypot(end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]) * density)
+
+
+def get_control_point(start, end, rng):
+    """
+    Pick a random control point within the box spanned by two points.
+    """
+    return start + rng.random(2) * (end - start)
+
+
+def get_curve_array(start_pos, end_pos, num_points=None, style="lines", density=CURVE_DENSITY, rng=None):
+    """
+    Build a whole cursor trajectory between two screen positions as a NumPy array.
+
+    The "lines" style is the original curve: a point travels along the line from the start to a random
+    control point while another travels from the control point to the end, and the curve follows the
+    line between them. This is a quadratic Bezier curve, so it is evaluated for every point at once.
+    The "bezier" style is a cubic Bezier curve with two random control points, which can bend both ways.
+
+    :param start_pos: The (x, y) screen position the curve starts at.
+    :type start_pos: tuple
+    :param end_pos: The (x, y) screen position the curve ends at.
+    :type end_pos: tuple
+    :param num_points: The number of points on the curve. Defaults to the distance multiplied by the density.
+    :type num_points: int
+    :param style: The style of the curve, one of CURVE_STYLES.
+    :type style: str
+    :param density: The number of points per pixel of distance, used when num_points is not given.
+    :type density: float
+    :param rng: The random generator used to pick control points. Defaults to a shared generator.
+    :type rng: numpy.random.Generator
+    :return: An array of shape (num_points, 2) of screen positions, excluding the end position.
+    :rtype: numpy.ndarray
+    """
+    if style not in CURVE_STYLES:
+        raise ValueError(f"unknown curve style {style}, expected one of {CURVE_STYLES}")
+    if num_points is None:
+        num_points = get_num_points(start_pos, end_pos, density)
+    if rng is None:
+        rng = RNG
+
+    start = np.asarray(start_pos, dtype=np.float64)
+    end = np.asarray(end_pos, dtype=np.float64)
+    t = (np.arange(num_points, dtype=np.float64) / max(num_points, 1))[:, None]
+
+    if style == "lines":
+        control = get_control_point(start, end, rng)
+        curve = (1 - t) ** 2 * start + 2 * t * (1 - t) * control + t ** 2 * end
+    else:
+        control1 = get_control_point(start, end, rng)
+        control2 = get_control_point(start, end, rng)
+        curve = (
+            (1 - t) ** 3 * start
+            + 3 * t * (1 - t) ** 2 * control1
+            + 3 * t ** 2 * (1 - t) * control2
+            + t ** 3 * end
+        )
+
+    # keep the cursor on screen, the resolution is only looked up once per session
     width, height = get_monitor_resolution()
-    cart_x = screen_x - (width / 2)
-    cart_y = -(screen_y - (height / 2))
-    return (cart_x, cart_y)
+    return np.clip(curve, 0, (width - 1, height - 1), out=curve)
 
 
-def recta(x1, y1, x2, y2):
-    if x1 == x2:
-        x2 += 1
-    if y1 == y2:
-        y2 += 1
+def get_curve(start_pos, end_pos, num_points, style="lines"):
+    """
+    Build a cursor trajectory between two screen positions as a list of points.
 
-    a = (y1 - y2) / (x1 - x2)
-    b = y1 - a * x1
-    return (a, b)
-
-
-def get_curve(start_pos, end_pos, num_points):
-    xa, ya = get_cart_xy(*start_pos)
-    xc, yc = get_cart_xy(*end_pos)
-
-    if xa < xc:
-        xb = random.randint(xa, xc)
-    else:
-        xb = random.randint(xc, xa)
-
-    if ya < yc:
-        yb = random.randint(ya, yc)
-    else:
-        yb = random.randint(yc, ya)
-
-    (x1, y1, x2, y2) = (xa, ya, xb, yb)
-    (a1, b1) = recta(xa, ya, xb, yb)
-    (a2, b2) = recta(xb, yb, xc, yc)
-    points = []
-
-    for i in range(0, num_points):
-        if x1 == x2:
-            continue
-        else:
-            (a, b) = recta(x1, y1, x2, y2)
-        x = i * (x2 - x1) / num_points + x1
-        y = a * x + b
-        points.append(get_screen_xy(x, y))
-        x1 += (xb - xa) / num_points
-        y1 = a1 * x1 + b1
-        x2 += (xc - xb) / num_points
-        y2 = a2 * x2 + b2
-    return points
+    :param start_pos: The (x, y) screen position the curve starts at.
+    :type start_pos: tuple
+    :param end_pos: The (x, y) screen position the curve ends at.
+    :type end_pos: tuple
+    :param num_points: The number of points on the curve.
+    :type num_points: int
+    :param style: The style of the curve, one of CURVE_STYLES.
+    :type style: str
+    :return: A list of (x, y) screen positions.
+    :rtype: list
+    """
+    return [tuple(point) for point in get_curve_array(start_pos, end_pos, num_points, style).tolist()]
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     start = (100, 100)
     end = (200, 200)
 
-    curve = get_curve(start, end, 1000)
-    plt.plot(curve)
+    for style in CURVE_STYLES:
+        curve = get_curve_array(start, end, 1000, style)
+        plt.plot(curve[:, 0], curve[:, 1], label=style)
+    plt.legend()
     plt.show()
@@ -0,0 +1,226 @@
+"""
+Fast recognition of the sensitivity field by matching each character against a small stored glyph set.
+
+Usage:
+    python glyphs.py harvest <crops_dir> [glyphs.npz]
+
+Harvesting reads captured crops of the sensitivity field, named after the value they show
+(e.g. "3.45.png" or "3.45_cassidy.png"), and averages the glyph of every character into a template.
+No glyph set is shipped, the recognizer is skipped until one has been harvested.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils import get_sensitivity_value, preprocess, to_grayscale
+
+GLYPH_PATH = "glyphs.npz"
+GLYPH_SIZE = (16, 24)
+# a character is trusted when its best template correlates with it at least GLYPH_CONFIDENCE
+# and beats the second best template by at least GLYPH_MARGIN
+GLYPH_CONFIDENCE = 0.8
+GLYPH_MARGIN = 0.1
+MIN_COMPONENT_AREA = 2
+
+
+def get_ink_mask(img):
+    """
+    Get the text pixels of a crop which has been binarized by utils.preprocess (dark text on a white background).
+
+    :param img: The binarized crop.
+    :type img: PIL.Image or numpy.ndarray
+    :return: A 2D uint8 array which is 1 where there is text.
+    :rtype: numpy.ndarray
+    """
+    return (to_grayscale(img) < 128).astype(np.uint8)
+
+
+def segment_glyphs(img):
+    """
+    Split a binarized crop into its characters using connected components, ordered from left to right.
+    Each character is normalised into a fixed size cell relative to the height of the whole line,
+    so small characters such as '.' keep their size and position.
+
+    :param img: The binarized crop.
+    :type img: PIL.Image or numpy.ndarray
+    :return: An array of shape (characters, height, width) with values between 0 and 1.
+    :rtype: numpy.ndarray
+    """
+    mask = get_ink_mask(img)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    # the first component is the background
+    components = sorted(
+        (stats[i, :4] for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= MIN_COMPONENT_AREA),
+        key=lambda box: box[0],
+    )
+    if not components:
+        return np.zeros((0, GLYPH_SIZE[1], GLYPH_SIZE[0]), dtype=np.float32)
+
+    # strokes broken apart by the binarization overlap horizontally, so they are merged back into one character
+    boxes = []
+    for left, top, width, height in components:
+        if boxes and left < boxes[-1][0] + boxes[-1][2]:
+            prev_left, prev_top, prev_width, prev_height = boxes[-1]
+            right = max(prev_left + prev_width, left + width)
+            bottom = max(prev_top + prev_height, top + height)
+            new_top = min(prev_top, top)
+            boxes[-1] = (prev_left, new_top, right - prev_left, bottom - new_top)
+        else:
+            boxes.append((left, top, width, height))
+
+    line_top = min(top for _, top, _, _ in boxes)
+    line_bottom = max(top + height for _, top, _, height in boxes)
+    scale = GLYPH_SIZE[1] / max(1, line_bottom - line_top)
+
+    cells = np.zeros((len(boxes), GLYPH_SIZE[1], GLYPH_SIZE[0]), dtype=np.float32)
+    for cell, (left, top, width, height) in zip(cells, boxes):
+        glyph = mask[top:top + height, left:left + width].astype(np.float32)
+        glyph_w = min(GLYPH_SIZE[0], max(1, round(width * scale)))
+        glyph_h = min(GLYPH_SIZE[1], max(1, round(height * scale)))
+        glyph = cv2.resize(glyph, (glyph_w, glyph_h), interpolation=cv2.INTER_AREA)
+
+        y = min(GLYPH_SIZE[1] - glyph_h, round((top - line_top) * scale))
+        x = (GLYPH_SIZE[0] - glyph_w) // 2
+        cell[y:y + glyph_h, x:x + glyph_w] = glyph
+    return cells
+
+
+def normalise_cells(cells):
+    """
+    Centre each flattened cell on its mean and scale it to unit length, so the dot product of two cells
+    is their normalised correlation.
+
+    :param cells: An array of shape (cells, pixels).
+    :type cells: numpy.ndarray
+    :return: The normalised cells, as float32.
+    :rtype: numpy.ndarray
+    """
+    cells = cells.astype(np.float32) - cells.mean(axis=1, keepdims=True, dtype=np.float32)
+    norms = np.linalg.norm(cells, axis=1, keepdims=True)
+    # blank cells stay zero rather than dividing by zero
+    return cells / np.maximum(norms, 1e-6)
+
+
+class GlyphRecognizer:
+    def __init__(self, path=GLYPH_PATH, confidence=GLYPH_CONFIDENCE, margin=GLYPH_MARGIN):
+        """
+        Initialize a GlyphRecognizer object, loading the stored glyph set if it has been harvested.
+
+        :param path: The path of the glyph set written by harvest_glyphs.
+        :type path: str
+        :param confidence: The lowest correlation with its best template at which a character is trusted.
+        :type confidence: float
+        :param margin: The smallest lead of the best template over the second best at which a character is trusted.
+        :type margin: float
+        :return: None
+        """
+        self.confidence = confidence
+        self.margin = margin
+        self.chars = []
+        self.templates = None
+        if os.path.exists(path):
+            glyph_set = np.load(path)
+            self.chars = [str(char) for char in glyph_set["chars"]]
+            self.templates = normalise_cells(glyph_set["templates"].reshape(len(self.chars), -1))
+
+    @property
+    def available(self):
+        """
+        Whether a glyph set has been loaded.
+        """
+        return self.templates is not None
+
+    def recognise(self, img):
+        """
+        Read the value of a binarized sensitivity crop.
+        Every character is compared against every glyph template in a single vectorised operation.
+
+        :param img: The binarized crop, as returned by utils.preprocess.
+        :type img: PIL.Image or numpy.ndarray
+        :return: A tuple containing the recognised text, its confidence and its margin.
+                 The confidence is the lowest correlation of a character with its best template, between -1 and 1,
+                 and the margin is the smallest lead of a best template over the second best.
+        :rtype: tuple
+        """
+        if not self.available:
+            return "", 0.0, 0.0
+
+        cells = normalise_cells(segment_glyphs(img).reshape(-1, self.templates.shape[1]))
+        if not len(cells):
+            return "", 0.0, 0.0
+
+        # the correlation of each character with each template, shape (characters, templates).
+        # background pixels are the same in every glyph, so unlike a pixel distance only the ink tells them apart
+        scores = cells @ self.templates.T
+        ranked = np.sort(scores, axis=1)
+        best = scores.argmax(axis=1)
+        confidence = float(ranked[:, -1].min())
+        margin = float((ranked[:, -1] - ranked[:, -2]).min()) if scores.shape[1] > 1 else confidence
+
+        text = "".join(self.chars[i] for i in best)
+        return text, confidence, margin
+
+    def read(self, img):
+        """
+        Read the value of a binarized sensitivity crop, only if the recognition is confident.
+
+        :param img: The binarized crop, as returned by utils.preprocess.
+        :type img: PIL.Image or numpy.ndarray
+        :return: The recognised text, or None if the glyph set is missing, the recognition is not confident
+                 or the text is not a sensitivity.
+        :rtype: str
+        """
+        text, confidence, margin = self.recognise(img)
+        if confidence < self.confidence or margin < self.margin or get_sensitivity_value(text) is None:
+            return None
+        return text
+
+
+def harvest_glyphs(crops_dir, path=GLYPH_PATH):
+    """
+    Build a glyph set from captured crops of the sensitivity field, labelled by their filename.
+    Crops whose number of characters does not match their label are skipped.
+
+    :param crops_dir: The directory of raw captured crops, named after the value they show.
+    :type crops_dir: str
+    :param path: The path to write the glyph set to.
+    :type path: str
+    :return: A dictionary mapping each harvested character to the number of samples averaged into it.
+    :rtype: dict
+    :raises ValueError: If none of the crops could be harvested.
+    """
+    samples = {}
+    for filename in sorted(os.listdir(crops_dir)):
+        if not filename.endswith(".png"):
+            continue
+        label = os.path.splitext(filename)[0].split("_")[0]
+        cells = segment_glyphs(preprocess(Image.open(os.path.join(crops_dir, filename))))
+        if len(cells) != len(label):
+            print("Skipping", filename, f"found {len(cells)} characters, expected {len(label)}")
+            continue
+        for char, cell in zip(label, cells):
+            samples.setdefault(char, []).append(cell)
+
+    if not samples:
+        raise ValueError(f"no crops in {crops_dir} could be harvested, expected crops named after the value they show")
+    chars = sorted(samples)
+    templates = np.stack([np.mean(samples[char], axis=0) for char in chars]).astype(np.float32)
+    np.savez(path, chars=np.array(chars), templates=templates)
+
+    return {char: len(samples[char]) for char in chars}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "harvest":
+        print(__doc__)
+        sys.exit(1)
+    try:
+        counts = harvest_glyphs(sys.argv[2], *sys.argv[3:4])
+    except ValueError as e:
+        print("BAD!", e)
+        sys.exit(1)
+    print("Harvested", ", ".join(f"'{char}': {count}" for char, count in counts.items()))
@@ -19,6 +19,8 @@ class SensitivitySettingsApp(tk.Tk):
         super().__init__()
         self.title("Sensitivity Settings App")
         self.settings_file = tk.StringVar(value='settings.json')
+        # interrupted runs only resume against the account they were started on, so it has to be named
+        self.account = tk.StringVar()
         self.human_movement = tk.BooleanVar()
         self.set_button_state = tk.StringVar()
         self.running_state = tk.StringVar(value=NOT_RUNNING_MSG)
@@ -53,6 +55,16 @@ class SensitivitySettingsApp(tk.Tk):
         browse_button = tk.Button(settings_frame, text="Browse", command=self.browse_settings_file)
         browse_button.pack(side="left")
 
+        # Frame for the account name, which lets a stopped run carry on where it stopped
+        account_frame = tk.Frame(self)
+        account_frame.pack(pady=(0, 5), padx=30)
+
+        account_label = tk.Label(account_frame, text="Account (optional, to resume stopped runs):")
+        account_label.pack(side="left")
+
+        account_entry = tk.Entry(account_frame, textvariable=self.account, width=20)
+        account_entry.pack(side="left", padx=10)
+
         # Checkbox for enabling human movement
         # human_movement_checkbox = tk.Checkbutton(self, text="Human Movement", variable=self.human_movement)
         # human_movement_checkbox.pack()
@@ -89,14 +101,22 @@ class SensitivitySettingsApp(tk.Tk):
     def set_settings(self):
         self.start_timer()
         self.running_state.set(RUNNING_MSG)
-        self.set_thread = Process(target=load_settings_from_json, args=(self.settings_file.get(), self.human_movement.get(),))
+        self.set_thread = Process(
+            target=load_settings_from_json,
+            args=(self.settings_file.get(), self.human_movement.get(),),
+            kwargs={"account": self.account.get().strip() or None},
+        )
         self.set_thread.start()
         threading.Thread(target=self.wait_for_process, args=(self.set_thread,)).start()
 
     def get_settings(self):
         self.start_timer()
         self.running_state.set(RUNNING_MSG)
-        self.get_thread = Process(target=save_settings_to_json, args=(self.settings_file.get(), self.human_movement.get(),))
+        self.get_thread = Process(
+            target=save_settings_to_json,
+            args=(self.settings_file.get(), self.human_movement.get(),),
+            kwargs={"account": self.account.get().strip() or None},
+        )
         self.get_thread.start()
         threading.Thread(target=self.wait_for_process, args=(self.get_thread,)).start()
 
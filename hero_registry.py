@@ -0,0 +1,238 @@
+import json
+import os
+import re
+import threading
+
+from template_bundle import HEROES_DIR
+import numpy as np
+
+from checkpoint import write_json_atomic
+from utils import get_correlation, get_text_thumbnail
+
+NAME_REFERENCES_PATH = "hero_name_references.json"
+NAME_THUMBNAIL_SIZE = (32, 8)
+# a name banner matches a hero when it correlates with the reference of the hero at least NAME_CORRELATION,
+# and better than with the reference of any other hero by at least NAME_MARGIN
+NAME_CORRELATION = 0.9
+NAME_MARGIN = 0.1
+
+# every hero, keyed by a portable id. "template" is the hero card image in HEROES_DIR,
+# "aliases" are other spellings of the name, such as how OCR has read it in the past.
+HEROES = {
+    "ana": {"name": "ANA", "template": "ana.png", "aliases": []},
+    "ashe": {"name": "ASHE", "template": "ashe.png", "aliases": []},
+    "baptiste": {"name": "BAPTISTE", "template": "baptiste.png", "aliases": []},
+    "bastion": {"name": "BASTION", "template": "bastion.png", "aliases": []},
+    "brigitte": {"name": "BRIGITTE", "template": "brigitte.png", "aliases": []},
+    "cassidy": {"name": "CASSIDY", "template": "cassidy.png", "aliases": ["MCCREE"]},
+    "doomfist": {"name": "DOOMFIST", "template": "doomfist.png", "aliases": []},
+    "dva": {"name": "D.VA", "template": "dva.png", "aliases": ["DVA"]},
+    "echo": {"name": "ECHO", "template": "echo.png", "aliases": []},
+    "genji": {"name": "GENJI", "template": "genji.png", "aliases": []},
+    "hanzo": {"name": "HANZO", "template": "hanzo.png", "aliases": []},
+    "junkerqueen": {"name": "JUNKER QUEEN", "template": "junkerqueen.png", "aliases": []},
+    "junkrat": {"name": "JUNKRAT", "template": "junkrat.png", "aliases": []},
+    "kiriko": {"name": "KIRIKO", "template": "kiriko.png", "aliases": []},
+    "lifeweaver": {"name": "LIFEWEAVER", "template": "lifeweaver.png", "aliases": []},
+    "lucio": {"name": "LÚCIO", "template": "lucio.png", "aliases": ["LUCIO"]},
+    "mei": {"name": "MEI", "template": "mei.png", "aliases": []},
+    "mercy": {"name": "MERCY", "template": "mercy.png", "aliases": []},
+    "moira": {"name": "MOIRA", "template": "moira.png", "aliases": []},
+    "orisa": {"name": "ORISA", "template": "orisa.png", "aliases": []},
+    "pharah": {"name": "PHARAH", "template": "pharah.png", "aliases": []},
+    "ramattra": {"name": "RAMATTRA", "template": "ramattra.png", "aliases": []},
+    "reaper": {"name": "REAPER", "template": "reaper.png", "aliases": []},
+    "reinhardt": {"name": "REINHARDT", "template": "reinhardt.png", "aliases": []},
+    "roadhog": {"name": "ROADHOG", "template": "roadhog.png", "aliases": []},
+    "sigma": {"name": "SIGMA", "template": "sigma.png", "aliases": []},
+    "sojourn": {"name": "SOJOURN", "template": "sojourn.png", "aliases": []},
+    "soldier76": {"name": "SOLDIER: 76", "template": "soldier76.png", "aliases": ["SOLDIER", "SOLDIER 76"]},
+    "sombra": {"name": "SOMBRA", "template": "sombra.png", "aliases": []},
+    "symmetra": {"name": "SYMMETRA", "template": "symmetra.png", "aliases": []},
+    "torbjorn": {"name": "TORBJÖRN", "template": "tobjorn.png", "aliases": ["TORBJORN"]},
+    "tracer": {"name": "TRACER", "template": "tracer.png", "aliases": []},
+    "widowmaker": {"name": "WIDOWMAKER", "template": "widowmaker.png", "aliases": []},
+    "winston": {"name": "WINSTON", "template": "winston.png", "aliases": []},
+    "wreckingball": {"name": "WRECKING BALL", "template": "wreckingball.png", "aliases": []},
+    "zarya": {"name": "ZARYA", "template": "zarya.png", "aliases": []},
+    "zenyatta": {"name": "ZENYATTA", "template": "zenyatta.png", "aliases": []},
+}
+
+
+def normalise_name(name):
+    """
+    Normalise a hero name for comparison, ignoring case, accents, spaces and punctuation.
+
+    :param name: The hero name.
+    :type name: str
+    :return: The normalised name.
+    :rtype: str
+    """
+    name = name.upper().replace("Ú", "U").replace("Ö", "O")
+    return re.sub(r"[^A-Z0-9]", "", name)
+
+
+def get_template_path(hero_id, heroes_dir=HEROES_DIR):
+    """
+    Get the path of the hero card image for a hero.
+
+    :param hero_id: The id of the hero.
+    :type hero_id: str
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :return: The path to the hero card image.
+    :rtype: str
+    """
+    return os.path.join(heroes_dir, HEROES[hero_id]["template"])
+
+
+def get_hero_id_by_template(hero_img_path):
+    """
+    Get the id of the hero a hero card image belongs to. Windows style paths are accepted.
+
+    :param hero_img_path: The path to the hero card image.
+    :type hero_img_path: str
+    :return: The id of the hero, or None if the image is not in the registry.
+    :rtype: str
+    """
+    filename = os.path.basename(hero_img_path.replace("\\", "/"))
+    for hero_id, hero in HEROES.items():
+        if hero["template"] == filename:
+            return hero_id
+    return None
+
+
+def get_hero_id_by_name(name):
+    """
+    Get the id of a hero from its name or one of its aliases.
+
+    :param name: The hero name, as displayed or read by OCR.
+    :type name: str
+    :return: The id of the hero, or None if no hero has that name.
+    :rtype: str
+    """
+    name = normalise_name(name)
+    if not name:
+        return None
+    for hero_id, hero in HEROES.items():
+        if name in (normalise_name(alias) for alias in [hero["name"], *hero["aliases"]]):
+            return hero_id
+    return None
+
+
+def resolve_hero_id(record):
+    """
+    Get the id of the hero a settings record belongs to.
+    Records saved before hero ids existed only have a "filepath" and a "name".
+
+    :param record: A settings record.
+    :type record: dict
+    :return: The id of the hero, or None if it cannot be resolved.
+    :rtype: str
+    """
+    if record.get("id") in HEROES:
+        return record["id"]
+    if record.get("filepath"):
+        hero_id = get_hero_id_by_template(record["filepath"])
+        if hero_id:
+            return hero_id
+    return get_hero_id_by_name(record.get("name", ""))
+
+
+class NameReferences:
+    def __init__(self, path=NAME_REFERENCES_PATH, min_correlation=NAME_CORRELATION, margin=NAME_MARGIN):
+        """
+        Initialize a NameReferences object, which stores a thumbnail of the name banner of each hero.
+        They are used to confirm the right hero panel has opened without reading the name with OCR.
+        References are stored from the thread reading the panels while the session matches banners,
+        and are written to disk once by save at the end of the session.
+
+        :param path: The path of the file the thumbnails are stored in.
+        :type path: str
+        :param min_correlation: The lowest correlation of a name banner with its reference for it to match.
+        :type min_correlation: float
+        :param margin: How much better a name banner must match its reference than that of any other hero.
+        :type margin: float
+        :return: None
+        """
+        self.path = path
+        self.min_correlation = min_correlation
+        self.margin = margin
+        self.lock = threading.Lock()
+        # whether references were stored since the file was read or saved
+        self.changed = False
+        size = NAME_THUMBNAIL_SIZE[0] * NAME_THUMBNAIL_SIZE[1]
+        try:
+            with open(path, "r") as fn:
+                stored = json.load(fn)
+            self.thumbnails = {
+                hero_id: np.frombuffer(bytes.fromhex(value), dtype=np.uint8).reshape(NAME_THUMBNAIL_SIZE[::-1])
+                for hero_id, value in stored.items()
+                # references of another size were stored by an older version and are read again
+                if len(value) == 2 * size
+            }
+        except (OSError, ValueError):
+            self.thumbnails = {}
+
+    def has_reference(self, hero_id):
+        """
+        Whether a reference thumbnail has been stored for a hero.
+
+        :param hero_id: The id of the hero.
+        :type hero_id: str
+        :return: True if a reference exists.
+        :rtype: bool
+        """
+        with self.lock:
+            return hero_id in self.thumbnails
+
+    def matches(self, hero_id, name_img):
+        """
+        Check a name banner against the stored reference of a hero.
+        A banner which is as close to the reference of another hero is not a match.
+
+        :param hero_id: The id of the hero.
+        :type hero_id: str
+        :param name_img: The crop of the name banner.
+        :type name_img: PIL.Image or numpy.ndarray
+        :return: True if the banner matches, False if it does not, or None if there is no reference.
+        :rtype: bool
+        """
+        with self.lock:
+            thumbnails = dict(self.thumbnails)
+        if hero_id not in thumbnails:
+            return None
+        thumbnail = get_text_thumbnail(name_img, NAME_THUMBNAIL_SIZE)
+        correlation = get_correlation(thumbnail, thumbnails[hero_id])
+        if correlation < self.min_correlation:
+            return False
+        others = [get_correlation(thumbnail, other) for key, other in thumbnails.items() if key != hero_id]
+        return not others or correlation - max(others) >= self.margin
+
+    def store(self, hero_id, name_img):
+        """
+        Store the thumbnail of a name banner as the reference for a hero. It is written to disk by save.
+
+        :param hero_id: The id of the hero.
+        :type hero_id: str
+        :param name_img: The crop of the name banner.
+        :type name_img: PIL.Image or numpy.ndarray
+        :return: None
+        """
+        thumbnail = get_text_thumbnail(name_img, NAME_THUMBNAIL_SIZE)
+        with self.lock:
+            self.thumbnails[hero_id] = thumbnail
+            self.changed = True
+
+    def save(self):
+        """
+        Write every reference to disk in one step, if any were stored since the last save.
+
+        :return: None
+        """
+        with self.lock:
+            if not self.changed:
+                return
+            stored = {key: value.tobytes().hex() for key, value in self.thumbnails.items()}
+            self.changed = False
+        write_json_atomic(self.path, stored)
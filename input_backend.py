@@ -0,0 +1,297 @@
+import random
+import time
+from contextlib import contextmanager
+
+from tracing import span
+
+# how each backend paces its events.
+# "pause" is the delay after every event, pyautogui sleeps for its global PAUSE (0.1s) when left to itself.
+# "move_duration" is the range of durations for a direct move and "tween" whether it is eased.
+INPUT_PROFILES = {
+    "default": {"pause": 0.1, "move_duration": (0.01, 0.02), "tween": True},
+    # the game needs a moment to register each event, but nowhere near a tenth of a second
+    "turbo": {"pause": 0.02, "move_duration": (0.0, 0.0), "tween": False},
+}
+# the profile every entry point uses unless told otherwise
+DEFAULT_INPUT_PROFILE = "turbo"
+# with human movement the final move onto a target is always eased, whatever the profile
+HUMAN_MOVE = {"move_duration": (0.01, 0.02), "tween": True}
+
+
+class InputBackend:
+    def __init__(self, profile=DEFAULT_INPUT_PROFILE, human=False):
+        """
+        Initialize an InputBackend object, which sends mouse and keyboard events and
+        keeps track of the time spent doing so.
+
+        :param profile: The name of the input profile, see INPUT_PROFILES.
+        :type profile: str
+        :param human: Whether the cursor moves like a human, which eases direct moves in every profile.
+        :type human: bool
+        :return: None
+        """
+        if profile not in INPUT_PROFILES:
+            raise ValueError(f"unknown input profile {profile}, expected one of {tuple(INPUT_PROFILES)}")
+        settings = {**INPUT_PROFILES[profile], **(HUMAN_MOVE if human else {})}
+        self.profile = profile
+        self.human = human
+        self.pause = settings["pause"]
+        self.move_duration = settings["move_duration"]
+        self.tween = settings["tween"]
+        self.calls = 0
+        self.input_time = 0.0
+
+    @contextmanager
+    def timed(self, name):
+        """
+        Count an input call and the time spent in it, including the pause after it, and trace it as a span.
+        """
+        start = time.perf_counter()
+        try:
+            with span(f"input.{name}"):
+                yield
+        finally:
+            self.calls += 1
+            self.input_time += time.perf_counter() - start
+
+    def wait(self):
+        """
+        Sleep for the pause of the profile after an event.
+        """
+        if self.pause:
+            time.sleep(self.pause)
+
+    def get_move_duration(self):
+        """
+        Pick a random duration for a direct move from the range of the profile.
+
+        :return: The duration in seconds.
+        :rtype: float
+        """
+        return random.uniform(*self.move_duration)
+
+    def get_report(self, total_time):
+        """
+        Compare the time spent sending input against everything else in a run.
+
+        :param total_time: The wall clock time of the whole run in seconds.
+        :type total_time: float
+        :return: A dictionary with the profile, whether movement is human, the number of calls, input time, other time
+                 and the share of input time.
+        :rtype: dict
+        """
+        return {
+            "profile": self.profile,
+            "human": self.human,
+            "calls": self.calls,
+            "input_time": round(self.input_time, 3),
+            "other_time": round(max(0.0, total_time - self.input_time), 3),
+            "input_share": round(self.input_time / total_time, 3) if total_time else 0.0,
+        }
+
+    def position(self):
+        raise NotImplementedError
+
+    def move_to(self, pos, duration=None):
+        raise NotImplementedError
+
+    def click(self, pos=None):
+        raise NotImplementedError
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def write(self, text, interval=0.0):
+        raise NotImplementedError
+
+    def paste(self, text):
+        raise NotImplementedError
+
+
+class PyAutoGUIBackend(InputBackend):
+    def __init__(self, profile=DEFAULT_INPUT_PROFILE, human=False):
+        """
+        Initialize a PyAutoGUIBackend object, which sends events with pyautogui.
+        pyautogui's own pause after every call is disabled, the profile's pause is used instead.
+
+        :param profile: The name of the input profile, see INPUT_PROFILES.
+        :type profile: str
+        :param human: Whether the cursor moves like a human, which eases direct moves in every profile.
+        :type human: bool
+        :return: None
+        """
+        super().__init__(profile, human)
+        # imported here so the rest of the script can be used without a display
+        import pyautogui
+
+        self.pag = pyautogui
+        self.tweens = [pyautogui.easeInQuad, pyautogui.easeOutQuad, pyautogui.easeInOutQuad]
+
+    def position(self):
+        """
+        Get the current position of the cursor.
+
+        :return: The (x, y) position.
+        :rtype: tuple
+        """
+        return tuple(self.pag.position())
+
+    def move_to(self, pos, duration=None):
+        """
+        Move the cursor to a position.
+
+        :param pos: The (x, y) position to move to.
+        :type pos: tuple
+        :param duration: How long the move takes in seconds. Defaults to a random duration from the profile.
+        :type duration: float
+        :return: None
+        """
+        if duration is None:
+            duration = self.get_move_duration()
+        tween = random.choice(self.tweens) if self.tween and duration else self.pag.linear
+        with self.timed("move_to"):
+            self.pag.moveTo(pos[0], pos[1], duration=duration, tween=tween, _pause=False)
+            self.wait()
+
+    def click(self, pos=None):
+        """
+        Click the left mouse button, at the current position or the given one.
+
+        :param pos: The (x, y) position to click on. Defaults to the current position.
+        :type pos: tuple
+        :return: None
+        """
+        with self.timed("click"):
+            if pos is None:
+                self.pag.click(_pause=False)
+            else:
+                self.pag.click(pos[0], pos[1], _pause=False)
+            self.wait()
+
+    def key_down(self, key):
+        """
+        Hold a key down.
+        """
+        with self.timed("key_down"):
+            self.pag.keyDown(key, _pause=False)
+            self.wait()
+
+    def key_up(self, key):
+        """
+        Release a key.
+        """
+        with self.timed("key_up"):
+            self.pag.keyUp(key, _pause=False)
+            self.wait()
+
+    def press(self, key):
+        """
+        Press and release a key.
+        """
+        with self.timed("press"):
+            self.pag.press(key, _pause=False)
+            self.wait()
+
+    def write(self, text, interval=0.0):
+        """
+        Type some text one character at a time.
+
+        :param text: The text to type.
+        :type text: str
+        :param interval: The delay between each character in seconds.
+        :type interval: float
+        :return: None
+        """
+        with self.timed("write"):
+            self.pag.write(text, interval=interval, _pause=False)
+            self.wait()
+
+    def paste(self, text):
+        """
+        Enter some text in one go by copying it to the clipboard and pressing ctrl+v.
+
+        :param text: The text to paste.
+        :type text: str
+        :return: None
+        """
+        # pyperclip is installed alongside pyautogui
+        import pyperclip
+
+        with self.timed("paste"):
+            pyperclip.copy(text)
+            self.pag.hotkey("ctrl", "v", _pause=False)
+            self.wait()
+
+
+class RecordingBackend(InputBackend):
+    def __init__(self, profile=DEFAULT_INPUT_PROFILE, start_pos=(0, 0), screen=None, realtime=False, human=False):
+        """
+        Initialize a RecordingBackend object, which records every event instead of sending it.
+        It can drive the script in tests, or against a replayed or simulated screen.
+
+        :param profile: The name of the input profile, see INPUT_PROFILES.
+        :type profile: str
+        :param start_pos: The (x, y) position the cursor starts at.
+        :type start_pos: tuple
+        :param screen: An optional stand-in for the screen, whose on_input method is passed every event.
+        :type screen: object
+        :param realtime: Whether to sleep for the pauses of the profile and typing intervals, so runs are timed
+                         like they would be against the game. Otherwise it never sleeps.
+        :type realtime: bool
+        :param human: Whether the cursor moves like a human, which eases direct moves in every profile.
+        :type human: bool
+        :return: None
+        """
+        super().__init__(profile, human)
+        if not realtime:
+            self.pause = 0.0
+        self.realtime = realtime
+        self.screen = screen
+        self.pos = tuple(start_pos)
+        # every event as a tuple of its name followed by its arguments
+        self.events = []
+
+    def record(self, *event):
+        """
+        Record an event, pass it on to the screen and pause after it.
+        """
+        with self.timed(event[0]):
+            self.events.append(event)
+            if self.screen is not None:
+                self.screen.on_input(event)
+            self.wait()
+
+    def position(self):
+        return self.pos
+
+    def move_to(self, pos, duration=None):
+        self.pos = (int(pos[0]), int(pos[1]))
+        self.record("move_to", self.pos)
+
+    def click(self, pos=None):
+        if pos is not None:
+            self.pos = (int(pos[0]), int(pos[1]))
+        self.record("click", self.pos)
+
+    def key_down(self, key):
+        self.record("key_down", key)
+
+    def key_up(self, key):
+        self.record("key_up", key)
+
+    def press(self, key):
+        self.record("press", key)
+
+    def write(self, text, interval=0.0):
+        if self.realtime and interval:
+            time.sleep(interval * len(text))
+        self.record("write", text)
+
+    def paste(self, text):
+        self.record("paste", text)
@@ -0,0 +1,144 @@
+import numpy as np
+
+from utils import SET_HEIGHT, SET_WIDTH, get_monitor_resolution, get_scalars
+
+# UI regions recorded at SET_WIDTH x SET_HEIGHT, as ((left, top), (right, bottom)).
+# Points are regions whose corners are the same.
+SAFE_EDGE = (2350, 580)
+SENSITIVITY_POS = ((1595, 280), (1695, 310))
+CHANGE_HERO_POS = ((2165, 625), (2490, 680))
+HERO_NAME_POS = ((2170, 555), (2485, 600))
+OPTIONS_BTN_POS = ((1170, 700), (1750, 765))
+CONTROLS_BTN_POS = ((425, 85), (600, 125))
+# the part of the 'Change Hero' page the hero cards are in, the panel on the right is never searched
+HERO_GRID_POS = ((0, 130), (2150, 1440))
+
+REGIONS = {
+    "safe_edge": (SAFE_EDGE, SAFE_EDGE),
+    "sensitivity": SENSITIVITY_POS,
+    "change_hero": CHANGE_HERO_POS,
+    "hero_name": HERO_NAME_POS,
+    "options_btn": OPTIONS_BTN_POS,
+    "controls_btn": CONTROLS_BTN_POS,
+    "hero_grid": HERO_GRID_POS,
+}
+
+# how the UI is fitted to each aspect ratio.
+# "stretch" scales each axis independently, "height" scales both axes by the height and centres the UI horizontally,
+# "width" scales both axes by the width and centres the UI vertically.
+LAYOUT_PROFILES = {
+    "16:9": {"aspect": 16 / 9, "fit": "stretch"},
+    "16:10": {"aspect": 16 / 10, "fit": "width"},
+    "21:9": {"aspect": 64 / 27, "fit": "height"},
+    "32:9": {"aspect": 32 / 9, "fit": "height"},
+}
+
+
+def get_profile_name(width, height):
+    """
+    Get the layout profile with the aspect ratio closest to a resolution.
+
+    :param width: The width of the screen.
+    :type width: int
+    :param height: The height of the screen.
+    :type height: int
+    :return: The name of the profile.
+    :rtype: str
+    """
+    aspect = width / height
+    return min(LAYOUT_PROFILES, key=lambda name: abs(LAYOUT_PROFILES[name]["aspect"] - aspect))
+
+
+class Layout:
+    def __init__(self, resolution=None, profile=None, regions=REGIONS):
+        """
+        Initialize a Layout object. Every UI region is resolved once for the screen resolution,
+        so clicking and reading regions never scales positions or asks for the resolution again.
+
+        :param resolution: The (width, height) of the screen. Defaults to the detected monitor resolution.
+        :type resolution: tuple
+        :param profile: The name of the layout profile. Defaults to the profile closest to the aspect ratio.
+        :type profile: str
+        :param regions: The regions to resolve, recorded at SET_WIDTH x SET_HEIGHT.
+        :type regions: dict
+        :return: None
+        """
+        self.resolution = tuple(resolution or get_monitor_resolution())
+        self.profile = profile or get_profile_name(*self.resolution)
+
+        w_scalar, h_scalar = get_scalars(self.resolution)
+        offset_x = offset_y = 0.0
+        fit = LAYOUT_PROFILES[self.profile]["fit"]
+        if fit == "height":
+            w_scalar = h_scalar
+            offset_x = (self.resolution[0] - SET_WIDTH * w_scalar) / 2
+        elif fit == "width":
+            h_scalar = w_scalar
+            offset_y = (self.resolution[1] - SET_HEIGHT * h_scalar) / 2
+
+        self.scale = (w_scalar, h_scalar)
+        self.offset = (offset_x, offset_y)
+
+        # every region as a row of (left, top, right, bottom) screen pixels
+        self.names = list(regions)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        reference = np.array([[*regions[name][0], *regions[name][1]] for name in self.names], dtype=np.float64)
+        self.rects = np.rint(
+            reference * np.array([w_scalar, h_scalar, w_scalar, h_scalar]) + np.array([offset_x, offset_y, offset_x, offset_y])
+        ).astype(np.int32)
+
+        # plain python tuples are what the click and capture code consumes, so they are built up front too
+        self.corners = [((int(left), int(top)), (int(right), int(bottom))) for left, top, right, bottom in self.rects]
+
+    @property
+    def template_scale(self):
+        """
+        The factor the hero card templates, captured at SET_WIDTH x SET_HEIGHT, must be resized by.
+        """
+        return min(self.scale)
+
+    def rect(self, name):
+        """
+        Get a region as its top-left and bottom-right corners.
+
+        :param name: The name of the region.
+        :type name: str
+        :return: A tuple of two (x, y) tuples.
+        :rtype: tuple
+        """
+        return self.corners[self.index[name]]
+
+    def point(self, name):
+        """
+        Get the top-left corner of a region, for regions which are single points.
+
+        :param name: The name of the region.
+        :type name: str
+        :return: The (x, y) position.
+        :rtype: tuple
+        """
+        return self.corners[self.index[name]][0]
+
+    def area(self, name):
+        """
+        Get a region in the format (left, top, width, height).
+
+        :param name: The name of the region.
+        :type name: str
+        :return: The region.
+        :rtype: tuple
+        """
+        (left, top), (right, bottom) = self.corners[self.index[name]]
+        return (left, top, right - left, bottom - top)
+
+    def centre(self, name):
+        """
+        Get the centre of a region.
+
+        :param name: The name of the region.
+        :type name: str
+        :return: The (x, y) position.
+        :rtype: tuple
+        """
+        (left, top), (right, bottom) = self.corners[self.index[name]]
+        return ((left + right) // 2, (top + bottom) // 2)
@@ -0,0 +1,154 @@
+import json
+
+import cv2
+import numpy as np
+
+from checkpoint import write_json_atomic
+
+LAYOUT_CACHE_PATH = ".hero_layout_cache.json"
+SIGNATURE_SIZE = (8, 8)
+SIGNATURE_TOLERANCE = 8
+
+
+def get_region_signature(haystack, box):
+    """
+    Compute a cheap pixel signature of a region by averaging it down to a tiny grayscale thumbnail.
+
+    :param haystack: The grayscale screenshot containing the region.
+    :type haystack: numpy.ndarray
+    :param box: The region in the format (left, top, width, height).
+    :type box: tuple
+    :return: The signature of the region, or None if the region falls outside the screenshot.
+    :rtype: numpy.ndarray
+    """
+    left, top, width, height = box
+    region = haystack[top:top + height, left:left + width]
+    if region.shape != (height, width):
+        return None
+    return cv2.resize(region, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+
+class LayoutCache:
+    def __init__(self, path=LAYOUT_CACHE_PATH, tolerance=SIGNATURE_TOLERANCE):
+        """
+        Initialize a LayoutCache object, which persists hero card locations between runs.
+        Entries are keyed by screen resolution, a hash of the hero card templates, the scale they are matched at
+        and the region of interest they are searched for in.
+
+        :param path: The path of the cache file.
+        :type path: str
+        :param tolerance: The largest mean pixel difference for a cached card signature to still be considered valid.
+        :type tolerance: float
+        :return: None
+        """
+        self.path = path
+        self.tolerance = tolerance
+        self.layouts = self.read()
+
+    def read(self):
+        """
+        Read the cached layouts from disk.
+
+        :return: A dictionary mapping a layout key to the cached cards for that layout.
+        :rtype: dict
+        """
+        try:
+            with open(self.path, "r") as fn:
+                return json.load(fn)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self):
+        """
+        Write the cached layouts to disk, replacing the previous file atomically.
+
+        :return: None
+        """
+        write_json_atomic(self.path, self.layouts)
+
+    @staticmethod
+    def get_layout_key(haystack, templates_hash, scale=1.0, roi=None):
+        """
+        Build the key for a screen resolution, template set and search.
+        Cards found at one scale or in one region of interest are not trusted for another,
+        where they may not have been found, or would not be.
+
+        :param haystack: The grayscale screenshot.
+        :type haystack: numpy.ndarray
+        :param templates_hash: The hash of the hero card templates.
+        :type templates_hash: str
+        :param scale: The factor the templates are resized by.
+        :type scale: float
+        :param roi: The area (left, top, width, height) the cards are searched for in, None for the whole screenshot.
+        :type roi: tuple
+        :return: The layout key.
+        :rtype: str
+        """
+        height, width = haystack.shape[:2]
+        roi = "x".join(str(int(v)) for v in roi) if roi else "full"
+        return f"{width}x{height}:{templates_hash}:{float(scale):.4f}:{roi}"
+
+    def lookup(self, haystack, templates_hash, keys, scale=1.0, roi=None):
+        """
+        Get the cached matches which are still valid for the given screenshot.
+        A cached card is only trusted if the signature of its region still matches the screenshot.
+
+        :param haystack: The grayscale screenshot.
+        :type haystack: numpy.ndarray
+        :param templates_hash: The hash of the hero card templates.
+        :type templates_hash: str
+        :param keys: The template keys to look up.
+        :type keys: list
+        :param scale: The factor the templates are resized by.
+        :type scale: float
+        :param roi: The area (left, top, width, height) the cards are searched for in.
+        :type roi: tuple
+        :return: A dictionary mapping each verified template key to its cached match.
+        :rtype: dict
+        """
+        cards = self.layouts.get(self.get_layout_key(haystack, templates_hash, scale, roi), {})
+        matches = {}
+        for key in keys:
+            card = cards.get(key)
+            if not card:
+                continue
+
+            box = tuple(card["box"])
+            signature = get_region_signature(haystack, box)
+            if signature is None:
+                continue
+
+            diff = np.abs(signature.astype(np.int16) - np.array(card["signature"], dtype=np.int16).reshape(signature.shape))
+            if diff.mean() <= self.tolerance:
+                matches[key] = {"box": box, "centre": tuple(card["centre"]), "confidence": card["confidence"]}
+        return matches
+
+    def store(self, haystack, templates_hash, matches, scale=1.0, roi=None):
+        """
+        Add freshly located hero cards to the cache and write it to disk.
+        Cards which were not found are not cached.
+
+        :param haystack: The grayscale screenshot the cards were located in.
+        :type haystack: numpy.ndarray
+        :param templates_hash: The hash of the hero card templates.
+        :type templates_hash: str
+        :param matches: A dictionary mapping template keys to matches, as returned by HeroLocator.match_template.
+        :type matches: dict
+        :param scale: The factor the templates were resized by.
+        :type scale: float
+        :param roi: The area (left, top, width, height) the cards were searched for in.
+        :type roi: tuple
+        :return: None
+        """
+        cards = self.layouts.setdefault(self.get_layout_key(haystack, templates_hash, scale, roi), {})
+        for key, match in matches.items():
+            if not match or not match["centre"]:
+                continue
+            signature = get_region_signature(haystack, match["box"])
+            cards[key] = {
+                "box": list(match["box"]),
+                "centre": list(match["centre"]),
+                "confidence": match["confidence"],
+                "signature": signature.flatten().tolist(),
+            }
+        self.write()
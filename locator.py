@@ -0,0 +1,258 @@
+import os
+import concurrent.futures
+
+import cv2
+import numpy as np
+
+from template_bundle import BUNDLE_PATH, HEROES_DIR, get_template_filenames, hash_templates, is_bundle_current, load_bundle
+from tracing import traced
+from utils import to_grayscale
+
+LOCATE_CONFIDENCE = 0.6
+# cards are first searched for in frames and templates shrunk by COARSE_FACTOR,
+# then the best COARSE_CANDIDATES positions are refined at full resolution
+COARSE_FACTOR = 4
+COARSE_CANDIDATES = 3
+# the smallest side a shrunk template may have, smaller templates are matched at full resolution only
+MIN_COARSE_TEMPLATE = 12
+
+
+def load_templates(heroes_dir=HEROES_DIR, bundle_path=BUNDLE_PATH):
+    """
+    Load every hero card template in a directory as a grayscale array.
+    A pre-decoded template bundle is memory-mapped instead when it is up to date with the directory.
+
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :param bundle_path: The path of the template bundle built by template_bundle.py.
+    :type bundle_path: str
+    :return: A tuple containing a dictionary mapping the template path to its grayscale array,
+             and the hash of the templates if it was read from the bundle, otherwise None.
+    :rtype: tuple
+    """
+    if bundle_path and is_bundle_current(bundle_path, heroes_dir):
+        bundled, templates_hash = load_bundle(bundle_path)
+        templates = {os.path.join(heroes_dir, name): img for name, img in bundled.items()}
+        return templates, templates_hash
+
+    templates = {}
+    for filename in get_template_filenames(heroes_dir):
+        path = os.path.join(heroes_dir, filename)
+        templates[path] = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    return templates, None
+
+
+class HeroLocator:
+    def __init__(self, heroes_dir=HEROES_DIR, confidence=LOCATE_CONFIDENCE, max_workers=5, cache=None, bundle_path=BUNDLE_PATH, scale=1.0, roi=None, coarse_factor=COARSE_FACTOR, pool=None):
+        """
+        Initialize a HeroLocator object. All the hero card templates are loaded once, up front.
+
+        :param heroes_dir: The directory containing the hero card images.
+        :type heroes_dir: str
+        :param confidence: The minimum match score for a hero card to be considered found.
+        :type confidence: float
+        :param max_workers: The number of threads used to match templates. OpenCV releases the GIL while matching.
+        :type max_workers: int
+        :param cache: An optional LayoutCache used to skip template matching for cards which have not moved.
+        :type cache: LayoutCache
+        :param bundle_path: The path of the template bundle to memory-map when it is up to date.
+        :type bundle_path: str
+        :param scale: The factor to resize the templates by, when the screen is not at the resolution they were captured at.
+        :type scale: float
+        :param roi: The area (left, top, width, height) of the screenshot the hero grid is in. Defaults to the whole screenshot.
+        :type roi: tuple
+        :param coarse_factor: How much the coarse search shrinks the screenshot and templates by, 1 searches at full resolution only.
+        :type coarse_factor: int
+        :param pool: An optional frame_pool.FramePool to match templates in worker processes instead of threads.
+        :type pool: FramePool
+        :return: None
+        """
+        self.heroes_dir = heroes_dir
+        self.confidence = confidence
+        self.max_workers = max_workers
+        self.cache = cache
+        self.pool = pool
+        self.scale = scale
+        self.templates, self.templates_hash = load_templates(heroes_dir, bundle_path)
+        if cache and not self.templates_hash:
+            self.templates_hash = hash_templates(heroes_dir)
+
+        if scale != 1.0:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            self.templates = {
+                key: cv2.resize(template, None, fx=scale, fy=scale, interpolation=interpolation)
+                for key, template in self.templates.items()
+            }
+
+        self.roi = roi
+        self.coarse_factor = max(1, int(coarse_factor))
+        self.coarse_templates = {}
+        if self.coarse_factor > 1:
+            for key, template in self.templates.items():
+                if min(template.shape) // self.coarse_factor >= MIN_COARSE_TEMPLATE:
+                    self.coarse_templates[key] = cv2.resize(
+                        template, None, fx=1 / self.coarse_factor, fy=1 / self.coarse_factor, interpolation=cv2.INTER_AREA
+                    )
+
+    def get_template_key(self, hero_img_path):
+        """
+        Normalise a hero image path to the key used for the loaded templates.
+        Settings saved on Windows use backslashes, so only the filename is relied upon.
+
+        :param hero_img_path: The path to the hero image file.
+        :type hero_img_path: str
+        :return: The template key for the hero image.
+        :rtype: str
+        """
+        filename = os.path.basename(hero_img_path.replace("\\", "/"))
+        return os.path.join(self.heroes_dir, filename)
+
+    def get_coarse_candidates(self, coarse_haystack, key):
+        """
+        Find the best positions of a template in the shrunk haystack.
+
+        :param coarse_haystack: The grayscale haystack shrunk by the coarse factor.
+        :type coarse_haystack: numpy.ndarray
+        :param key: The template key of the hero card to search for.
+        :type key: str
+        :return: Up to COARSE_CANDIDATES (left, top) positions in full resolution pixels, best first.
+        :rtype: list
+        """
+        template = self.coarse_templates[key]
+        if coarse_haystack.shape[0] < template.shape[0] or coarse_haystack.shape[1] < template.shape[1]:
+            return []
+        scores = cv2.matchTemplate(coarse_haystack, template, cv2.TM_CCOEFF_NORMED)
+
+        candidates = []
+        height, width = template.shape
+        for _ in range(COARSE_CANDIDATES):
+            _, _, _, (left, top) = cv2.minMaxLoc(scores)
+            candidates.append((left * self.coarse_factor, top * self.coarse_factor))
+            # suppress the neighbourhood of the peak, so the next candidate is a different card position
+            scores[max(0, top - height // 2):top + height // 2 + 1, max(0, left - width // 2):left + width // 2 + 1] = -1.0
+        return candidates
+
+    def match_template(self, haystack, key, coarse_haystack=None):
+        """
+        Find the best match for a single template within a grayscale haystack.
+        When a shrunk haystack is given, the template is searched for in it first and only small windows
+        around the best coarse positions are searched at full resolution.
+
+        :param haystack: The grayscale screenshot to search.
+        :type haystack: numpy.ndarray
+        :param key: The template key of the hero card to search for.
+        :type key: str
+        :param coarse_haystack: The haystack shrunk by the coarse factor.
+        :type coarse_haystack: numpy.ndarray
+        :return: A dictionary containing the box (left, top, width, height), centre and confidence of the best match,
+                 whose centre is None when the confidence is below the threshold.
+                 None when the template is unknown or does not fit in the haystack, so it could not be searched for.
+        :rtype: dict
+        """
+        template = self.templates.get(key)
+        if template is None:
+            return None
+
+        height, width = template.shape
+        if haystack.shape[0] < height or haystack.shape[1] < width:
+            return None
+
+        windows = []
+        if coarse_haystack is not None and key in self.coarse_templates:
+            # the coarse position is only accurate to a few shrunk pixels either way
+            margin = 2 * self.coarse_factor
+            for left, top in self.get_coarse_candidates(coarse_haystack, key):
+                x, y = max(0, left - margin), max(0, top - margin)
+                window = haystack[y:top + height + margin, x:left + width + margin]
+                if window.shape[0] >= height and window.shape[1] >= width:
+                    windows.append((x, y, window))
+        if not windows:
+            # the template is searched for at full resolution when no coarse window has room for it
+            windows = [(0, 0, haystack)]
+
+        confidence, left, top = -1.0, 0, 0
+        for x, y, window in windows:
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (window_left, window_top) = cv2.minMaxLoc(scores)
+            if score > confidence:
+                confidence, left, top = score, x + window_left, y + window_top
+
+        box = (left, top, width, height)
+        centre = None
+        if confidence >= self.confidence:
+            centre = (left + width // 2, top + height // 2)
+
+        return {"box": box, "centre": centre, "confidence": float(confidence)}
+
+    @traced("HeroLocator.locate_all")
+    def locate_all(self, screenshot, hero_img_paths=None):
+        """
+        Locate every hero card within a screenshot in a single pass.
+        The screenshot is converted to grayscale once and shared between all the template searches.
+
+        :param screenshot: The screenshot of the 'Change Hero' page.
+        :type screenshot: PIL.Image or numpy.ndarray
+        :param hero_img_paths: The hero image paths to search for. Defaults to every loaded template.
+        :type hero_img_paths: list
+        :return: A dictionary mapping each hero image path to its match, as returned by match_template,
+                 or to None if its template is unknown or does not fit in the region of interest.
+        :rtype: dict
+        """
+        if hero_img_paths is None:
+            hero_img_paths = list(self.templates)
+
+        haystack = to_grayscale(screenshot)
+        keys = [self.get_template_key(path) for path in hero_img_paths]
+
+        matches = {}
+        if self.cache:
+            matches = self.cache.lookup(haystack, self.templates_hash, keys, self.scale, self.roi)
+
+        # only the cards which are not cached, or no longer pass their checksum, are matched again
+        missing = [key for key in dict.fromkeys(keys) if key not in matches]
+        if missing:
+            if self.pool:
+                located = self.pool.match_all(haystack, missing)
+            else:
+                located = self.match_all(haystack, missing)
+            if self.cache:
+                self.cache.store(haystack, self.templates_hash, located, self.scale, self.roi)
+            matches.update(located)
+
+        return {path: matches[key] for path, key in zip(hero_img_paths, keys)}
+
+    @traced("HeroLocator.match_all")
+    def match_all(self, haystack, keys):
+        """
+        Match templates within the region of interest of a grayscale screenshot, sharing the shrunk frame between them.
+
+        :param haystack: The grayscale screenshot.
+        :type haystack: numpy.ndarray
+        :param keys: The template keys of the hero cards to search for.
+        :type keys: list
+        :return: A dictionary mapping each key to its match, in screenshot coordinates, or to None if the template
+                 could not be searched for.
+        :rtype: dict
+        """
+        offset_x, offset_y = 0, 0
+        if self.roi:
+            offset_x, offset_y, width, height = self.roi
+            haystack = haystack[offset_y:offset_y + height, offset_x:offset_x + width]
+
+        coarse_haystack = None
+        if self.coarse_templates:
+            coarse_haystack = cv2.resize(
+                haystack, None, fx=1 / self.coarse_factor, fy=1 / self.coarse_factor, interpolation=cv2.INTER_AREA
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            located = dict(zip(keys, executor.map(lambda key: self.match_template(haystack, key, coarse_haystack), keys)))
+
+        for match in located.values():
+            if match is None:
+                continue
+            left, top, width, height = match["box"]
+            match["box"] = (left + offset_x, top + offset_y, width, height)
+            if match["centre"]:
+                match["centre"] = (match["centre"][0] + offset_x, match["centre"][1] + offset_y)
+        return located
@@ -1,36 +1,75 @@
-import random
-import pyautogui as pag
-import pytesseract
 import time
 import os
 import json
-from gen_curve import get_curve
+import numpy as np
+from gen_curve import get_curve_array
 import concurrent.futures
 
-from utils import clean_string, get_centre_pos, get_centre_pos_from_box, get_distance, get_left_top_width_height, get_pos_in_area, preprocess
+from capture import crop, get_capture_backend
+from checkpoint import Checkpoint, get_checkpoint_path, write_json_atomic
+from input_backend import DEFAULT_INPUT_PROFILE, PyAutoGUIBackend
+from hero_registry import HEROES, NameReferences, get_hero_id_by_name, get_template_path, resolve_hero_id
+from layout import Layout
+from layout_cache import LayoutCache
+from frame_pool import FramePool
+from locator import LOCATE_CONFIDENCE, HeroLocator
+from scheduler import VisitScheduler
+from tracing import carry_context, trace_to, traced, visit
+from ocr import BatchOCR, OCRCache, OCRWorkerPool
+from utils import get_centre_pos_from_box, get_distance, get_frame_difference, get_frame_signature, get_sensitivity_value, get_left_top_width_height, get_pos_in_area, preprocess, PreprocessBuffers
 
-SAFE_EDGE = (2350, 580)
-SENSITIVITY_POS = ((1595, 280), (1695, 310))
-CHANGE_HERO_POS = ((2165, 625), (2490, 680))
-HERO_NAME_POS = ((2170, 555), (2485, 600))
-OPTIONS_BTN_POS = ((1170, 700), (1750, 765))
-CONTROLS_BTN_POS = ((425, 85), (600, 125))
-LOCATE_CONFIDENCE = 0.6
-TWEENS = [pag.easeInQuad, pag.easeOutQuad, pag.easeInOutQuad]
 TYPING_INTERVAL = 0.25
+# how a sensitivity is entered, "slow" types it at TYPING_INTERVAL, "fast" types it with almost no delay
+# and "paste" pastes it from the clipboard. values the fast modes fail to enter are typed again slowly.
+ENTRY_MODES = ("fast", "paste", "slow")
+FAST_TYPING_INTERVAL = 0.01
+# how regions are watched while waiting for the screen to redraw.
+# a frame is stable once it differs from the previous one by at most FRAME_TOLERANCE grey levels on average
+FRAME_POLL_INTERVAL = 0.02
+FRAME_TOLERANCE = 1.5
+WAIT_TIMEOUT = 2.0
+# the fields read from every hero panel, by layout region.
+# "preprocess" is whether the crop is binarized before OCR and "profile" is the OCR profile it is read with
+PANEL_FIELDS = {
+    "sensitivity": {"preprocess": True, "profile": "sensitivity"},
+    "hero_name": {"preprocess": False, "profile": "hero_name"},
+}
 
 class ScreenController:
-    def __init__(self, human):
+    def __init__(self, human, curve_style="lines", layout=None, backend=None, capture=None, ocr_cache=None):
         """
         Initialize a ScreenController object.
 
         :param human: A flag indicating whether the controller should simulate human-like behavior.
         :type human: bool
+        :param curve_style: The style of the curves the cursor follows with human movement, see gen_curve.CURVE_STYLES.
+        :type curve_style: str
+        :param layout: The UI layout for the screen. Defaults to a layout for the detected resolution.
+        :type layout: Layout
+        :param backend: The backend mouse and keyboard events are sent through. Defaults to pyautogui.
+        :type backend: InputBackend
+        :param capture: The backend screenshots are taken with. Defaults to the fastest one installed.
+        :type capture: CaptureBackend
+        :param ocr_cache: The path of a file the OCR cache persists in between runs, such as ocr.OCR_CACHE_PATH.
+                          Defaults to keeping it in memory only.
+        :type ocr_cache: str
         :return: None
         """
         self.human = human
-
-    def click_in_area(self, area):
+        self.layout = layout or Layout()
+        self.input = backend or PyAutoGUIBackend(human=human)
+        self.capture = capture or get_capture_backend()
+        # the last position the cursor was moved to, and how far it has travelled in pixels
+        self.pos = None
+        self.travel = 0.0
+        self.curve_style = curve_style
+        # pixel-identical crops, such as repeated "3.00" values, are only ever read once
+        self.ocr_cache = OCRCache(path=ocr_cache)
+        self.ocr = OCRWorkerPool(cache=self.ocr_cache)
+        self.preprocess_buffers = PreprocessBuffers()
+
+    @traced("ScreenController.click_in_area")
+    def click_in_area(self, area, watch=None):
         """
         Generate a random position within a given area, move the cursor to that position, click on it, and wait for a random
         time interval to simulate human-like clicking behavior.
@@ -38,24 +77,150 @@ class ScreenController:
         :param area: A tuple of two tuples, each containing the (x, y) coordinates of the top-left and bottom-right corners
                      of the rectangular area.
         :type area: tuple
-        :return: None
+        :param watch: An area (left, top, width, height) the click should redraw, waited on before returning.
+        :type watch: tuple
+        :return: True if the watched area changed and settled, or if nothing was watched.
+        :rtype: bool
         """
         pos = get_pos_in_area(area)
         self.move_to_pos(pos)
-        pag.click()
+        return self.click(watch)
 
-    def click_on_pos(self, pos):
+    @traced("ScreenController.click_on_pos")
+    def click_on_pos(self, pos, watch=None):
         """
         Move the cursor to the given position and click on it while waiting for a random time interval to simulate human-like
         clicking behavior.
 
         :param pos: A tuple containing the (x, y) coordinates of the position to click on.
         :type pos: tuple
-        :return: None
+        :param watch: An area (left, top, width, height) the click should redraw, waited on before returning.
+        :type watch: tuple
+        :return: True if the watched area changed and settled, or if nothing was watched.
+        :rtype: bool
         """
         self.move_to_pos(pos)
-        pag.click()
+        return self.click(watch)
+
+    @traced("ScreenController.click")
+    def click(self, watch=None):
+        """
+        Click at the current position of the cursor.
+        When an area is watched, wait until the click has changed it and it has finished redrawing.
+
+        :param watch: An area (left, top, width, height) the click should redraw.
+        :type watch: tuple
+        :return: True if the watched area changed and settled, or if nothing was watched.
+        :rtype: bool
+        """
+        if watch is None:
+            self.input.click()
+            return True
+
+        reference = self.get_frame_signature(watch)
+        self.input.click()
+        if not self.wait_until_redrawn(watch, reference):
+            print("BAD!", "the click at", self.pos, "did not redraw", watch)
+            return False
+        return True
+
+    @traced("ScreenController.press")
+    def press(self, key, watch=None):
+        """
+        Press a key.
+        When an area is watched, wait until the key press has changed it and it has finished redrawing.
+
+        :param key: The key to press.
+        :type key: str
+        :param watch: An area (left, top, width, height) the key press should redraw.
+        :type watch: tuple
+        :return: True if the watched area changed and settled, or if nothing was watched.
+        :rtype: bool
+        """
+        if watch is None:
+            self.input.press(key)
+            return True
+
+        reference = self.get_frame_signature(watch)
+        self.input.press(key)
+        if not self.wait_until_redrawn(watch, reference):
+            print("BAD!", "pressing", key, "did not redraw", watch)
+            return False
+        return True
+
+    def wait_until_redrawn(self, area, reference, timeout=WAIT_TIMEOUT):
+        """
+        Wait until an action has been drawn, so the area can be read.
+        The area must first differ from the reference taken before the action, as the frame from before it
+        is already stable, and then stop changing.
+
+        :param area: The area in the format (left, top, width, height).
+        :type area: tuple
+        :param reference: The signature of the area before the action, from get_frame_signature.
+        :type reference: numpy.ndarray
+        :param timeout: The longest time to wait for each of the change and the settling in seconds.
+        :type timeout: float
+        :return: True if the area changed and settled.
+        :rtype: bool
+        """
+        return self.wait_until_changed(area, reference, timeout) and self.wait_until_stable(area, timeout)
+
+    def get_frame_signature(self, area):
+        """
+        Capture an area of the screen as a tiny grayscale thumbnail.
+
+        :param area: The area in the format (left, top, width, height).
+        :type area: tuple
+        :return: The signature of the area.
+        :rtype: numpy.ndarray
+        """
+        return get_frame_signature(self.capture.grab(area))
+
+    @traced("ScreenController.wait_until_stable")
+    def wait_until_stable(self, area, timeout=WAIT_TIMEOUT):
+        """
+        Poll an area of the screen until two consecutive frames stop changing.
+
+        :param area: The area in the format (left, top, width, height).
+        :type area: tuple
+        :param timeout: The longest time to wait in seconds.
+        :type timeout: float
+        :return: True if the area settled, False if it was still changing when the timeout ran out.
+        :rtype: bool
+        """
+        deadline = time.perf_counter() + timeout
+        previous = self.get_frame_signature(area)
+        while time.perf_counter() < deadline:
+            time.sleep(FRAME_POLL_INTERVAL)
+            current = self.get_frame_signature(area)
+            if get_frame_difference(previous, current) <= FRAME_TOLERANCE:
+                return True
+            previous = current
+        return False
+
+    @traced("ScreenController.wait_until_changed")
+    def wait_until_changed(self, area, reference, timeout=WAIT_TIMEOUT):
+        """
+        Poll an area of the screen until it differs from a reference frame, to confirm an action took effect.
 
+        :param area: The area in the format (left, top, width, height).
+        :type area: tuple
+        :param reference: The signature of the area before the action, from get_frame_signature.
+        :type reference: numpy.ndarray
+        :param timeout: The longest time to wait in seconds.
+        :type timeout: float
+        :return: True if the area changed, False if it had not when the timeout ran out.
+        :rtype: bool
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            if get_frame_difference(reference, self.get_frame_signature(area)) > FRAME_TOLERANCE:
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(FRAME_POLL_INTERVAL)
+
+    @traced("ScreenController.move_to_pos")
     def move_to_pos(self, pos):
         """
         Move the cursor to the given position.
@@ -64,29 +229,45 @@ class ScreenController:
         :type pos: tuple
         :return: None
         """
+        start_pos = self.get_position()
         if self.human:
-            start_pos = pag.position()
-            distance = get_distance(start_pos, pos)
-            num_points = int(distance // 50)
-            curve = get_curve(start_pos, pos, num_points)
+            curve = get_curve_array(start_pos, pos, style=self.curve_style)
             self.move_along_curve(curve)
-        pag.moveTo(pos, duration=random.uniform(0.01, 0.02), tween=random.choice(TWEENS))
+        self.input.move_to(pos)
+        self.travel += get_distance(start_pos, pos)
+        self.pos = tuple(pos)
+
+    def get_position(self):
+        """
+        Get the position of the cursor, only asking the input backend until the cursor has been moved once.
+
+        :return: The (x, y) position.
+        :rtype: tuple
+        """
+        if self.pos is None:
+            self.pos = tuple(self.input.position())
+        return self.pos
     
+    @traced("ScreenController.move_along_curve")
     def move_along_curve(self, curve):
         """
         Move the cursor along the specified curve.
 
-        :param curve: A list of (x, y) coordinates representing the curve.
-        :type curve: list
+        :param curve: An array of (x, y) coordinates representing the curve.
+        :type curve: numpy.ndarray
         :return: None
         """
+        # todo - tinker with how we travel along the curve
+        # only some of the points are visited, each kept when its index divides by a random step from 1 to 10
+        steps = np.random.randint(1, 11, len(curve))
+        waypoints = curve[np.arange(len(curve)) % steps == 0]
+        durations = np.random.uniform(0.005, 0.05, len(waypoints))
 
-        for i, (x, y) in enumerate(curve):
-            # todo - tinker with how we travel along the curve
-            if i % random.randint(1, 10) == 0: 
-                pag.moveTo(x, y, duration=random.uniform(0.005, 0.05))
+        for (x, y), duration in zip(waypoints.tolist(), durations.tolist()):
+            self.input.move_to((x, y), duration)
 
-    def get_text_from_position(self, pos, preprocess=False):
+    @traced("ScreenController.get_text_from_position")
+    def get_text_from_position(self, pos, preprocess=False, profile="default"):
         """
         Extract text from a given position on the screen using Tesseract OCR engine.
 
@@ -94,14 +275,36 @@ class ScreenController:
         :type pos: tuple
         :param preprocess: Whether to preprocess the screenshot before performing OCR. Defaults to False.
         :type preprocess: bool
+        :param profile: The OCR profile to read the area with, see ocr.OCR_PROFILES. Defaults to "default".
+        :type profile: str
         :return: The text extracted from the specified position on the screen, cleaned and formatted.
         :rtype: str
         """
         area = get_left_top_width_height(pos)
         img = self.get_cropped_screenshot(area, preprocess)
-        text = pytesseract.image_to_string(img)
-        return clean_string(text)
+        return self.ocr.read(img, profile)
+
+    @traced("ScreenController.capture_regions")
+    def capture_regions(self, areas):
+        """
+        Capture several areas of the screen from a single frame.
+        Only the bounding box of the areas is captured, and each area is a view into it.
 
+        :param areas: A dictionary mapping names to areas in the format (left, top, width, height).
+        :type areas: dict
+        :return: A dictionary mapping the same names to RGB arrays, which share the memory of one capture.
+        :rtype: dict
+        """
+        boxes = np.array(list(areas.values()), dtype=np.int64)
+        left, top = boxes[:, :2].min(axis=0)
+        right, bottom = (boxes[:, :2] + boxes[:, 2:]).max(axis=0)
+        frame = self.capture.grab((int(left), int(top), int(right - left), int(bottom - top)))
+        return {
+            name: crop(frame, (x - left, y - top, width, height))
+            for name, (x, y, width, height) in zip(areas, boxes.tolist())
+        }
+
+    @traced("ScreenController.get_cropped_screenshot")
     def get_cropped_screenshot(self, area, do_preprocess):
         """
         Get a cropped screenshot of a specified area on the screen.
@@ -110,87 +313,220 @@ class ScreenController:
         :type area: tuple
         :param do_preprocess: A flag indicating whether to preprocess the captured image before returning.
         :type do_preprocess: bool
-        :return: A PIL.Image object representing the captured screenshot.
-        :rtype: PIL.Image
+        :return: The captured screenshot as an RGB array, or a single channel PIL.Image if it was preprocessed.
+        :rtype: numpy.ndarray or PIL.Image
 
         Notes:
         - The area should be specified in screen coordinates.
         - If do_preprocess is True, the captured image will be preprocessed using the preprocess function before returning.
         """
-        img = pag.screenshot(region=area)
+        img = self.capture.grab(area)
         if do_preprocess:
-            img = preprocess(img)
+            img = preprocess(img, buffers=self.preprocess_buffers)
         return img
 
 class HeroManager:
-    def __init__(self, human):
+    def __init__(self, human, layout=None, input_profile=DEFAULT_INPUT_PROFILE, entry_mode="fast", processes=0, backend=None,
+                 capture=None, ocr_cache=None):
         """
         Initialize a HeroManager object.
 
         :param human: A flag indicating whether the manager should simulate human-like behavior.
         :type human: bool
+        :param layout: The UI layout for the screen. Defaults to a layout for the detected resolution.
+        :type layout: Layout
+        :param input_profile: The input profile to send events with, see input_backend.INPUT_PROFILES.
+        :type input_profile: str
+        :param entry_mode: How sensitivities are entered, one of ENTRY_MODES.
+        :type entry_mode: str
+        :param processes: The number of worker processes to match hero cards in, 0 matches them in threads.
+        :type processes: int
+        :param backend: The input backend to use instead of pyautogui with the input profile.
+        :type backend: InputBackend
+        :param capture: The capture backend to use instead of the fastest one installed.
+        :type capture: CaptureBackend
+        :param ocr_cache: The path of a file the OCR cache persists in between runs. Defaults to memory only.
+        :type ocr_cache: str
         :return: None
         """
-        self.ctrl = ScreenController(human)
-
-    def get_hero_data_locations(self, screenshot):
+        if entry_mode not in ENTRY_MODES:
+            raise ValueError(f"unknown entry mode {entry_mode}, expected one of {ENTRY_MODES}")
+        self.entry_mode = entry_mode
+        self.ctrl = ScreenController(
+            human, layout=layout, backend=backend or PyAutoGUIBackend(input_profile, human), capture=capture, ocr_cache=ocr_cache
+        )
+        self.layout = self.ctrl.layout
+        locator_kwargs = {
+            "confidence": LOCATE_CONFIDENCE,
+            "scale": self.layout.template_scale,
+            "roi": self.layout.area("hero_grid"),
+        }
+        # the worker processes are started once, each matching its share of the cards one at a time
+        self.pool = FramePool(dict(locator_kwargs, max_workers=1), processes) if processes else None
+        self.locator = HeroLocator(cache=LayoutCache(), pool=self.pool, **locator_kwargs)
+        # overlaps capturing each hero panel with moving the cursor, kept for the whole session
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.names = NameReferences()
+        # the estimated cursor travel of the last visit schedule in pixels
+        self.estimated_travel = 0.0
+
+    @traced("HeroManager.get_hero_data_locations")
+    def get_hero_data_locations(self, screenshot, checkpoint=None):
         """
         Get the locations of hero data from the given screenshot.
 
         :param screenshot: The screenshot to analyze.
-        :type screenshot: PIL.Image
-        :return: A list of dictionaries containing hero data, including name, sensitivity, and filepath.
+        :type screenshot: numpy.ndarray
+        :param checkpoint: A checkpoint to add each hero to as soon as it is read, rather than reading every hero
+                           together at the end. Heroes already in it are not visited again.
+        :type checkpoint: checkpoint.Checkpoint
+        :return: A list of dictionaries containing hero data, including id, name and sensitivity.
+                 With a checkpoint, the heroes read by earlier runs are included.
         :rtype: list
         """
-        data = []
-        filenames = [os.path.join("heroes", filename) for filename in os.listdir("heroes")]
-        
-        # use threading to speed up the process of finding the location for each hero card
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for img_path in filenames:
-                futures.append(executor.submit(self.get_hero_card_location, img_path, screenshot))
-            
-            for future in concurrent.futures.as_completed(futures):
-                # we can start capturing the settings for hero cards we have already located,
-                # while others are still being located.
-                # this speeds up execution significantly.
-                hero_img_path, location = future.result()
-                self.ctrl.click_on_pos(location)
-                pos = get_pos_in_area(CHANGE_HERO_POS)
+        located = []
+        name_imgs = {}
+        batch = BatchOCR(pool=self.ctrl.ocr)
+        reads = []
+        # with a checkpoint each hero is read in the background while the next ones are visited
+        reader = concurrent.futures.ThreadPoolExecutor(max_workers=1) if checkpoint is not None else None
+        # locate every hero card in a single pass over the screenshot
+        hero_img_paths = {hero_id: get_template_path(hero_id) for hero_id in HEROES}
+        matches = self.locator.locate_all(screenshot, list(hero_img_paths.values()))
+
+        found = {}
+        for hero_id, hero_img_path in hero_img_paths.items():
+            match = matches[hero_img_path]
+            if not match:
+                print("BAD!", hero_id, "does not fit in the hero grid")
+                continue
+            if not match["centre"]:
+                print("BAD!", hero_id, round(match["confidence"], 3))
+                continue
+            if checkpoint is not None and hero_id in checkpoint:
+                continue
+            found[hero_id] = match["centre"]
+
+        # every card is known up front, so the visits are ordered to keep the cursor travel short
+        visits = self.schedule_visits(found)
+        start_travel = self.ctrl.travel
+
+        panel = self.layout.area("hero_name")
+        for hero_id, location, pos in visits:
+            with visit(hero_id):
+                # wait for the hero panel to open, rather than reading whatever is on screen
+                if not self.ctrl.click_on_pos(location, panel):
+                    print("BAD!", hero_id, "the hero panel did not open")
+                    # the panel may still have opened late
+                    self.ctrl.click_on_pos(pos, panel)
+                    continue
 
                 # use threading to speed up the process of capturing the hero settings
-                # this grabs the hero settings using OCR
+                # this grabs the crops to be read by OCR
                 # and in parallel, it starts moving the cursor back to the required button
                 # so we can return to the hero page screen as soon as possible
-                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                    # get the sensitivity settings using OCR
-                    hero_data_future = executor.submit(self.get_hero_data)
-                    # move the cursor to the CHANGE_HERO button
-                    move_cursor_future = executor.submit(self.ctrl.move_to_pos, pos)
-                    sensitivity, hero_name = hero_data_future.result()
-                    move_cursor_future.result()
-                
-                pag.click(pos)
-
-                data.append(
-                    {"name": hero_name, "sensitivity": sensitivity, "filepath": hero_img_path}
-                )
-                print(hero_name, sensitivity)
-        
+                # capture the sensitivity and name crops
+                hero_crops_future = self.executor.submit(carry_context(self.get_hero_crops))
+                # move the cursor to the CHANGE_HERO button
+                move_cursor_future = self.executor.submit(carry_context(self.ctrl.move_to_pos), pos)
+                sensitivity_img, name_img = hero_crops_future.result()
+                move_cursor_future.result()
+
+                self.ctrl.click(panel)
+
+                # the hero is known from the card that was clicked, so the name is only read
+                # when the panel cannot be confirmed against its reference thumbnail
+                if self.names.matches(hero_id, name_img):
+                    name_img = None
+                if reader is not None:
+                    read = carry_context(self.read_hero_record)
+                    reads.append(reader.submit(read, hero_id, sensitivity_img, name_img, checkpoint))
+                    continue
+
+                # the crops are read together once every hero has been visited
+                batch.add((hero_id, "sensitivity"), sensitivity_img, "sensitivity")
+                if name_img is not None:
+                    batch.add((hero_id, "name"), name_img, "hero_name")
+                    name_imgs[hero_id] = name_img
+                located.append(hero_id)
+
+        self.report_travel(start_travel)
+        if reader is not None:
+            for read in reads:
+                read.result()
+            reader.shutdown()
+            return checkpoint.get_records()
+
+        texts = batch.run()
+        data = []
+        for hero_id in located:
+            record = self.get_hero_record(hero_id, texts, name_imgs.get(hero_id))
+            if record:
+                data.append(record)
         return data
 
+    def get_hero_record(self, hero_id, texts, name_img=None):
+        """
+        Build the settings record of a hero from the text read from its panel.
+
+        :param hero_id: The id of the hero whose card was clicked.
+        :type hero_id: str
+        :param texts: The text read from the panel, keyed by (hero id, "sensitivity") and (hero id, "name").
+        :type texts: dict
+        :param name_img: The crop of the name banner, when the name was read to confirm the panel.
+        :type name_img: numpy.ndarray
+        :return: The record, or None if the panel of a different hero was opened.
+        :rtype: dict
+        """
+        if name_img is not None:
+            read_name = texts[(hero_id, "name")]
+            if get_hero_id_by_name(read_name) != hero_id:
+                print("BAD!", hero_id, "opened the panel for", repr(read_name))
+                return None
+            self.names.store(hero_id, name_img)
+
+        hero_name = HEROES[hero_id]["name"]
+        sensitivity = texts[(hero_id, "sensitivity")]
+        print(hero_name, sensitivity)
+        return {"id": hero_id, "name": hero_name, "sensitivity": sensitivity}
+
+    def read_hero_record(self, hero_id, sensitivity_img, name_img, checkpoint):
+        """
+        Read the crops of a single hero panel and add its record to a checkpoint,
+        so it is on disk as soon as it is read.
+
+        :param hero_id: The id of the hero whose card was clicked.
+        :type hero_id: str
+        :param sensitivity_img: The preprocessed crop of the sensitivity field.
+        :type sensitivity_img: PIL.Image
+        :param name_img: The crop of the name banner, or None if the panel was confirmed by its reference thumbnail.
+        :type name_img: numpy.ndarray
+        :param checkpoint: The checkpoint to add the record to.
+        :type checkpoint: checkpoint.Checkpoint
+        :return: None
+        """
+        batch = BatchOCR(pool=self.ctrl.ocr)
+        batch.add((hero_id, "sensitivity"), sensitivity_img, "sensitivity")
+        if name_img is not None:
+            batch.add((hero_id, "name"), name_img, "hero_name")
+        record = self.get_hero_record(hero_id, batch.run(), name_img)
+        if record:
+            checkpoint.add(record)
+
     def get_hero_card_location(self, hero_img_path, screenshot):
         """
         Get the location of a hero card within the given screenshot.
+        This searches for a single hero at a time, HeroLocator.locate_all should be preferred.
 
         :param hero_img_path: The path to the hero image file.
         :type hero_img_path: str
         :param screenshot: The screenshot to search for the hero card.
-        :type screenshot: PIL.Image
+        :type screenshot: numpy.ndarray
         :return: A tuple containing the hero image path and the center coordinates of the hero card.
         :rtype: tuple
         """
+        import pyautogui as pag
+
         hero_card = pag.locate(hero_img_path, screenshot, confidence=LOCATE_CONFIDENCE)
         if not hero_card:
             print("BAD!")
@@ -199,6 +535,7 @@ class HeroManager:
         
         return hero_img_path, centre
 
+    @traced("HeroManager.get_hero_data")
     def get_hero_data(self):
         """
         Get hero sensitivity and name from the current screen position.
@@ -206,117 +543,449 @@ class HeroManager:
         :return: A tuple containing the hero sensitivity and name.
         :rtype: tuple
         """
-        sensitivity = self.ctrl.get_text_from_position(SENSITIVITY_POS, True)
-        hero_name = self.ctrl.get_text_from_position(HERO_NAME_POS)
-        return sensitivity, hero_name
+        texts = self.read_panel()
+        return texts["sensitivity"], texts["hero_name"]
+
+    @traced("HeroManager.get_panel_crops")
+    def get_panel_crops(self, fields=PANEL_FIELDS):
+        """
+        Capture the crops of the fields of the open hero panel, all from the same frame.
+
+        :param fields: The fields to capture, see PANEL_FIELDS.
+        :type fields: dict
+        :return: A dictionary mapping each field to its crop, binarized if the field is preprocessed.
+        :rtype: dict
+        """
+        crops = self.ctrl.capture_regions({name: self.layout.area(name) for name in fields})
+        for name, field in fields.items():
+            if field["preprocess"]:
+                crops[name] = preprocess(crops[name], buffers=self.ctrl.preprocess_buffers)
+        return crops
+
+    @traced("HeroManager.read_panel")
+    def read_panel(self, fields=PANEL_FIELDS):
+        """
+        Read the fields of the open hero panel with OCR.
+
+        :param fields: The fields to read, see PANEL_FIELDS.
+        :type fields: dict
+        :return: A dictionary mapping each field to its text.
+        :rtype: dict
+        """
+        crops = self.get_panel_crops(fields)
+        return {name: self.ctrl.ocr.read(crops[name], field["profile"]) for name, field in fields.items()}
+
+    def get_hero_crops(self):
+        """
+        Capture the hero sensitivity and name crops from the current screen, to be read later by OCR.
+
+        :return: A tuple containing the preprocessed sensitivity crop and the name crop.
+        :rtype: tuple
+        """
+        crops = self.get_panel_crops()
+        return crops["sensitivity"], crops["hero_name"]
 
+    @traced("HeroManager.get_all_heroes_screenshot")
     def get_all_heroes_screenshot(self):
         """
         Take a screenshot of the screen showing all the heroes.
 
         :return: The screenshot of all the heroes.
-        :rtype: PIL.Image
+        :rtype: numpy.ndarray
         """
         # this function assumes the user has pressed "ESC" after loading up their overwatch client
         # todo - press ESC yourself you lazy script
         
+        screen = (0, 0, *self.layout.resolution)
+        # each click waits for the next page to be drawn, watching a region which only appears on it
         # Click the 'Options' button
-        self.ctrl.click_in_area(OPTIONS_BTN_POS)
+        self.ctrl.click_in_area(self.layout.rect("options_btn"), self.layout.area("controls_btn"))
         # Click the 'Controls' button
-        self.ctrl.click_in_area(CONTROLS_BTN_POS)
+        self.ctrl.click_in_area(self.layout.rect("controls_btn"), self.layout.area("change_hero"))
         # Click the 'Change Hero' button
-        self.ctrl.click_in_area(CHANGE_HERO_POS)
+        self.ctrl.click_in_area(self.layout.rect("change_hero"), screen)
         # Move the cursor to a safe position to ensure no hero cards are highlighted
-        self.ctrl.move_to_pos(SAFE_EDGE)
-        # sleep so we take a screenshot of the correct page
-        time.sleep(1)
-        return pag.screenshot()
-
-    def set_hero_sensitivities(self, data):
+        self.ctrl.move_to_pos(self.layout.point("safe_edge"))
+        # wait for any highlight to fade so we take a screenshot of the settled page.
+        # the move only changes the page when a card was highlighted, so it is not waited on to change
+        self.ctrl.wait_until_stable(screen)
+        return self.ctrl.capture.grab()
+
+    @traced("HeroManager.set_hero_sensitivities")
+    def set_hero_sensitivities(self, data, all_heroes_img=None, checkpoint=None):
         """
         Set the sensitivities for the heroes using the provided data.
 
-        :param data: The hero data containing sensitivity, filepath, and name.
+        :param data: The hero data containing id, name and sensitivity.
         :type data: list
-        :return: None
+        :param all_heroes_img: A screenshot of the 'Change Hero' page, when it is already open.
+                               Defaults to opening the page and taking one.
+        :type all_heroes_img: PIL.Image
+        :param checkpoint: A checkpoint to add each hero to as soon as its sensitivity is set.
+        :type checkpoint: checkpoint.Checkpoint
+        :return: A dictionary with the "changed" and "failed" heroes, by id or by name if the hero is unknown.
+        :rtype: dict
         """
+        if all_heroes_img is None:
+            all_heroes_img = self.get_all_heroes_screenshot()
+        # settings saved before hero ids existed are matched by their filepath or name
+        hero_ids = [resolve_hero_id(hero) for hero in data]
+        hero_img_paths = [get_template_path(hero_id) for hero_id in hero_ids if hero_id]
+        matches = self.locator.locate_all(all_heroes_img, hero_img_paths)
+        slow_entries = 0
+        result = {"changed": [], "failed": []}
+
+        found = {}
+        sensitivities = {}
+        for hero, hero_id in zip(data, hero_ids):
+            if not hero_id:
+                print("BAD!", hero.get("name"), "is not a known hero")
+                result["failed"].append(hero.get("name"))
+                continue
 
-        all_heroes_img = self.get_all_heroes_screenshot()
-
-        for hero in data:
-            hero_card = pag.locate(
-                hero["filepath"], all_heroes_img, confidence=LOCATE_CONFIDENCE
-            )
-            if not hero_card:
+            match = matches[get_template_path(hero_id)]
+            centre = match["centre"] if match else None
+            if not centre:
                 # todo - handle heroes that cant be found (try them again afterwards?)
-                print("BAD!", hero["filepath"])
+                print("BAD!", hero_id)
+                result["failed"].append(hero_id)
                 continue
+            found[hero_id] = centre
+            sensitivities[hero_id] = hero["sensitivity"]
+
+        # every visit also clicks the sensitivity field, which is part of the route
+        visits = self.schedule_visits(found, self.layout.centre("sensitivity"))
+        start_travel = self.ctrl.travel
+
+        for hero_id, centre, hub in visits:
+            with visit(hero_id):
+
+                print(hero_id)
+                # click on the hero card and wait for its panel to open
+                panel = self.layout.area("hero_name")
+                opened = self.ctrl.click_on_pos(centre, panel)
+
+                # never type into the panel of a different hero
+                if not opened or self.names.matches(hero_id, self.ctrl.get_cropped_screenshot(panel, False)) is False:
+                    print("BAD!", hero_id, "the hero panel did not open")
+                    result["failed"].append(hero_id)
+                    self.ctrl.click_on_pos(hub, panel)
+                    continue
+
+                sensitivity = sensitivities[hero_id]
+                self.enter_sensitivity(sensitivity, self.entry_mode)
+                # a single read of the field confirms the value, only values which did not make it are typed slowly
+                if self.entry_mode != "slow" and not self.is_sensitivity_set(sensitivity):
+                    print("BAD!", hero_id, "the sensitivity was not entered, typing it slowly")
+                    slow_entries += 1
+                    self.enter_sensitivity(sensitivity, "slow")
+                    if not self.is_sensitivity_set(sensitivity):
+                        # never recorded as set, so a resumed run tries the hero again
+                        print("BAD!", hero_id, "the sensitivity was not set")
+                        result["failed"].append(hero_id)
+                        self.ctrl.click_on_pos(hub, panel)
+                        continue
+                result["changed"].append(hero_id)
+                if checkpoint is not None:
+                    checkpoint.add({"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": sensitivity})
+
+                # click to return to the 'Change Hero' page
+                self.ctrl.click_on_pos(hub, panel)
+
+        self.report_travel(start_travel)
+        if self.entry_mode != "slow":
+            print("Slow entries:", slow_entries)
+        return result
+
+    def close(self):
+        """
+        Stop the threads and worker processes of the session, close the OCR engines and cache and save the name references.
 
-            print(hero["filepath"])
-            # click on the hero card
-            centre = get_centre_pos_from_box(hero_card)
-            self.ctrl.click_on_pos(centre)
+        :return: None
+        """
+        self.executor.shutdown()
+        # the name references found during the session are written once, at the end of it
+        self.names.save()
+        if self.pool:
+            self.pool.close()
+        self.ctrl.ocr.close()
+        self.ctrl.ocr_cache.close()
+        self.ctrl.capture.close()
+
+    @traced("HeroManager.schedule_visits")
+    def schedule_visits(self, cards, via=None):
+        """
+        Order the hero visits to keep cursor travel short, see scheduler.VisitScheduler.
+
+        :param cards: A dictionary mapping hero ids to the (x, y) centre of their card.
+        :type cards: dict
+        :param via: A position clicked in the hero panel on every visit.
+        :type via: tuple
+        :return: A list of (hero id, card centre, hub point) tuples in visiting order,
+                 where the hub point is where to click the 'Change Hero' button afterwards.
+        :rtype: list
+        """
+        hero_ids = list(cards)
+        scheduler = VisitScheduler(self.layout.rect("change_hero"), via)
+        order, hubs, self.estimated_travel = scheduler.schedule([cards[hero_id] for hero_id in hero_ids], self.ctrl.get_position())
+        return [(hero_ids[i], cards[hero_ids[i]], hub) for i, hub in zip(order, hubs)]
 
-            # click on the sensitivity settings box
-            sens_centre = get_centre_pos(*get_left_top_width_height(SENSITIVITY_POS))
-            self.ctrl.click_on_pos(sens_centre)
+    def report_travel(self, start_travel):
+        """
+        Print the estimated cursor travel of the last schedule against how far the cursor actually went.
 
-            # select the current sensitivity to ensure it is overridden
-            pag.keyDown("ctrl")
-            pag.press("a")
-            pag.keyUp("ctrl")
+        :param start_travel: The travel of the controller when the visits started.
+        :type start_travel: float
+        :return: None
+        """
+        print("Travel: estimated", round(self.estimated_travel), "px, actual", round(self.ctrl.travel - start_travel), "px")
 
-            # input the desired sensitivity
-            pag.write(hero["sensitivity"], interval=TYPING_INTERVAL)
-            pag.press("enter")
+    @traced("HeroManager.enter_sensitivity")
+    def enter_sensitivity(self, sensitivity, mode):
+        """
+        Enter a sensitivity into the field of the open hero panel.
+
+        :param sensitivity: The sensitivity to enter.
+        :type sensitivity: str
+        :param mode: How the value is entered, one of ENTRY_MODES.
+        :type mode: str
+        :return: True if the field was redrawn once enter was pressed.
+        :rtype: bool
+        """
+        # click on the sensitivity settings box
+        self.ctrl.click_on_pos(self.layout.centre("sensitivity"))
+
+        # select the current sensitivity to ensure it is overridden
+        self.ctrl.input.key_down("ctrl")
+        self.ctrl.input.press("a")
+        self.ctrl.input.key_up("ctrl")
+
+        # input the desired sensitivity
+        if mode == "paste":
+            self.ctrl.input.paste(sensitivity)
+        elif mode == "fast":
+            self.ctrl.input.write(sensitivity, interval=FAST_TYPING_INTERVAL)
+        else:
+            self.ctrl.input.write(sensitivity, interval=TYPING_INTERVAL)
+        # the field is still being edited until enter is pressed, so it is redrawn once enter has taken effect
+        return self.ctrl.press("enter", self.layout.area("sensitivity"))
+
+    @traced("HeroManager.is_sensitivity_set")
+    def is_sensitivity_set(self, sensitivity):
+        """
+        Read the sensitivity field of the open hero panel and check it shows a value.
+        enter_sensitivity has already waited for the field to be redrawn.
 
-            # click to return to the 'Change Hero' page
-            self.ctrl.click_in_area(CHANGE_HERO_POS)
+        :param sensitivity: The sensitivity the field should show.
+        :type sensitivity: str
+        :return: True if the field shows the sensitivity.
+        :rtype: bool
+        """
+        read = self.ctrl.get_text_from_position(self.layout.rect("sensitivity"), True, "sensitivity")
+        expected = get_sensitivity_value(sensitivity)
+        return expected is not None and get_sensitivity_value(read) == expected
 
-def get_sensitivity_data(human_movement=True):
+def get_sensitivity_data(human_movement=True, input_profile=DEFAULT_INPUT_PROFILE, processes=0, layout=None, backend=None, capture=None,
+                         trace=None, checkpoint=None, ocr_cache=None):
     """Get sensitivity data for all heroes.
 
+    Args:
+        human_movement (bool): Whether the cursor should move like a human.
+        input_profile (str): The input profile to send events with, see input_backend.INPUT_PROFILES.
+        processes (int): The number of worker processes to match hero cards in, 0 matches them in threads.
+        layout (Layout): The UI layout to use instead of the one for the detected resolution.
+        backend (InputBackend): The input backend to use instead of pyautogui, such as a replay.
+        capture (CaptureBackend): The capture backend to use instead of the screen, such as a replay.
+        trace (str): The path to export a Chrome trace of the run to. Defaults to not tracing.
+        checkpoint (checkpoint.Checkpoint): A checkpoint each hero is added to as soon as it is read.
+                                            Heroes already in it, from a run that was interrupted, are not read again.
+        ocr_cache (str): The path of a file the OCR cache persists in between runs, such as ocr.OCR_CACHE_PATH.
+                         Defaults to keeping it in memory only.
+
     Returns:
         A list of dictionaries where each dictionary contains the following keys:
+        - id: the id of the hero in hero_registry.HEROES (str)
         - name: the name of the hero (str)
-        - sensitivity: the sensitivity of the hero (float)
-        - filepath: the filepath to the hero's image (str)
+        - sensitivity: the sensitivity of the hero (str)
     """
-    data = []
-    mgr = HeroManager(human_movement)
-    all_heroes_img = mgr.get_all_heroes_screenshot()
-    
-    data = mgr.get_hero_data_locations(all_heroes_img)
+    with trace_to(trace):
+        start = time.perf_counter()
+        mgr = HeroManager(
+            human_movement,
+            layout,
+            input_profile=input_profile,
+            processes=processes,
+            backend=backend,
+            capture=capture,
+            ocr_cache=ocr_cache,
+        )
+        # the worker processes and shared memory of the session are freed even when a run fails
+        try:
+            all_heroes_img = mgr.get_all_heroes_screenshot()
+            data = mgr.get_hero_data_locations(all_heroes_img, checkpoint)
+            print("OCR cache:", mgr.ctrl.ocr_cache.stats())
+            print("Input:", mgr.ctrl.input.get_report(time.perf_counter() - start))
+        finally:
+            mgr.close()
 
     return data
 
-def set_sensitivity_data(data, human_movement=True):
+def get_sensitivity_changes(data, current):
+    """
+    Build the smallest set of records that makes an account match the desired settings.
+
+    Args:
+        data (list): The desired settings records.
+        current (list): The settings records the account has now.
+
+    Returns:
+        tuple: The records whose sensitivity differs or is unknown, and the ids of the heroes which already match.
+    """
+    current_values = {}
+    for hero in current:
+        hero_id = resolve_hero_id(hero)
+        if hero_id:
+            current_values[hero_id] = get_sensitivity_value(hero.get("sensitivity"))
+
+    changes = []
+    skipped = []
+    for hero in data:
+        hero_id = resolve_hero_id(hero)
+        value = get_sensitivity_value(hero.get("sensitivity"))
+        # unknown heroes and unreadable values are kept, so they are reported as failures rather than hidden
+        if hero_id and value is not None and current_values.get(hero_id) == value:
+            skipped.append(hero_id)
+        else:
+            changes.append(hero)
+    return changes, skipped
+
+def set_sensitivity_data(data, human_movement=True, input_profile=DEFAULT_INPUT_PROFILE, entry_mode="fast", diff=False, snapshot=None,
+                         processes=0, layout=None, backend=None, capture=None, trace=None, checkpoint=None, ocr_cache=None):
     """
     Sets the sensitivity data for the heroes specified in the data list.
 
     Args:
         data (list): A list of dictionaries containing hero data. Each dictionary should have
-                     the following keys: 'name', 'sensitivity', and 'filepath'. 'name' is the
-                     name of the hero, 'sensitivity' is a string representing the sensitivity
-                     value, and 'filepath' is the file path of the hero image.
+                     the following keys: 'id', 'name' and 'sensitivity'. 'id' is the id of the
+                     hero in hero_registry.HEROES, 'name' is the name of the hero and
+                     'sensitivity' is a string representing the sensitivity value.
+                     Older settings with a 'filepath' instead of an 'id' are also accepted.
+        human_movement (bool): Whether the cursor should move like a human.
+        input_profile (str): The input profile to send events with, see input_backend.INPUT_PROFILES.
+        entry_mode (str): How sensitivities are entered, one of ENTRY_MODES.
+        diff (bool): Whether to only visit the heroes whose sensitivity differs from the account's current value.
+        snapshot (str): The path of a settings file holding the account's current values, saved earlier.
+                        When diff is set and the snapshot is missing, the values are read from the game instead.
+                        The snapshot is updated with the values that were set, and keeps the values of
+                        the other heroes in it.
+        processes (int): The number of worker processes to match hero cards in, 0 matches them in threads.
+        layout (Layout): The UI layout to use instead of the one for the detected resolution.
+        backend (InputBackend): The input backend to use instead of pyautogui, such as a replay.
+        capture (CaptureBackend): The capture backend to use instead of the screen, such as a replay.
+        trace (str): The path to export a Chrome trace of the run to. Defaults to not tracing.
+        checkpoint (checkpoint.Checkpoint): A checkpoint each hero is added to as soon as its sensitivity is set.
+                                            Heroes already set to the same value in it, by a run that was
+                                            interrupted, are skipped.
+        ocr_cache (str): The path of a file the OCR cache persists in between runs, such as ocr.OCR_CACHE_PATH.
+                         Defaults to keeping it in memory only.
 
     Returns:
-        None
+        dict: The "skipped", "changed" and "failed" heroes.
     """
-    mgr = HeroManager(human_movement)
-    mgr.set_hero_sensitivities(data)
+    with trace_to(trace):
+        start = time.perf_counter()
+        mgr = HeroManager(
+            human_movement,
+            layout,
+            input_profile=input_profile,
+            entry_mode=entry_mode,
+            processes=processes,
+            backend=backend,
+            capture=capture,
+            ocr_cache=ocr_cache,
+        )
+        try:
+            all_heroes_img = None
+            current = None
+            skipped = []
+            if snapshot and os.path.exists(snapshot):
+                # loaded even without diff, so the heroes that are not set keep their values in it
+                with open(snapshot, "r") as fn:
+                    current = json.load(fn)
+            if diff:
+                if current is None:
+                    # the capture finishes on the 'Change Hero' page, so its screenshot is reused to apply the changes
+                    all_heroes_img = mgr.get_all_heroes_screenshot()
+                    current = mgr.get_hero_data_locations(all_heroes_img)
+                data, skipped = get_sensitivity_changes(data, current)
+            if checkpoint is not None:
+                # the checkpoint holds the values this account already has, the same as a diff
+                data, resumed = get_sensitivity_changes(data, checkpoint.get_records())
+                skipped += resumed
+
+            result = mgr.set_hero_sensitivities(data, all_heroes_img, checkpoint)
+            summary = {"skipped": skipped, **result}
+            print("Skipped:", summary["skipped"], "Changed:", summary["changed"], "Failed:", summary["failed"])
+            print("OCR cache:", mgr.ctrl.ocr_cache.stats())
+            print("Input:", mgr.ctrl.input.get_report(time.perf_counter() - start))
+        finally:
+            mgr.close()
+
+    if snapshot:
+        values = {resolve_hero_id(hero): hero for hero in current or []}
+        for hero in data:
+            hero_id = resolve_hero_id(hero)
+            if hero_id in summary["changed"]:
+                values[hero_id] = {"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": hero["sensitivity"]}
+        if checkpoint is not None:
+            # including the heroes set before the run was interrupted
+            values.update((record["id"], record) for record in checkpoint.get_records())
+        values.pop(None, None)
+        with open(snapshot, "w+") as fn:
+            json.dump(list(values.values()), fn)
+
+    return summary
     
-def save_settings_to_json(filename, human_movement):
-    data = get_sensitivity_data(human_movement)
-    with open(filename, "w+") as fn:
-        json.dump(data, fn)
+def get_account_checkpoint(filename, direction, account):
+    """
+    Get the checkpoint of a run against an account, which only ever resumes a run against the same account.
+
+    Args:
+        filename (str): The path of the settings file.
+        direction (str): "get" for a capture or "set" for an apply.
+        account (str): The name of the account, or None if it is not known.
 
-def load_settings_from_json(filename, human_movement):
+    Returns:
+        checkpoint.Checkpoint: The checkpoint, or None when the account is not known, as a checkpoint
+        without one could have been left by a run against any account.
+    """
+    if not account:
+        return None
+    return Checkpoint(get_checkpoint_path(filename, direction, account), account)
+
+def save_settings_to_json(filename, human_movement, input_profile=DEFAULT_INPUT_PROFILE, account=None):
+    # every hero is checkpointed as soon as it is read, so an interrupted capture of a named account
+    # resumes where it stopped
+    checkpoint = get_account_checkpoint(filename, "get", account)
+    data = get_sensitivity_data(human_movement, input_profile, checkpoint=checkpoint)
+    write_json_atomic(filename, data)
+    if checkpoint is not None:
+        checkpoint.remove()
+
+def load_settings_from_json(filename, human_movement, input_profile=DEFAULT_INPUT_PROFILE, diff=False, snapshot=None, account=None):
+    # the checkpoint is only kept when the account is named, so an apply never resumes from the heroes
+    # set on a different account
     with open(filename, "r") as fn:
         data = json.load(fn)
-    set_sensitivity_data(data, human_movement)
+    checkpoint = get_account_checkpoint(filename, "set", account)
+    summary = set_sensitivity_data(data, human_movement, input_profile, diff=diff, snapshot=snapshot, checkpoint=checkpoint)
+    if checkpoint is not None:
+        checkpoint.remove()
+    return summary
 
 if __name__ == "__main__":
     # comment as necessary
     save_settings_to_json("settings.json", False)
     # load_settings_from_json("settings.json", False)
+    # only change the heroes that differ, reading the account first (or a snapshot of it saved earlier)
+    # load_settings_from_json("settings.json", False, diff=True, snapshot="target_settings.json")
@@ -0,0 +1,512 @@
+import queue
+import shelve
+import hashlib
+import threading
+import time
+import concurrent.futures
+from collections import OrderedDict
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from glyphs import GlyphRecognizer
+from tracing import carry_context, traced
+from utils import clean_string
+
+try:
+    # in-process tesseract bindings, which keep engines initialised between calls
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+STRIP_PADDING = 20
+STRIP_PSM = 6
+OCR_WORKERS = 2
+# how often a read waiting for an engine checks whether engines could be started at all
+ENGINE_POLL_INTERVAL = 0.1
+OCR_CACHE_SIZE = 512
+# where the OCR cache is kept between runs when persisting it is turned on
+OCR_CACHE_PATH = ".ocr_cache"
+
+# page segmentation mode and character whitelist for each kind of region that is read,
+# and whether the glyph recognizer is tried before tesseract
+OCR_PROFILES = {
+    "default": {"psm": 3, "whitelist": None, "glyphs": False},
+    # a single line such as "3.45"
+    "sensitivity": {"psm": 7, "whitelist": "0123456789.", "glyphs": True},
+    # a single line such as "D.VA" or "SOLDIER: 76"
+    "hero_name": {"psm": 7, "whitelist": "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.: ", "glyphs": False},
+}
+
+
+def get_tesseract_config(profile, psm=None):
+    """
+    Build the tesseract command line config for an OCR profile.
+
+    :param profile: The name of the OCR profile.
+    :type profile: str
+    :param psm: Overrides the page segmentation mode of the profile.
+    :type psm: int
+    :return: The tesseract config string.
+    :rtype: str
+    """
+    settings = OCR_PROFILES[profile]
+    config = f"--psm {psm or settings['psm']}"
+    if settings["whitelist"]:
+        # spaces cannot be passed through the command line whitelist
+        config += f" -c tessedit_char_whitelist={settings['whitelist'].replace(' ', '')}"
+    return config
+
+
+def to_ocr_image(img):
+    """
+    Convert a crop to a single channel PIL image for stitching.
+
+    :param img: The crop to convert.
+    :type img: PIL.Image or numpy.ndarray
+    :return: The crop as a grayscale PIL image.
+    :rtype: PIL.Image
+    """
+    if isinstance(img, np.ndarray):
+        img = Image.fromarray(img)
+    return img.convert("L")
+
+
+class OCRCache:
+    def __init__(self, size=OCR_CACHE_SIZE, path=None):
+        """
+        Initialize an OCRCache object, which remembers the text read from pixel-identical crops.
+        Recent results are kept in a bounded in-memory LRU, and optionally in a file which persists between runs.
+
+        :param size: The largest number of results kept in memory.
+        :type size: int
+        :param path: The path of the on-disk cache. Defaults to memory only.
+        :type path: str
+        :return: None
+        """
+        self.size = size
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.miss_time = 0.0
+        self.disk = shelve.open(path) if path else None
+
+    @staticmethod
+    def get_key(img, profile):
+        """
+        Build the cache key for a crop, from a hash of its pixels and the profile it is read with.
+        The settings of the profile are part of the key, so results persisted on disk are not reused
+        once the profile changes.
+
+        :param img: The crop, after preprocessing.
+        :type img: PIL.Image
+        :param profile: The name of the OCR profile.
+        :type profile: str
+        :return: The cache key.
+        :rtype: str
+        """
+        settings = OCR_PROFILES[profile]
+        digest = hashlib.blake2b(img.tobytes(), digest_size=16).hexdigest()
+        return (
+            f"{profile}:{settings['psm']}:{settings['whitelist']}:{settings['glyphs']}:"
+            f"{img.mode}:{img.width}x{img.height}:{digest}"
+        )
+
+    def get(self, key):
+        """
+        Look up the text read from a crop, counting the hit.
+        Misses are only counted once the crop has been read by tesseract and stored, so crops read by
+        the glyph recognizer, or looked up again before being read, do not count.
+
+        :param key: The cache key of the crop.
+        :type key: str
+        :return: The cached text, or None on a miss.
+        :rtype: str
+        """
+        with self.lock:
+            text = self.entries.get(key)
+            if text is None and self.disk is not None:
+                text = self.disk.get(key)
+                if text is not None:
+                    self.entries[key] = text
+            if text is None:
+                return None
+
+            self.entries.move_to_end(key)
+            self.trim()
+            self.hits += 1
+            return text
+
+    def put(self, key, text, elapsed=0.0):
+        """
+        Store the text read from a crop.
+
+        :param key: The cache key of the crop.
+        :type key: str
+        :param text: The text read from the crop.
+        :type text: str
+        :param elapsed: The time taken to read the crop, used to estimate the time the cache saves.
+        :type elapsed: float
+        :return: None
+        """
+        with self.lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            self.trim()
+            self.misses += 1
+            self.miss_time += elapsed
+            if self.disk is not None:
+                self.disk[key] = text
+
+    def trim(self):
+        """
+        Evict the least recently used results beyond the size of the cache. Must be called while holding the lock.
+
+        :return: None
+        """
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Get the hit and miss counters of the cache.
+
+        :return: A dictionary containing the hits, the misses read by tesseract, and an estimate of the seconds of
+                 OCR the hits saved.
+        :rtype: dict
+        """
+        with self.lock:
+            average_miss = self.miss_time / self.misses if self.misses else 0.0
+            return {"hits": self.hits, "misses": self.misses, "saved": round(self.hits * average_miss, 3)}
+
+    def close(self):
+        """
+        Close the on-disk cache.
+
+        :return: None
+        """
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+
+class OCRWorkerPool:
+    def __init__(self, workers=OCR_WORKERS, cache=None):
+        """
+        Initialize an OCRWorkerPool object, which keeps tesseract engines initialised between calls.
+        Engines are created lazily for each profile, up to the given number of workers.
+        When tesserocr is not installed, reads fall back to starting a tesseract process per call.
+
+        :param workers: The largest number of engines kept for each profile.
+        :type workers: int
+        :param cache: An optional cache of previously read crops.
+        :type cache: OCRCache
+        :return: None
+        """
+        self.workers = workers
+        self.cache = cache
+        self.glyphs = GlyphRecognizer()
+        self.engines = {profile: queue.Queue() for profile in OCR_PROFILES}
+        self.engine_counts = {profile: 0 for profile in OCR_PROFILES}
+        self.lock = threading.Lock()
+        # set once an engine fails to start, such as when tessdata is missing, after which reads use pytesseract
+        self.engine_failed = False
+
+    @property
+    def in_process(self):
+        """
+        Whether reads are served by long-lived in-process engines rather than a tesseract process per call.
+        """
+        return tesserocr is not None and not self.engine_failed
+
+    def create_engine(self, profile):
+        """
+        Create and configure a tesseract engine for a profile.
+
+        :param profile: The name of the OCR profile.
+        :type profile: str
+        :return: The initialised engine.
+        :rtype: tesserocr.PyTessBaseAPI
+        """
+        settings = OCR_PROFILES[profile]
+        engine = tesserocr.PyTessBaseAPI(psm=settings["psm"])
+        if settings["whitelist"]:
+            engine.SetVariable("tessedit_char_whitelist", settings["whitelist"])
+        return engine
+
+    def acquire(self, profile):
+        """
+        Take an idle engine for a profile, creating one if the profile has fewer engines than workers.
+
+        :param profile: The name of the OCR profile.
+        :type profile: str
+        :return: The engine, which must be handed back with release,
+                 or None if engines cannot be started and the read must fall back to pytesseract.
+        :rtype: tesserocr.PyTessBaseAPI
+        """
+        try:
+            return self.engines[profile].get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            create = self.engine_counts[profile] < self.workers
+            if create:
+                self.engine_counts[profile] += 1
+        if create:
+            try:
+                return self.create_engine(profile)
+            except RuntimeError as e:
+                # the slot is given back, so reads waiting for an engine are not left waiting forever
+                with self.lock:
+                    self.engine_counts[profile] -= 1
+                    self.engine_failed = True
+                print("BAD! tesseract engines could not be started, falling back to pytesseract:", e)
+                return None
+
+        while not self.engine_failed:
+            try:
+                return self.engines[profile].get(timeout=ENGINE_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return None
+
+    def release(self, profile, engine):
+        """
+        Hand an engine back to the pool.
+
+        :param profile: The name of the OCR profile the engine was acquired for.
+        :type profile: str
+        :param engine: The engine to hand back.
+        :type engine: tesserocr.PyTessBaseAPI
+        :return: None
+        """
+        self.engines[profile].put(engine)
+
+    def read_raw(self, img, profile="default"):
+        """
+        Read the text from an image without cleaning it.
+
+        :param img: The image to read.
+        :type img: PIL.Image or numpy.ndarray
+        :param profile: The name of the OCR profile to read the image with.
+        :type profile: str
+        :return: The raw text, as tesseract returns it.
+        :rtype: str
+        """
+        img = to_ocr_image(img)
+        engine = self.acquire(profile) if self.in_process else None
+        if engine is None:
+            return pytesseract.image_to_string(img, config=get_tesseract_config(profile))
+
+        try:
+            engine.SetImage(img)
+            return engine.GetUTF8Text()
+        finally:
+            self.release(profile, engine)
+
+    def read_fast(self, img, profile="default"):
+        """
+        Read the text from an image from the cache, or with the glyph recognizer if the profile allows it.
+
+        :param img: The image to read, binarized by utils.preprocess for profiles using the glyph recognizer.
+        :type img: PIL.Image or numpy.ndarray
+        :param profile: The name of the OCR profile to read the image with.
+        :type profile: str
+        :return: The text, or None if it is not cached and the glyph recognizer is not used or not confident.
+        :rtype: str
+        """
+        img = to_ocr_image(img)
+        if self.cache:
+            text = self.cache.get(self.cache.get_key(img, profile))
+            if text is not None:
+                return text
+
+        if not OCR_PROFILES[profile]["glyphs"]:
+            return None
+        return self.glyphs.read(img)
+
+    def store(self, img, profile, text, elapsed=0.0):
+        """
+        Remember the text read from an image, if the pool has a cache.
+
+        :param img: The image that was read.
+        :type img: PIL.Image or numpy.ndarray
+        :param profile: The name of the OCR profile the image was read with.
+        :type profile: str
+        :param text: The cleaned text.
+        :type text: str
+        :param elapsed: The time taken to read the image.
+        :type elapsed: float
+        :return: None
+        """
+        if self.cache:
+            self.cache.put(self.cache.get_key(to_ocr_image(img), profile), text, elapsed)
+
+    @traced("OCRWorkerPool.read")
+    def read(self, img, profile="default"):
+        """
+        Read the text from an image, falling back to tesseract when neither the cache nor the glyph recognizer can.
+
+        :param img: The image to read.
+        :type img: PIL.Image or numpy.ndarray
+        :param profile: The name of the OCR profile to read the image with.
+        :type profile: str
+        :return: The cleaned text.
+        :rtype: str
+        """
+        img = to_ocr_image(img)
+        text = self.read_fast(img, profile)
+        if text is not None:
+            return text
+
+        start = time.perf_counter()
+        text = clean_string(self.read_raw(img, profile))
+        self.store(img, profile, text, time.perf_counter() - start)
+        return text
+
+    def close(self):
+        """
+        Shut down every engine in the pool.
+
+        :return: None
+        """
+        for profile, engines in self.engines.items():
+            while not engines.empty():
+                engines.get_nowait().End()
+            self.engine_counts[profile] = 0
+
+
+class BatchOCR:
+    def __init__(self, pool=None, batch_size=None, padding=STRIP_PADDING):
+        """
+        Initialize a BatchOCR object. Crops are queued up and read together once every crop has been captured.
+        With an in-process worker pool, each crop is read by a long-lived engine for its profile.
+        Otherwise the crops of each profile are stitched together and read with a single tesseract call per batch,
+        rather than starting a tesseract process for every crop.
+
+        :param pool: The worker pool to read crops with.
+        :type pool: OCRWorkerPool
+        :param batch_size: The largest number of crops stitched into a single image. Defaults to all of them.
+        :type batch_size: int
+        :param padding: The number of blank pixels around each crop in the stitched image.
+        :type padding: int
+        :return: None
+        """
+        self.pool = pool
+        self.batch_size = batch_size
+        self.padding = padding
+        self.crops = []
+        self.texts = {}
+
+    def add(self, key, img, profile="default"):
+        """
+        Queue a crop to be read on the next run.
+
+        :param key: The key the text of the crop will be returned under.
+        :type key: hashable
+        :param img: The crop to read.
+        :type img: PIL.Image or numpy.ndarray
+        :param profile: The name of the OCR profile to read the crop with.
+        :type profile: str
+        :return: None
+        """
+        # crops the glyph recognizer can read never need to reach tesseract
+        text = self.pool.read_fast(img, profile) if self.pool else None
+        if text is not None:
+            self.texts[key] = text
+            return
+        self.crops.append((key, to_ocr_image(img), profile))
+
+    def stitch(self, crops):
+        """
+        Stitch crops into a single vertical strip.
+
+        :param crops: A list of (key, image, profile) tuples.
+        :type crops: list
+        :return: A tuple containing the strip, and the (top, bottom) rows each crop occupies in it.
+        :rtype: tuple
+        """
+        width = max(img.width for _, img, _ in crops) + 2 * self.padding
+        height = sum(img.height + self.padding for _, img, _ in crops) + self.padding
+        strip = Image.new("L", (width, height), 255)
+
+        bands = []
+        top = self.padding
+        for _, img, _ in crops:
+            strip.paste(img, (self.padding, top))
+            bands.append((top, top + img.height))
+            top += img.height + self.padding
+        return strip, bands
+
+    def read_batch(self, crops, profile):
+        """
+        Read a single batch of crops with one tesseract call.
+        Each recognised word is mapped back to the crop containing the centre of its bounding box.
+
+        :param crops: A list of (key, image, profile) tuples.
+        :type crops: list
+        :param profile: The name of the OCR profile shared by the crops.
+        :type profile: str
+        :return: A dictionary mapping each key to the cleaned text of its crop.
+        :rtype: dict
+        """
+        strip, bands = self.stitch(crops)
+        config = get_tesseract_config(profile, psm=STRIP_PSM)
+        words = pytesseract.image_to_data(strip, config=config, output_type=pytesseract.Output.DICT)
+
+        band_centres = np.array([(top + bottom) / 2 for top, bottom in bands])
+        lines = [{} for _ in crops]
+        for i, word in enumerate(words["text"]):
+            if not word.strip():
+                continue
+            centre = words["top"][i] + words["height"][i] / 2
+            # words landing in the padding are given to the nearest crop
+            crop_idx = int(np.argmin(np.abs(band_centres - centre)))
+            line_key = (words["block_num"][i], words["par_num"][i], words["line_num"][i])
+            lines[crop_idx].setdefault(line_key, []).append(word)
+
+        texts = {}
+        for (key, _, _), crop_lines in zip(crops, lines):
+            text = "\n".join(" ".join(line) for line in crop_lines.values())
+            # match the trailing characters of image_to_string so clean_string behaves the same
+            texts[key] = clean_string(text + "\n\x0c")
+        return texts
+
+    @traced("BatchOCR.run")
+    def run(self):
+        """
+        Read every queued crop and clear the queue.
+
+        :return: A dictionary mapping each key to the cleaned text of its crop.
+        :rtype: dict
+        """
+        crops, self.crops = self.crops, []
+        texts, self.texts = self.texts, {}
+
+        if self.pool and self.pool.in_process:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.pool.workers) as executor:
+                read_texts = executor.map(carry_context(lambda crop: self.pool.read(crop[1], crop[2])), crops)
+                texts.update((key, text) for (key, _, _), text in zip(crops, read_texts))
+            return texts
+
+        # crops are stitched per profile, so each strip can be read with its own whitelist
+        by_profile = {}
+        for crop in crops:
+            by_profile.setdefault(crop[2], []).append(crop)
+
+        for profile, profile_crops in by_profile.items():
+            batch_size = self.batch_size or len(profile_crops)
+            for start in range(0, len(profile_crops), batch_size):
+                chunk = profile_crops[start:start + batch_size]
+                read_start = time.perf_counter()
+                chunk_texts = self.read_batch(chunk, profile)
+                elapsed = (time.perf_counter() - read_start) / len(chunk)
+                if self.pool:
+                    for key, img, _ in chunk:
+                        self.pool.store(img, profile, chunk_texts[key], elapsed)
+                texts.update(chunk_texts)
+        return texts
@@ -0,0 +1,169 @@
+"""
+A stand-in for the game screen, replaying recorded screenshots so whole runs can be driven headless
+together with input_backend.RecordingBackend.
+
+A recordings directory holds screenshots taken at a single resolution:
+
+    grid.png              the 'Change Hero' page
+    panels/<hero_id>.png  the panel of each hero, after its card was clicked
+    menu.png              the Esc menu (optional)
+    options.png           the 'Options' page (optional)
+    controls.png          the 'Controls' page (optional)
+
+Missing menu pages are replaced by plain frames, so navigating still changes the screen.
+"""
+import os
+import time
+
+import numpy as np
+
+from capture import CaptureBackend, ReplayCapture, crop
+from hero_registry import HEROES, get_template_path
+from layout import Layout
+from locator import HeroLocator
+
+# the pages before the 'Change Hero' page, in the order they are clicked through
+MENU_PAGES = ("menu", "options", "controls")
+
+
+def in_rect(pos, rect):
+    """
+    Whether a position is inside a region given as its top-left and bottom-right corners.
+    """
+    (left, top), (right, bottom) = rect
+    return left <= pos[0] <= right and top <= pos[1] <= bottom
+
+
+class ReplayScreen(CaptureBackend):
+    name = "replay"
+
+    def __init__(self, grid, panels, pages=None, layout=None):
+        """
+        Initialize a ReplayScreen object, which serves recorded frames and moves between them as the script clicks.
+        The cards on the grid are located once, up front, so clicks can be mapped to heroes.
+
+        :param grid: The 'Change Hero' page, as an RGB array.
+        :type grid: numpy.ndarray
+        :param panels: A dictionary mapping hero ids to their panel, as RGB arrays.
+        :type panels: dict
+        :param pages: A dictionary mapping the MENU_PAGES to RGB arrays. Missing pages are plain frames.
+        :type pages: dict
+        :param layout: The layout of the recordings. Defaults to a layout for the resolution of the grid.
+        :type layout: Layout
+        :return: None
+        """
+        height, width = grid.shape[:2]
+        self.layout = layout or Layout((width, height))
+        self.frames = {"grid": grid, **{("panel", hero_id): panel for hero_id, panel in panels.items()}}
+        pages = pages or {}
+        for i, page in enumerate(MENU_PAGES):
+            self.frames[page] = pages.get(page, np.full((height, width, 3), 40 + 30 * i, dtype=np.uint8))
+
+        locator = HeroLocator(scale=self.layout.template_scale)
+        matches = locator.locate_all(grid, [get_template_path(hero_id) for hero_id in panels])
+        self.cards = {
+            hero_id: matches[get_template_path(hero_id)]["box"]
+            for hero_id in panels
+            if matches[get_template_path(hero_id)] and matches[get_template_path(hero_id)]["centre"]
+        }
+
+        self.reset()
+
+    def reset(self):
+        """
+        Go back to the Esc menu and forget every visit, ready for another run.
+        """
+        self.page = "menu"
+        # every time a hero panel was opened and closed, as (hero id, opened, closed) perf_counter times
+        self.visits = []
+        # the text entered into each hero panel
+        self.typed = {}
+
+    @classmethod
+    def from_dir(cls, recordings_dir):
+        """
+        Create a replay from a recordings directory, see the module docstring.
+
+        :param recordings_dir: The recordings directory.
+        :type recordings_dir: str
+        :return: The replay.
+        :rtype: ReplayScreen
+        """
+        load = ReplayCapture.load_frame
+        grid = load(os.path.join(recordings_dir, "grid.png"))
+        panels_dir = os.path.join(recordings_dir, "panels")
+        panels = {
+            os.path.splitext(name)[0]: load(os.path.join(panels_dir, name))
+            for name in sorted(os.listdir(panels_dir))
+            if name.endswith(".png") and os.path.splitext(name)[0] in HEROES
+        }
+        pages = {
+            page: load(os.path.join(recordings_dir, f"{page}.png"))
+            for page in MENU_PAGES
+            if os.path.exists(os.path.join(recordings_dir, f"{page}.png"))
+        }
+        return cls(grid, panels, pages)
+
+    @property
+    def hero(self):
+        """
+        The hero whose panel is open, or None.
+        """
+        return self.page[1] if isinstance(self.page, tuple) else None
+
+    def grab(self, area=None):
+        frame = self.frames[self.page]
+        if area is None:
+            return frame
+        return crop(frame, area)
+
+    def on_input(self, event):
+        """
+        React to an event from input_backend.RecordingBackend, like the game would.
+
+        :param event: The event, as a tuple of its name followed by its arguments.
+        :type event: tuple
+        :return: None
+        """
+        name = event[0]
+        if name == "click":
+            self.click(event[1])
+        elif name in ("write", "paste") and self.hero:
+            self.typed[self.hero] = event[1]
+
+    def click(self, pos):
+        """
+        Move between pages like the game would for a click at a position.
+
+        :param pos: The (x, y) position clicked.
+        :type pos: tuple
+        :return: None
+        """
+        if self.page == "menu" and in_rect(pos, self.layout.rect("options_btn")):
+            self.page = "options"
+        elif self.page == "options" and in_rect(pos, self.layout.rect("controls_btn")):
+            self.page = "controls"
+        elif self.page == "controls" and in_rect(pos, self.layout.rect("change_hero")):
+            self.page = "grid"
+        elif self.page == "grid":
+            for hero_id, (left, top, width, height) in self.cards.items():
+                if in_rect(pos, ((left, top), (left + width, top + height))):
+                    self.page = ("panel", hero_id)
+                    self.visits.append([hero_id, time.perf_counter(), None])
+                    break
+        elif self.hero and in_rect(pos, self.layout.rect("change_hero")):
+            self.visits[-1][2] = time.perf_counter()
+            self.page = "grid"
+
+    def get_hero_times(self):
+        """
+        Get how long each hero panel was open for.
+
+        :return: A dictionary mapping hero ids to seconds, summed over every visit.
+        :rtype: dict
+        """
+        times = {}
+        for hero_id, opened, closed in self.visits:
+            if closed is not None:
+                times[hero_id] = times.get(hero_id, 0.0) + closed - opened
+        return times
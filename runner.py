@@ -0,0 +1,267 @@
+"""
+Run settings syncs for many accounts at once, each job in its own process against its own X display.
+
+Usage:
+    python runner.py <jobs.json> [concurrency] [results.json]
+
+jobs.json is a list of jobs, each a dictionary with:
+
+    settings     the settings file to save to ("get") or load from ("set")
+    direction    "get" or "set"
+    display      the X display the game client of the job runs on, such as ":101",
+                 or "simulate" to run against simulator.SimulatedClient instead
+    name         optional, defaults to the direction, settings file and index of the job
+    xvfb         optional, start an Xvfb server on the display for the length of the job
+    resolution   optional [width, height] of the Xvfb server or the simulated client, defaults to 2560x1440
+    simulate     optional keyword arguments of the simulated client, such as {"latency": 0.05, "noise": 2}
+    diff         optional, only change the heroes that differ when setting
+
+Every job runs in its own working directory under RUNNER_DIR, which keeps its caches apart from the other jobs.
+The hero card templates are shared through the memory-mapped template bundle, which is built once before
+the jobs start. tesseract engines cannot be shared between processes, so each job keeps its own pool.
+
+Xvfb displays can be tested headless against the simulated client, or with a client running on each display:
+
+    Xvfb :101 -screen 0 2560x1440x24 &
+    DISPLAY=:101 <start the game client>
+"""
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+
+from checkpoint import Checkpoint, get_checkpoint_path, write_json_atomic
+from glyphs import GLYPH_PATH
+from template_bundle import BUNDLE_PATH, HEROES_DIR, build_bundle, is_bundle_current
+from utils import SET_HEIGHT, SET_WIDTH
+
+RUNNER_DIR = ".runner"
+DIRECTIONS = ("get", "set")
+SIMULATED_DISPLAY = "simulate"
+# files every job reads but never writes, linked into the working directory of each job
+SHARED_FILES = (HEROES_DIR, BUNDLE_PATH, GLYPH_PATH)
+XVFB_TIMEOUT = 5.0
+
+
+def link_shared_files(workdir):
+    """
+    Link the hero card templates, the template bundle and the glyph set into a working directory,
+    copying them where links are not supported.
+
+    Args:
+        workdir (str): The working directory.
+    """
+    for name in SHARED_FILES:
+        target = os.path.join(workdir, name)
+        if not os.path.exists(name) or os.path.lexists(target):
+            continue
+        try:
+            os.symlink(os.path.abspath(name), target)
+        except OSError:
+            (shutil.copytree if os.path.isdir(name) else shutil.copy)(name, target)
+
+
+@contextlib.contextmanager
+def xvfb(display, resolution):
+    """
+    Run an Xvfb server on a display until the block exits.
+
+    Args:
+        display (str): The display, such as ":101".
+        resolution (tuple): The (width, height) of the screen.
+    """
+    width, height = resolution
+    process = subprocess.Popen(
+        ["Xvfb", display, "-screen", "0", f"{width}x{height}x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        # the server is ready once its socket exists
+        socket_path = f"/tmp/.X11-unix/X{display.lstrip(':').split('.')[0]}"
+        deadline = time.perf_counter() + XVFB_TIMEOUT
+        while not os.path.exists(socket_path):
+            if process.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError(f"Xvfb did not start on {display}")
+            time.sleep(0.05)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def get_session_kwargs(job):
+    """
+    Get the arguments a job runs its session with, creating the simulated client when the job uses one.
+
+    Args:
+        job (dict): The job.
+
+    Returns:
+        A tuple containing the keyword arguments for main.get_sensitivity_data or main.set_sensitivity_data,
+        and the simulated client or None.
+    """
+    if job["display"] != SIMULATED_DISPLAY:
+        return {}, None
+
+    from input_backend import RecordingBackend
+    from simulator import SimulatedClient
+
+    sensitivities = None
+    if job["direction"] == "get" and os.path.exists(job["settings"]):
+        # a capture reads back the settings the file was made with
+        with open(job["settings"], "r") as fn:
+            sensitivities = {hero["id"]: hero["sensitivity"] for hero in json.load(fn) if "id" in hero}
+    screen = SimulatedClient(job["resolution"], sensitivities=sensitivities, **job.get("simulate", {}))
+    kwargs = {"layout": screen.layout, "backend": RecordingBackend("turbo", screen=screen), "capture": screen}
+    return kwargs, screen
+
+
+def run_job(job):
+    """
+    Run a single job in the current process, from its own working directory and display.
+    Anything the job prints is written to a log in its working directory.
+
+    Args:
+        job (dict): The job, with its paths made absolute and its defaults filled in by BatchRunner.
+
+    Returns:
+        dict: The result of the job, see BatchRunner.run.
+    """
+    result = {"name": job["name"], "direction": job["direction"], "display": job["display"], "ok": False}
+    start = time.perf_counter()
+    os.makedirs(job["workdir"], exist_ok=True)
+    link_shared_files(job["workdir"])
+    os.chdir(job["workdir"])
+    if job["display"] != SIMULATED_DISPLAY:
+        # set before pyautogui or mss are imported, they connect to the display named here
+        os.environ["DISPLAY"] = job["display"]
+
+    log_path = os.path.join(job["workdir"], "job.log")
+    with open(log_path, "w") as log, contextlib.redirect_stdout(log), contextlib.ExitStack() as stack:
+        try:
+            if job.get("xvfb"):
+                stack.enter_context(xvfb(job["display"], job["resolution"]))
+            # imported once the display is set
+            import main
+
+            kwargs, screen = get_session_kwargs(job)
+            # a job which is run again after being interrupted resumes from its checkpoint,
+            # which is its own even when other jobs use the same settings file
+            checkpoint = Checkpoint(get_checkpoint_path(job["settings"], job["direction"], job["name"]), job["name"])
+            if job["direction"] == "get":
+                data = main.get_sensitivity_data(False, checkpoint=checkpoint, **kwargs)
+                write_json_atomic(job["settings"], data)
+                result["heroes"] = len(data)
+            else:
+                with open(job["settings"], "r") as fn:
+                    data = json.load(fn)
+                changes = main.set_sensitivity_data(data, False, diff=job.get("diff", False), checkpoint=checkpoint, **kwargs)
+                result["changed"] = changes["changed"]
+                result["failed"] = changes["failed"]
+            checkpoint.remove()
+            if screen is not None:
+                result["mismatches"] = screen.check(data)
+            result["ok"] = True
+        except Exception as e:
+            traceback.print_exc(file=sys.stdout)
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["log"] = log_path
+    return result
+
+
+class BatchRunner:
+    def __init__(self, jobs, concurrency=2, runner_dir=RUNNER_DIR, base_dir=None):
+        """
+        Initialize a BatchRunner object, which runs jobs concurrently in their own processes.
+        Processes are started fresh for every job, as the display a process talks to is fixed once it connects.
+
+        :param jobs: The jobs, see the module docstring.
+        :type jobs: list
+        :param concurrency: The largest number of jobs running at once.
+        :type concurrency: int
+        :param runner_dir: The directory the working directories of the jobs are made in.
+        :type runner_dir: str
+        :param base_dir: The directory relative settings files are found in. Defaults to the current directory.
+        :type base_dir: str
+        :return: None
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.runner_dir = os.path.abspath(runner_dir)
+        self.base_dir = os.path.abspath(base_dir or os.getcwd())
+        self.jobs = [self.prepare_job(job, i) for i, job in enumerate(jobs)]
+
+    def prepare_job(self, job, index):
+        """
+        Check a job and fill in its defaults, making its paths absolute so it can run from any directory.
+
+        :param job: The job.
+        :type job: dict
+        :param index: The position of the job in the batch.
+        :type index: int
+        :return: The prepared job.
+        :rtype: dict
+        """
+        if job.get("direction") not in DIRECTIONS:
+            raise ValueError(f"job {index} has unknown direction {job.get('direction')}, expected one of {DIRECTIONS}")
+        if not job.get("settings"):
+            raise ValueError(f"job {index} has no settings file")
+        if not job.get("display"):
+            raise ValueError(f"job {index} has no display")
+
+        job = dict(job)
+        job.setdefault("name", f"{job['direction']}-{os.path.splitext(os.path.basename(job['settings']))[0]}-{index}")
+        job["settings"] = os.path.join(self.base_dir, job["settings"])
+        job["resolution"] = tuple(job.get("resolution") or (SET_WIDTH, SET_HEIGHT))
+        job["workdir"] = os.path.join(self.runner_dir, job["name"])
+        return job
+
+    def run(self):
+        """
+        Run every job, at most concurrency at a time, in the order they were given.
+
+        :return: A list with the result of each job in order, as a dictionary with its "name", "direction",
+                 "display", whether it finished ("ok"), how long it took ("seconds") and the path of its "log".
+                 Captures add the number of "heroes" read and applies the "changed" and "failed" heroes.
+                 Jobs against the simulated client add the heroes it holds different "mismatches" for,
+                 and jobs which raised add the "error".
+        :rtype: list
+        """
+        # every job memory-maps the same bundle, so it is built once here rather than by each job
+        if not is_bundle_current(BUNDLE_PATH, HEROES_DIR):
+            build_bundle(HEROES_DIR, BUNDLE_PATH)
+
+        # spawned processes never inherit a display connection or threads from this one
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.concurrency, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1
+        )
+        with executor:
+            futures = [executor.submit(run_job, job) for job in self.jobs]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                status = "ok" if result["ok"] else "FAILED " + result.get("error", "")
+                print(f"{result['name']} on {result['display']}: {status} in {result['seconds']} s")
+            return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[1], "r") as fn:
+        jobs = json.load(fn)
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    # settings files are relative to the jobs file
+    results = BatchRunner(jobs, concurrency, base_dir=os.path.dirname(os.path.abspath(sys.argv[1]))).run()
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "w") as fn:
+            json.dump(results, fn, indent=1)
+    print(sum(result["ok"] for result in results), "of", len(results), "jobs finished")
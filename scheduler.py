@@ -0,0 +1,168 @@
+import numpy as np
+
+# hub points are kept this far inside the button, so the click never lands on its edge
+HUB_MARGIN = 5
+
+
+def get_path_length(points):
+    """
+    Get the length of a path through a sequence of positions.
+
+    :param points: The (x, y) positions in the order they are visited.
+    :type points: list
+    :return: The total straight line distance in pixels.
+    :rtype: float
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return 0.0
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+
+def get_hub_points(starts, ends, hub_rect, margin=HUB_MARGIN):
+    """
+    Pick where to click the hub button on the way between pairs of positions.
+    Each hub point is the point of the button closest to the midpoint of its pair,
+    which keeps the detour through the button short.
+
+    :param starts: An array of shape (n, 2) of the positions the cursor leaves from.
+    :type starts: numpy.ndarray
+    :param ends: An array of shape (n, 2) of the positions the cursor heads to afterwards.
+    :type ends: numpy.ndarray
+    :param hub_rect: The button as its top-left and bottom-right corners.
+    :type hub_rect: tuple
+    :param margin: How far inside the button the points are kept.
+    :type margin: int
+    :return: An array of shape (n, 2) of hub points.
+    :rtype: numpy.ndarray
+    """
+    (left, top), (right, bottom) = hub_rect
+    low = np.array([min(left + margin, right), min(top + margin, bottom)])
+    high = np.array([max(right - margin, left), max(bottom - margin, top)])
+    return np.rint(np.clip((starts + ends) / 2, low, high))
+
+
+class VisitScheduler:
+    def __init__(self, hub_rect, via=None):
+        """
+        Initialize a VisitScheduler object, which orders hero card visits to keep cursor travel short.
+        Every visit clicks a card, optionally a fixed position in the hero panel, and then the hub button
+        which returns to the card grid.
+
+        :param hub_rect: The button clicked to return to the card grid, as its top-left and bottom-right corners.
+        :type hub_rect: tuple
+        :param via: A position clicked in the hero panel on every visit, such as the sensitivity field.
+        :type via: tuple
+        :return: None
+        """
+        self.hub_rect = hub_rect
+        self.via = via
+
+    def get_leave_points(self, cards):
+        """
+        The positions the cursor leaves a visit from on its way to the hub.
+        """
+        if self.via is None:
+            return cards
+        return np.broadcast_to(np.asarray(self.via, dtype=np.float64), cards.shape)
+
+    def get_costs(self, cards):
+        """
+        Get the travel between every pair of visits, from leaving one card through the hub to the next card.
+
+        :param cards: An array of shape (n, 2) of card positions.
+        :type cards: numpy.ndarray
+        :return: An array of shape (n, n) where [i, j] is the travel from visit i to visit j.
+        :rtype: numpy.ndarray
+        """
+        leaves = self.get_leave_points(cards)
+        n = len(cards)
+        starts = np.repeat(leaves, n, axis=0)
+        ends = np.tile(cards, (n, 1))
+        hubs = get_hub_points(starts, ends, self.hub_rect)
+        costs = np.hypot(*(hubs - starts).T) + np.hypot(*(ends - hubs).T)
+        return costs.reshape(n, n)
+
+    def get_route_cost(self, order, costs, start_costs):
+        """
+        Get the travel of a route, from the start position through every visit in order.
+        """
+        return float(start_costs[order[0]] + costs[order[:-1], order[1:]].sum())
+
+    def schedule(self, cards, start_pos):
+        """
+        Order the visits with a nearest neighbour route improved by 2-opt.
+        With a fixed position in the panel every visit is left from the same place, so the travel to a card
+        does not depend on the card before it and only the choice of the first card can shorten the route.
+
+        :param cards: The (x, y) positions of the hero cards.
+        :type cards: list
+        :param start_pos: The (x, y) position of the cursor before the first visit.
+        :type start_pos: tuple
+        :return: A tuple containing the visit order as indices into cards, the hub point to click after each visit
+                 in that order, and the estimated length of the whole route in pixels.
+        :rtype: tuple
+        """
+        if not len(cards):
+            return [], [], 0.0
+
+        cards = np.asarray(cards, dtype=np.float64)
+        n = len(cards)
+        costs = self.get_costs(cards)
+        start_costs = np.hypot(*(cards - np.asarray(start_pos, dtype=np.float64)).T)
+
+        if self.via is not None:
+            # the route is the same length whichever order the cards after the first are visited in,
+            # so they keep the order they were given in
+            first = int((start_costs - costs[0]).argmin())
+            order = np.array([first] + [i for i in range(n) if i != first])
+            return self.finish(cards, order, self.get_route_cost(order, costs, start_costs))
+
+        # nearest neighbour from the start position
+        order = [int(start_costs.argmin())]
+        remaining = np.ones(n, dtype=bool)
+        remaining[order[0]] = False
+        for _ in range(n - 1):
+            row = np.where(remaining, costs[order[-1]], np.inf)
+            order.append(int(row.argmin()))
+            remaining[order[-1]] = False
+        order = np.array(order)
+
+        # 2-opt, reversing any part of the route which makes it shorter until none do.
+        # the costs are not quite symmetric, so every candidate is priced in full
+        best = self.get_route_cost(order, costs, start_costs)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(n - 1):
+                for j in range(i + 1, n):
+                    candidate = np.concatenate([order[:i], order[i:j + 1][::-1], order[j + 1:]])
+                    cost = self.get_route_cost(candidate, costs, start_costs)
+                    if cost < best - 1e-6:
+                        order, best = candidate, cost
+                        improved = True
+        return self.finish(cards, order, best)
+
+    def finish(self, cards, order, best):
+        """
+        Pick the hub point after each visit of a route and add the travel which does not depend on the order.
+
+        :param cards: An array of shape (n, 2) of card positions.
+        :type cards: numpy.ndarray
+        :param order: The visit order as indices into cards.
+        :type order: numpy.ndarray
+        :param best: The travel of the route from the start position to the last card.
+        :type best: float
+        :return: A tuple containing the visit order, the hub point after each visit and the length of the route in pixels.
+        :rtype: tuple
+        """
+        # the last hub point only has to be reached, so it is the one closest to where the cursor leaves from
+        leaves = self.get_leave_points(cards)[order]
+        ends = np.vstack([cards[order[1:]], leaves[-1:]])
+        hubs = get_hub_points(leaves, ends, self.hub_rect)
+        best += float(np.hypot(*(hubs[-1] - leaves[-1])))
+        if self.via is not None:
+            # the trip from each card to the fixed position does not depend on the order
+            best += float(np.hypot(*(leaves - cards[order]).T).sum())
+
+        return order.tolist(), [tuple(int(v) for v in hub) for hub in hubs], best
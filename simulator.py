@@ -0,0 +1,429 @@
+"""
+A synthetic stand-in for the game client, rendering the settings UI so whole runs can be load tested headless
+together with input_backend.RecordingBackend.
+
+The Esc menu, the 'Options' and 'Controls' pages, the 'Change Hero' grid built from the hero card templates and
+the panel of each hero are drawn at the positions in layout.py, at any resolution. Clicks and keystrokes move
+between pages and edit the sensitivity field like the game would, and latency and noise can be injected to
+exercise the waits and OCR.
+"""
+import functools
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from capture import crop
+from hero_registry import HEROES, get_template_path
+from layout import Layout
+from replay import ReplayScreen, in_rect
+from utils import SET_HEIGHT, SET_WIDTH, get_sensitivity_value
+
+# the colours of the UI, text is white like the game so it survives utils.preprocess
+BACKGROUND = (24, 28, 40)
+GRID_BACKGROUND = (84, 98, 124)
+BUTTON = (64, 72, 96)
+BUTTON_SELECTED = (240, 150, 30)
+FIELD = (12, 14, 20)
+TEXT = (255, 255, 255)
+# the gap between hero cards on the grid, at SET_WIDTH x SET_HEIGHT
+CARD_GAP = 6
+DEFAULT_SENSITIVITY = "5.00"
+MAX_SENSITIVITY = 100.0
+# noise is drawn from a few full screen fields made up front, generating it on every grab is too slow
+NOISE_FIELDS = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    """
+    Get the font text is drawn in at a size, loaded once per size.
+    """
+    return ImageFont.load_default(size=max(8, int(size)))
+
+
+def get_grid_fit(grid_size, cell_size, gap, count):
+    """
+    Find the largest factor cells can be shrunk by for a number of them to fit on a grid in rows and columns.
+
+    :param grid_size: The (width, height) of the grid.
+    :type grid_size: tuple
+    :param cell_size: The (width, height) of a cell at full size.
+    :type cell_size: tuple
+    :param gap: The space around every cell.
+    :type gap: int
+    :param count: The number of cells.
+    :type count: int
+    :return: The factor, at most 1.0.
+    :rtype: float
+    """
+    (grid_width, grid_height), (cell_width, cell_height) = grid_size, cell_size
+    fits = []
+    for columns in range(1, count + 1):
+        rows = -(-count // columns)
+        fits.append(min(((grid_width - gap) / columns - gap) / cell_width, ((grid_height - gap) / rows - gap) / cell_height))
+    return min(1.0, max(fits))
+
+
+class SimulatedLayout(Layout):
+    def __init__(self, resolution, profile=None, card_scale=1.0):
+        """
+        Initialize a SimulatedLayout object, the layout of the game at a resolution with the hero cards shrunk
+        so every hero fits on the grid. The locator resizes the templates by template_scale like it would
+        for the game, so it finds the shrunken cards.
+
+        :param resolution: The (width, height) of the simulated screen.
+        :type resolution: tuple
+        :param profile: The name of the layout profile, see layout.LAYOUT_PROFILES.
+        :type profile: str
+        :param card_scale: The factor the hero cards are shrunk by, on top of the scale of the resolution.
+        :type card_scale: float
+        :return: None
+        """
+        super().__init__(resolution, profile)
+        self.card_scale = card_scale
+
+    @property
+    def template_scale(self):
+        return super().template_scale * self.card_scale
+
+
+def draw_label(draw, rect, text, fill=TEXT, anchor="mm"):
+    """
+    Draw text fitted to the height of a region, centred in it or aligned with its left edge.
+
+    :param draw: The drawing context.
+    :type draw: PIL.ImageDraw.ImageDraw
+    :param rect: The region as its top-left and bottom-right corners.
+    :type rect: tuple
+    :param text: The text to draw.
+    :type text: str
+    :param fill: The text colour.
+    :type fill: tuple
+    :param anchor: "mm" to centre the text, "lm" to align it with the left edge.
+    :type anchor: str
+    :return: None
+    """
+    (left, top), (right, bottom) = rect
+    font = get_font((bottom - top) * 0.7)
+    x = (left + right) / 2 if anchor == "mm" else left + (bottom - top) * 0.2
+    draw.text((x, (top + bottom) / 2), text, fill=fill, font=font, anchor=anchor)
+
+
+class SimulatedClient(ReplayScreen):
+    name = "simulator"
+
+    def __init__(self, resolution=(SET_WIDTH, SET_HEIGHT), sensitivities=None, heroes=None, latency=0.0, noise=0.0,
+                 seed=None, profile=None):
+        """
+        Initialize a SimulatedClient object, which renders the settings UI and reacts to input like the game.
+        It starts on the Esc menu, like the script expects.
+
+        :param resolution: The (width, height) of the simulated screen.
+        :type resolution: tuple
+        :param sensitivities: A dictionary mapping hero ids to their starting sensitivity.
+                              Other heroes start at DEFAULT_SENSITIVITY.
+        :type sensitivities: dict
+        :param heroes: The ids of the heroes on the grid. Defaults to every hero in the registry.
+        :type heroes: list
+        :param latency: How long every change takes to reach the screen in seconds,
+                        or a (min, max) range to pick it from at random.
+        :type latency: float or tuple
+        :param noise: The standard deviation of the noise added to every grab, in grey levels.
+        :type noise: float
+        :param seed: The seed of the latency and noise, for repeatable runs.
+        :type seed: int
+        :param profile: The name of the layout profile, see layout.LAYOUT_PROFILES.
+        :type profile: str
+        :return: None
+        """
+        self.layout = SimulatedLayout(resolution, profile)
+        self.latency = latency
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        # grabs come from the threads of the session as well as the main one
+        self.lock = threading.RLock()
+
+        self.cards, card_imgs = self.place_cards(heroes)
+        sensitivities = sensitivities or {}
+        self.sensitivities = {
+            hero_id: self.format_sensitivity(sensitivities.get(hero_id, DEFAULT_SENSITIVITY)) for hero_id in self.cards
+        }
+
+        self.frames = {page: self.render_page(page) for page in ("menu", "options", "controls")}
+        self.frames["grid"] = self.render_grid(card_imgs)
+        # panels are drawn when first shown, keyed by (hero id, field text, whether the field is focused)
+        self.panels = {}
+
+        self.noise_fields = None
+        if noise:
+            height, width = self.layout.resolution[1], self.layout.resolution[0]
+            self.noise_fields = [
+                np.clip(self.rng.normal(0.0, noise, (height, width, 3)), -127, 127).astype(np.int8)
+                for _ in range(NOISE_FIELDS)
+            ]
+
+        self.reset()
+
+    def reset(self):
+        """
+        Go back to the Esc menu and forget every visit, ready for another run. Sensitivities are kept.
+        """
+        with self.lock:
+            super().reset()
+            # the text in the sensitivity field while it is focused, or None
+            self.field = None
+            self.selected = False
+            self.held = set()
+            # changes reach the screen once visible_at has passed, until then the previous frame is shown
+            self.previous = self.frames["menu"]
+            self.visible_at = 0.0
+
+    def place_cards(self, heroes=None):
+        """
+        Lay the hero cards out in rows of equal cells across the hero grid, shrunk just enough for every card
+        to fit. The card scale of the layout is set to match, so the locator resizes the templates the same way.
+
+        :param heroes: The ids of the heroes to place. Defaults to every hero in the registry.
+        :type heroes: list
+        :return: A tuple containing a dictionary mapping hero ids to their (left, top, width, height) box,
+                 and one mapping them to their scaled card image.
+        :rtype: tuple
+        """
+        heroes = list(heroes or HEROES)
+        (grid_left, grid_top), (grid_right, grid_bottom) = self.layout.rect("hero_grid")
+        scale = self.layout.template_scale
+        gap = max(1, round(CARD_GAP * scale))
+        templates = {hero_id: np.asarray(Image.open(get_template_path(hero_id)).convert("RGB")) for hero_id in heroes}
+        cell_size = (
+            max((img.shape[1] for img in templates.values()), default=1) * scale,
+            max((img.shape[0] for img in templates.values()), default=1) * scale,
+        )
+        self.layout.card_scale = get_grid_fit((grid_right - grid_left, grid_bottom - grid_top), cell_size, gap, len(heroes))
+        scale = self.layout.template_scale
+        cell_width, cell_height = int(cell_size[0] * self.layout.card_scale), int(cell_size[1] * self.layout.card_scale)
+        columns = max(1, (grid_right - grid_left - gap) // (cell_width + gap))
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+
+        cards = {}
+        card_imgs = {}
+        for i, hero_id in enumerate(heroes):
+            img = templates[hero_id]
+            if scale != 1.0:
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+            height, width = img.shape[:2]
+            # each card is centred in its cell
+            row, column = divmod(i, columns)
+            left = grid_left + gap + column * (cell_width + gap) + (cell_width - width) // 2
+            top = grid_top + gap + row * (cell_height + gap) + (cell_height - height) // 2
+            cards[hero_id] = (left, top, width, height)
+            card_imgs[hero_id] = img
+        return cards, card_imgs
+
+    @staticmethod
+    def format_sensitivity(value):
+        """
+        Format a sensitivity like the game shows it, clamped to the range it accepts.
+        """
+        value = min(max(get_sensitivity_value(value), 0.0), MAX_SENSITIVITY)
+        return f"{value:.2f}"
+
+    def new_canvas(self):
+        return Image.new("RGB", self.layout.resolution, BACKGROUND)
+
+    def draw_button(self, draw, name, label, selected=False):
+        """
+        Draw a button over a layout region.
+        """
+        draw.rectangle(self.layout.rect(name), fill=BUTTON_SELECTED if selected else BUTTON)
+        draw_label(draw, self.layout.rect(name), label)
+
+    def render_page(self, page):
+        """
+        Draw one of the menu pages the script clicks through before the 'Change Hero' grid.
+
+        :param page: The page, "menu", "options" or "controls".
+        :type page: str
+        :return: The page in RGB.
+        :rtype: numpy.ndarray
+        """
+        img = self.new_canvas()
+        draw = ImageDraw.Draw(img)
+        if page == "menu":
+            self.draw_button(draw, "options_btn", "OPTIONS")
+        else:
+            # the tab bar of the options, the 'Controls' tab is highlighted once it is open
+            self.draw_button(draw, "controls_btn", "CONTROLS", selected=page == "controls")
+        if page == "controls":
+            self.draw_button(draw, "change_hero", "CHANGE HERO")
+        return np.asarray(img)
+
+    def render_grid(self, card_imgs):
+        """
+        Draw the 'Change Hero' page with every hero card in its place.
+        """
+        img = self.new_canvas()
+        ImageDraw.Draw(img).rectangle(self.layout.rect("hero_grid"), fill=GRID_BACKGROUND)
+        frame = np.array(img)
+        for hero_id, (left, top, width, height) in self.cards.items():
+            frame[top:top + height, left:left + width] = card_imgs[hero_id]
+        return frame
+
+    def render_panel(self, hero_id, text, focused):
+        """
+        Draw the panel of a hero, showing its name and the text in its sensitivity field.
+
+        :param hero_id: The id of the hero.
+        :type hero_id: str
+        :param text: The text in the sensitivity field.
+        :type text: str
+        :param focused: Whether the field is being edited, which highlights its border.
+        :type focused: bool
+        :return: The panel in RGB.
+        :rtype: numpy.ndarray
+        """
+        key = (hero_id, text, focused)
+        if key not in self.panels:
+            img = self.new_canvas()
+            draw = ImageDraw.Draw(img)
+            draw_label(draw, self.layout.rect("hero_name"), HEROES[hero_id]["name"], anchor="lm")
+            self.draw_button(draw, "change_hero", "CHANGE HERO")
+            field = self.layout.rect("sensitivity")
+            draw.rectangle(field, fill=FIELD, outline=BUTTON_SELECTED if focused else None, width=2)
+            draw_label(draw, field, text)
+            self.panels[key] = np.asarray(img)
+        return self.panels[key]
+
+    def render(self):
+        """
+        Get the frame for the current state, before any latency is applied.
+        """
+        if self.hero is None:
+            return self.frames[self.page]
+        focused = self.field is not None
+        return self.render_panel(self.hero, self.field if focused else self.sensitivities[self.hero], focused)
+
+    def get_state(self):
+        return self.page, self.field, self.sensitivities.get(self.hero)
+
+    def get_latency(self):
+        if isinstance(self.latency, (tuple, list)):
+            return self.random.uniform(*self.latency)
+        return self.latency
+
+    def get_visible_frame(self, now):
+        """
+        Get the frame on screen at a time, which is the previous frame until the latest change has been drawn.
+        """
+        if now < self.visible_at:
+            return self.previous
+        return self.render()
+
+    def grab(self, area=None):
+        with self.lock:
+            frame = self.get_visible_frame(time.perf_counter())
+            if area is not None:
+                frame = crop(frame, area)
+            if self.noise_fields is None:
+                return frame
+            noise = self.noise_fields[self.random.randrange(NOISE_FIELDS)]
+        if area is not None:
+            noise = crop(noise, area)
+        return np.clip(frame + noise.astype(np.int16), 0, 255).astype(np.uint8)
+
+    def on_input(self, event):
+        """
+        React to an event from input_backend.RecordingBackend, like the game would.
+        Every change to the screen takes the latency to be drawn.
+
+        :param event: The event, as a tuple of its name followed by its arguments.
+        :type event: tuple
+        :return: None
+        """
+        with self.lock:
+            now = time.perf_counter()
+            shown = self.get_visible_frame(now)
+            state = self.get_state()
+
+            name = event[0]
+            if name == "click":
+                self.click(event[1])
+            elif name == "key_down":
+                self.held.add(event[1])
+            elif name == "key_up":
+                self.held.discard(event[1])
+            elif name == "press":
+                self.press(event[1])
+            elif name in ("write", "paste"):
+                if self.hero:
+                    self.typed[self.hero] = event[1]
+                self.type_text(event[1])
+
+            if self.get_state() != state:
+                self.previous = shown
+                self.visible_at = now + self.get_latency()
+
+    def click(self, pos):
+        """
+        Focus the sensitivity field when it is clicked, otherwise move between pages like ReplayScreen.
+
+        :param pos: The (x, y) position clicked.
+        :type pos: tuple
+        :return: None
+        """
+        if self.hero and in_rect(pos, self.layout.rect("sensitivity")):
+            if self.field is None:
+                self.field = self.sensitivities[self.hero]
+                self.selected = False
+            return
+        # clicking anywhere else drops the edit
+        self.field = None
+        super().click(pos)
+
+    def press(self, key):
+        """
+        Handle a key press in the focused sensitivity field. Enter keeps the value if it is a number.
+        """
+        if self.field is None:
+            return
+        if key == "a" and "ctrl" in self.held:
+            self.selected = True
+        elif key == "enter":
+            if get_sensitivity_value(self.field) is not None:
+                self.sensitivities[self.hero] = self.format_sensitivity(self.field)
+            self.field = None
+        elif key == "backspace":
+            self.field = "" if self.selected else self.field[:-1]
+            self.selected = False
+        elif len(key) == 1:
+            self.type_text(key)
+
+    def type_text(self, text):
+        """
+        Type text into the focused sensitivity field, replacing it when it is selected.
+        """
+        if self.field is None:
+            return
+        self.field = text if self.selected else self.field + text
+        self.selected = False
+
+    def check(self, data):
+        """
+        Compare settings against the sensitivities the simulator holds, such as after a capture or an apply.
+
+        :param data: The settings records, each with an "id" and a "sensitivity".
+        :type data: list
+        :return: The ids of the heroes on the grid whose sensitivity does not match.
+        :rtype: list
+        """
+        with self.lock:
+            return [
+                hero["id"]
+                for hero in data
+                if hero.get("id") in self.sensitivities
+                and get_sensitivity_value(hero["sensitivity"]) != get_sensitivity_value(self.sensitivities[hero["id"]])
+            ]
@@ -0,0 +1,181 @@
+"""
+Pack the hero card templates into a single pre-decoded file which can be memory-mapped.
+
+Usage:
+    python template_bundle.py [heroes_dir] [bundle_path]
+
+Bundle layout:
+    8 bytes   magic
+    8 bytes   little-endian length of the index
+    n bytes   JSON index: the hash of the source templates, and the name, offset and shape of each template
+    ...       grayscale uint8 template data, each template aligned to BUNDLE_ALIGNMENT bytes
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import cv2
+import numpy as np
+
+HEROES_DIR = "heroes"
+BUNDLE_PATH = "heroes.bundle"
+BUNDLE_MAGIC = b"OWTMPL01"
+BUNDLE_ALIGNMENT = 64
+
+
+def get_template_filenames(heroes_dir=HEROES_DIR):
+    """
+    List the hero card template files in a directory, in a stable order.
+
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :return: The sorted template filenames.
+    :rtype: list
+    """
+    return sorted(filename for filename in os.listdir(heroes_dir) if filename.endswith(".png"))
+
+
+def hash_templates(heroes_dir=HEROES_DIR):
+    """
+    Hash the contents of every hero card template in a directory.
+    Used to invalidate cached card locations whenever a template is added or replaced.
+
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :return: The hex digest of the template set.
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    for filename in get_template_filenames(heroes_dir):
+        digest.update(filename.encode())
+        with open(os.path.join(heroes_dir, filename), "rb") as fn:
+            digest.update(fn.read())
+    return digest.hexdigest()
+
+
+def align(offset):
+    """
+    Round an offset up to the next multiple of BUNDLE_ALIGNMENT.
+    """
+    return -(-offset // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+
+def build_bundle(heroes_dir=HEROES_DIR, bundle_path=BUNDLE_PATH):
+    """
+    Decode every hero card template to grayscale and pack them into a single bundle file.
+
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :param bundle_path: The path to write the bundle to.
+    :type bundle_path: str
+    :return: The number of templates written.
+    :rtype: int
+    """
+    templates = [
+        (filename, cv2.imread(os.path.join(heroes_dir, filename), cv2.IMREAD_GRAYSCALE))
+        for filename in get_template_filenames(heroes_dir)
+    ]
+
+    entries = [{"name": name, "offset": 0, "shape": list(img.shape)} for name, img in templates]
+    index = {"hash": hash_templates(heroes_dir), "templates": entries}
+
+    # the offsets are part of the index, so grow the header until the data start stops moving
+    data_start = 0
+    while True:
+        offset = data_start
+        for entry, (_, img) in zip(entries, templates):
+            entry["offset"] = offset
+            offset = align(offset + img.nbytes)
+        header_length = align(len(BUNDLE_MAGIC) + 8 + len(json.dumps(index).encode()))
+        if header_length <= data_start:
+            break
+        data_start = header_length
+
+    index_bytes = json.dumps(index).encode()
+    tmp_path = bundle_path + ".tmp"
+    with open(tmp_path, "wb") as fn:
+        fn.write(BUNDLE_MAGIC)
+        fn.write(struct.pack("<Q", len(index_bytes)))
+        fn.write(index_bytes)
+        for entry, (_, img) in zip(entries, templates):
+            fn.seek(entry["offset"])
+            fn.write(np.ascontiguousarray(img).tobytes())
+    os.replace(tmp_path, bundle_path)
+
+    return len(templates)
+
+
+def read_bundle_index(bundle_path=BUNDLE_PATH):
+    """
+    Read the index of a bundle file without touching the template data.
+
+    :param bundle_path: The path of the bundle.
+    :type bundle_path: str
+    :return: The bundle index, or None if the file is missing or not a bundle.
+    :rtype: dict
+    """
+    try:
+        with open(bundle_path, "rb") as fn:
+            if fn.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                return None
+            (index_length,) = struct.unpack("<Q", fn.read(8))
+            return json.loads(fn.read(index_length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def is_bundle_current(bundle_path=BUNDLE_PATH, heroes_dir=HEROES_DIR):
+    """
+    Cheaply check that a bundle was built from the current templates, using only file names and modification times.
+
+    :param bundle_path: The path of the bundle.
+    :type bundle_path: str
+    :param heroes_dir: The directory containing the hero card images.
+    :type heroes_dir: str
+    :return: True if the bundle exists and is newer than every template it should contain.
+    :rtype: bool
+    """
+    index = read_bundle_index(bundle_path)
+    if not index:
+        return False
+
+    filenames = get_template_filenames(heroes_dir)
+    if [entry["name"] for entry in index["templates"]] != filenames:
+        return False
+
+    bundle_mtime = os.path.getmtime(bundle_path)
+    return all(os.path.getmtime(os.path.join(heroes_dir, filename)) <= bundle_mtime for filename in filenames)
+
+
+def load_bundle(bundle_path=BUNDLE_PATH):
+    """
+    Memory-map a bundle file. The templates are returned as read-only views onto the mapped pages,
+    so nothing is decoded and processes loading the same bundle share the same memory.
+
+    :param bundle_path: The path of the bundle.
+    :type bundle_path: str
+    :return: A tuple containing a dictionary mapping template filenames to their grayscale arrays,
+             and the hash of the templates the bundle was built from.
+    :rtype: tuple
+    """
+    index = read_bundle_index(bundle_path)
+    if not index:
+        raise ValueError(f"{bundle_path} is not a template bundle")
+
+    data = np.memmap(bundle_path, dtype=np.uint8, mode="r")
+    templates = {}
+    for entry in index["templates"]:
+        height, width = entry["shape"]
+        start = entry["offset"]
+        templates[entry["name"]] = data[start:start + height * width].reshape(height, width)
+
+    return templates, index["hash"]
+
+
+if __name__ == "__main__":
+    heroes_dir = sys.argv[1] if len(sys.argv) > 1 else HEROES_DIR
+    bundle_path = sys.argv[2] if len(sys.argv) > 2 else BUNDLE_PATH
+    count = build_bundle(heroes_dir, bundle_path)
+    print(f"Packed {count} templates into {bundle_path}")
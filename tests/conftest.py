@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules live at the top of the repo rather than in a package
+sys.path.insert(0, ROOT)
+
+from runner import link_shared_files
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run a test from an empty directory holding only the hero card templates, the bundle and the glyph set,
+    so the caches and references a session writes never touch the repo.
+    """
+    monkeypatch.chdir(ROOT)
+    link_shared_files(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
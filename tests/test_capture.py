@@ -0,0 +1,89 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import capture
+from capture import MSSCapture, ReplayCapture, crop, get_capture_backend
+
+SCREEN = np.random.default_rng(0).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+
+
+class FakeGrabber:
+    """
+    Stands in for an mss grabber of a screen showing SCREEN, returning raw BGRA pixels like mss does.
+    """
+
+    def __init__(self):
+        self.monitors = [None, {"left": 0, "top": 0, "width": SCREEN.shape[1], "height": SCREEN.shape[0]}]
+        self.closed = False
+
+    def grab(self, monitor):
+        rgb = crop(SCREEN, (monitor["left"], monitor["top"], monitor["width"], monitor["height"]))
+        bgra = np.dstack([rgb[:, :, ::-1], np.full(rgb.shape[:2], 255, dtype=np.uint8)])
+        return SimpleNamespace(raw=bgra.tobytes(), width=rgb.shape[1], height=rgb.shape[0])
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mss(monkeypatch):
+    monkeypatch.setattr(capture, "mss", SimpleNamespace(mss=FakeGrabber))
+
+
+def test_crops_are_views():
+    area = crop(SCREEN, (10, 20, 30, 40))
+    assert area.shape == (40, 30, 3)
+    assert np.shares_memory(area, SCREEN)
+
+
+def test_mss_grabs_areas_in_rgb(fake_mss):
+    backend = get_capture_backend()
+    assert isinstance(backend, MSSCapture)
+    assert np.array_equal(backend.grab(), SCREEN)
+    assert np.array_equal(backend.grab((10, 20, 30, 40)), crop(SCREEN, (10, 20, 30, 40)))
+
+
+def test_mss_keeps_a_grabber_per_thread(fake_mss):
+    backend = MSSCapture()
+    backend.grab((0, 0, 10, 10))
+    backend.grab((0, 0, 10, 10))
+    thread = threading.Thread(target=backend.grab, args=((0, 0, 10, 10),))
+    thread.start()
+    thread.join()
+    grabbers = list(backend.grabbers)
+    assert len(grabbers) == 2
+    backend.close()
+    assert all(grabber.closed for grabber in grabbers)
+
+
+def test_mss_is_required_to_use_it(monkeypatch):
+    monkeypatch.setattr(capture, "mss", None)
+    with pytest.raises(RuntimeError):
+        MSSCapture()
+    with pytest.raises(ValueError):
+        get_capture_backend("dxcam")
+
+
+def test_replays_serve_recorded_frames_in_order(tmp_path):
+    first = np.dstack([SCREEN, np.full(SCREEN.shape[:2], 255, dtype=np.uint8)])
+    Image.fromarray(first).save(tmp_path / "0001.png")
+    Image.fromarray(255 - SCREEN).save(tmp_path / "0002.png")
+    (tmp_path / "notes.txt").write_text("not a frame")
+
+    replay = ReplayCapture.from_dir(str(tmp_path))
+    assert np.array_equal(replay.grab(), SCREEN)
+    assert np.array_equal(replay.grab((5, 5, 20, 10)), crop(SCREEN, (5, 5, 20, 10)))
+    assert replay.advance()
+    assert np.array_equal(replay.grab(), 255 - SCREEN)
+    # the last frame stays up once the replay has finished
+    assert not replay.advance()
+    assert np.array_equal(replay.grab(), 255 - SCREEN)
+
+
+def test_replays_need_a_frame():
+    with pytest.raises(ValueError):
+        ReplayCapture([])
@@ -0,0 +1,83 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from checkpoint import Checkpoint, get_checkpoint_path, write_json_atomic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_records_are_loaded_and_later_ones_win(tmp_path):
+    path = str(tmp_path / "settings.json.get.checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.add({"id": "ana", "sensitivity": "3.00"})
+    checkpoint.add({"id": "ashe", "sensitivity": "4.00"})
+    checkpoint.add({"id": "ana", "sensitivity": "3.50"})
+
+    loaded = Checkpoint(path)
+    assert len(loaded) == 2
+    assert "ana" in loaded and "mercy" not in loaded
+    assert loaded.get_records() == [{"id": "ana", "sensitivity": "3.50"}, {"id": "ashe", "sensitivity": "4.00"}]
+
+
+def test_a_torn_record_is_truncated(tmp_path):
+    path = tmp_path / "settings.json.get.checkpoint.jsonl"
+    Checkpoint(str(path)).add({"id": "ana", "sensitivity": "3.00"})
+    with open(path, "a") as fn:
+        fn.write('{"id": "ashe", "sensi')
+
+    checkpoint = Checkpoint(str(path))
+    assert [record["id"] for record in checkpoint.get_records()] == ["ana"]
+    assert path.read_text().endswith("\n")
+
+    # records added after the truncation start on their own line
+    checkpoint.add({"id": "ashe", "sensitivity": "4.00"})
+    assert [record["id"] for record in Checkpoint(str(path)).get_records()] == ["ana", "ashe"]
+
+
+def test_records_survive_the_process_being_terminated(tmp_path):
+    # the GUI stops runs with Process.terminate, so nothing gets to run on the way out
+    path = str(tmp_path / "settings.json.set.checkpoint.jsonl")
+    script = (
+        "import os, signal\n"
+        "from checkpoint import Checkpoint\n"
+        f"checkpoint = Checkpoint({path!r}, 'account')\n"
+        "for hero_id in ('ana', 'ashe', 'mercy'):\n"
+        "    checkpoint.add({'id': hero_id, 'sensitivity': '3.00'})\n"
+        "os.kill(os.getpid(), signal.SIGTERM)\n"
+    )
+    process = subprocess.run([sys.executable, "-c", script], cwd=ROOT)
+    assert process.returncode == -signal.SIGTERM
+    assert [record["id"] for record in Checkpoint(path, "account").get_records()] == ["ana", "ashe", "mercy"]
+
+
+def test_a_checkpoint_of_another_target_is_refused(tmp_path):
+    path = get_checkpoint_path(str(tmp_path / "settings.json"), "set", "account one")
+    assert path != get_checkpoint_path(str(tmp_path / "settings.json"), "set", "account two")
+
+    Checkpoint(path, "account one").add({"id": "ana", "sensitivity": "3.00"})
+    with pytest.raises(ValueError):
+        Checkpoint(path, "account two")
+    with pytest.raises(ValueError):
+        Checkpoint(path)
+    assert len(Checkpoint(path, "account one")) == 1
+
+
+def test_remove_deletes_the_file(tmp_path):
+    path = tmp_path / "settings.json.get.checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.add({"id": "ana", "sensitivity": "3.00"})
+    checkpoint.remove()
+    assert not path.exists()
+    assert len(checkpoint) == 0
+
+
+def test_write_json_atomic(tmp_path):
+    path = tmp_path / "settings.json"
+    write_json_atomic(str(path), [{"id": "ana"}])
+    assert json.loads(path.read_text()) == [{"id": "ana"}]
+    assert list(tmp_path.iterdir()) == [path]
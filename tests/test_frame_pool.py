@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import frame_pool
+from frame_pool import FramePool, attach_frame
+from hero_registry import get_template_path
+from locator import HeroLocator
+from simulator import SimulatedClient
+from utils import to_grayscale
+
+HEROES_ON_GRID = ["ana", "genji", "mercy", "zenyatta"]
+
+
+@pytest.fixture
+def pool():
+    pool = FramePool(workers=2)
+    yield pool
+    # this process attached to the frames like a worker would
+    for block, _, _ in frame_pool.worker_frames.values():
+        block.close()
+    frame_pool.worker_frames.clear()
+    pool.close()
+
+
+def test_workers_find_the_same_cards_as_threads(workdir):
+    screen = SimulatedClient((1280, 720), heroes=HEROES_ON_GRID)
+    locator_kwargs = {"scale": screen.layout.template_scale, "roi": screen.layout.area("hero_grid")}
+    haystack = to_grayscale(screen.frames["grid"])
+    keys = [get_template_path(hero_id) for hero_id in HEROES_ON_GRID + ["reaper", "sombra"]]
+
+    expected = HeroLocator(**locator_kwargs).match_all(haystack, keys)
+    pool = FramePool(locator_kwargs, workers=2)
+    try:
+        assert pool.match_all(haystack, keys) == expected
+        # a second frame is published into the same block
+        assert pool.match_all(haystack[:, ::-1].copy(), keys[:1]) == HeroLocator(**locator_kwargs).match_all(
+            haystack[:, ::-1].copy(), keys[:1]
+        )
+    finally:
+        pool.close()
+
+
+def test_frames_are_shared_without_copying_them_for_every_read(pool):
+    frame = np.arange(60 * 80, dtype=np.uint8).reshape(60, 80)
+    descriptor = pool.publish(frame)
+    block = pool.block
+    assert np.array_equal(attach_frame(descriptor), frame)
+
+    # smaller frames reuse the block, larger ones replace it
+    smaller = frame[:30].copy()
+    descriptor = pool.publish(smaller)
+    assert pool.block is block
+    assert np.array_equal(attach_frame(descriptor), smaller)
+    larger = np.ones((100, 100), dtype=np.uint8)
+    descriptor = pool.publish(larger)
+    assert pool.block is not block
+    assert np.array_equal(attach_frame(descriptor), larger)
+    assert len(frame_pool.worker_frames) == 1
+
+
+def test_closing_frees_the_block(pool):
+    pool.publish(np.zeros((10, 10), dtype=np.uint8))
+    pool.close()
+    assert pool.block is None
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import gen_curve
+from gen_curve import CURVE_STYLES, get_curve, get_curve_array, get_num_points
+
+
+@pytest.fixture(autouse=True)
+def resolution(monkeypatch):
+    monkeypatch.setattr(gen_curve, "get_monitor_resolution", lambda: (1920, 1080))
+
+
+@pytest.mark.parametrize("style", CURVE_STYLES)
+def test_curves_run_from_the_start_towards_the_end(style):
+    start, end = (100, 900), (1700, 200)
+    curve = get_curve_array(start, end, 200, style, rng=np.random.default_rng(0))
+    assert curve.shape == (200, 2)
+    assert tuple(curve[0]) == start
+    # the last point is one step short of the end, which the final move reaches
+    assert np.hypot(*(curve[-1] - end)) < np.hypot(*np.subtract(end, start)) / 20
+    # every control point is inside the box spanned by the ends, so the whole curve is too
+    assert (curve >= (100, 200)).all() and (curve <= (1700, 900)).all()
+
+
+@pytest.mark.parametrize("style", CURVE_STYLES)
+def test_curves_are_random_unless_seeded(style):
+    start, end = (0, 0), (1000, 800)
+    seeded = [get_curve_array(start, end, 50, style, rng=np.random.default_rng(1)) for _ in range(2)]
+    assert np.array_equal(*seeded)
+    assert not np.array_equal(get_curve_array(start, end, 50, style), get_curve_array(start, end, 50, style))
+
+
+def test_curves_stay_on_screen():
+    curve = get_curve_array((-50, 500), (2500, 1500), 100, rng=np.random.default_rng(2))
+    assert curve.min() >= 0
+    assert (curve.max(axis=0) <= (1919, 1079)).all()
+
+
+def test_the_number_of_points_follows_the_distance():
+    assert get_num_points((0, 0), (300, 400)) == 10
+    assert len(get_curve_array((0, 0), (300, 400))) == 10
+    assert len(get_curve_array((0, 0), (300, 400), density=1 / 10)) == 50
+    assert get_curve_array((5, 5), (5, 5)).shape == (0, 2)
+
+
+def test_curves_as_lists_of_points():
+    curve = get_curve((0, 0), (100, 100), 5)
+    assert len(curve) == 5
+    assert all(isinstance(point, tuple) and len(point) == 2 for point in curve)
+
+
+def test_unknown_styles_are_refused():
+    with pytest.raises(ValueError):
+        get_curve_array((0, 0), (100, 100), 10, style="spiral")
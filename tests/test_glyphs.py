@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from glyphs import GlyphRecognizer, harvest_glyphs, segment_glyphs
+from ocr import BatchOCR, OCRCache, OCRWorkerPool
+from simulator import FIELD, draw_label
+from utils import preprocess
+
+HARVESTED = ["0.50", "1.23", "4.56", "7.89", "10.00"]
+# the field is drawn larger than the simulator draws it at 1080p, where its font is too thin to binarize cleanly
+FIELD_SIZE = (240, 60)
+
+
+def get_crop(value):
+    """
+    A crop of the sensitivity field, drawn like the simulated client draws it.
+    """
+    img = Image.new("RGB", FIELD_SIZE, FIELD)
+    draw_label(ImageDraw.Draw(img), ((0, 0), FIELD_SIZE), value)
+    return np.asarray(img)
+
+
+@pytest.fixture
+def glyph_path(tmp_path):
+    crops_dir = tmp_path / "crops"
+    crops_dir.mkdir()
+    for value in HARVESTED:
+        Image.fromarray(get_crop(value)).save(crops_dir / f"{value}_ana.png")
+    path = str(tmp_path / "glyphs.npz")
+    counts = harvest_glyphs(str(crops_dir), path)
+    assert set(counts) == set("0123456789.")
+    assert counts["."] == len(HARVESTED)
+    return path
+
+
+def test_every_character_is_segmented():
+    assert len(segment_glyphs(preprocess(get_crop("12.34")))) == 5
+
+
+@pytest.mark.parametrize("value", ["3.45", "12.00", "6.71", "0.98"])
+def test_values_which_were_not_harvested_are_recognised(glyph_path, value):
+    recognizer = GlyphRecognizer(glyph_path)
+    text, confidence, margin = recognizer.recognise(preprocess(get_crop(value)))
+    assert text == value
+    assert confidence >= recognizer.confidence
+    assert margin >= recognizer.margin
+    assert recognizer.read(preprocess(get_crop(value))) == value
+
+
+def test_unreadable_crops_are_left_to_tesseract(glyph_path):
+    recognizer = GlyphRecognizer(glyph_path)
+    # not a sensitivity, even if every character is known
+    assert recognizer.read(preprocess(get_crop("1.2.3"))) is None
+    assert recognizer.read(preprocess(get_crop(""))) is None
+
+
+def test_without_a_glyph_set_nothing_is_recognised(tmp_path):
+    recognizer = GlyphRecognizer(str(tmp_path / "missing.npz"))
+    assert not recognizer.available
+    assert recognizer.read(preprocess(get_crop("3.45"))) is None
+
+
+def test_harvesting_nothing_is_refused(tmp_path):
+    (tmp_path / "notes.txt").write_text("not a crop")
+    with pytest.raises(ValueError):
+        harvest_glyphs(str(tmp_path), str(tmp_path / "glyphs.npz"))
+    assert not (tmp_path / "glyphs.npz").exists()
+
+
+def test_glyph_reads_are_not_counted_as_cache_misses(glyph_path, monkeypatch):
+    cache = OCRCache()
+    pool = OCRWorkerPool(cache=cache)
+    pool.glyphs = GlyphRecognizer(glyph_path)
+    # a crop the glyph set cannot read is left to tesseract
+    monkeypatch.setattr(OCRWorkerPool, "read_raw", lambda self, img, profile="default": "1.2.3\n")
+
+    batch = BatchOCR(pool)
+    batch.add("glyphs", preprocess(get_crop("3.45")), "sensitivity")
+    batch.add("tesseract", preprocess(get_crop("1.2.3")), "sensitivity")
+    assert batch.run() == {"glyphs": "3.45", "tesseract": "1.2.3"}
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 1
+
+    assert pool.read(preprocess(get_crop("1.2.3")), "sensitivity") == "1.2.3"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,103 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from hero_registry import HEROES, NameReferences, get_hero_id_by_name, resolve_hero_id
+from simulator import SimulatedClient
+
+NOISE = 6
+
+
+@pytest.fixture(scope="module")
+def banners():
+    """
+    The name banner of every hero as the simulated client draws it, clean and with noise.
+    """
+    screen = SimulatedClient((1920, 1080), heroes=[])
+    (left, top), (right, bottom) = screen.layout.rect("hero_name")
+    rng = np.random.default_rng(0)
+    clean, noisy = {}, {}
+    for hero_id in HEROES:
+        banner = screen.render_panel(hero_id, "5.00", False)[top:bottom, left:right]
+        clean[hero_id] = banner
+        noisy[hero_id] = np.clip(banner + rng.normal(0, NOISE, banner.shape), 0, 255).astype(np.uint8)
+    return clean, noisy
+
+
+def test_heroes_without_a_reference_are_unknown(tmp_path, banners):
+    names = NameReferences(str(tmp_path / "names.json"))
+    assert not names.has_reference("ana")
+    assert names.matches("ana", banners[0]["ana"]) is None
+
+
+def test_every_banner_matches_only_its_own_hero(tmp_path, banners):
+    clean, noisy = banners
+    names = NameReferences(str(tmp_path / "names.json"))
+    for hero_id, banner in clean.items():
+        names.store(hero_id, banner)
+    for hero_id in HEROES:
+        assert names.matches(hero_id, noisy[hero_id]), hero_id
+        for other in ("ana", "pharah", "baptiste", "reaper"):
+            if other != hero_id:
+                assert not names.matches(other, noisy[hero_id]), (hero_id, other)
+
+
+def test_a_banner_as_close_to_another_hero_is_rejected(tmp_path, banners):
+    clean, _ = banners
+    names = NameReferences(str(tmp_path / "names.json"))
+    names.store("ana", clean["ana"])
+    # the reference of another hero which happens to look the same
+    names.store("ashe", clean["ana"])
+    assert not names.matches("ana", clean["ana"])
+
+
+def test_references_are_written_on_save(tmp_path, banners):
+    path = tmp_path / "names.json"
+    names = NameReferences(str(path))
+    names.store("ana", banners[0]["ana"])
+    assert not path.exists()
+    names.save()
+    assert set(json.loads(path.read_text())) == {"ana"}
+    assert list(tmp_path.iterdir()) == [path]
+
+    loaded = NameReferences(str(path))
+    assert loaded.has_reference("ana")
+    assert loaded.matches("ana", banners[1]["ana"])
+
+
+def test_references_in_an_old_format_are_ignored(tmp_path):
+    path = tmp_path / "names.json"
+    path.write_text(json.dumps({"ana": "%016x" % 12345}))
+    assert not NameReferences(str(path)).has_reference("ana")
+
+
+def test_storing_while_matching(tmp_path, banners):
+    clean, noisy = banners
+    names = NameReferences(str(tmp_path / "names.json"))
+    names.store("ana", clean["ana"])
+    errors = []
+
+    def store():
+        try:
+            for hero_id, banner in clean.items():
+                names.store(hero_id, banner)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=store)
+    thread.start()
+    while thread.is_alive():
+        names.matches("ana", noisy["ana"])
+    thread.join()
+    assert errors == []
+    assert all(names.has_reference(hero_id) for hero_id in HEROES)
+
+
+def test_resolve_hero_id():
+    assert resolve_hero_id({"id": "ana"}) == "ana"
+    assert resolve_hero_id({"filepath": "heroes/soldier76.png"}) == "soldier76"
+    assert resolve_hero_id({"name": "SOLDIER: 76"}) == "soldier76"
+    assert resolve_hero_id({"name": "NOBODY"}) is None
+    assert get_hero_id_by_name("D.VA") == "dva"
@@ -0,0 +1,63 @@
+import inspect
+import time
+
+import pytest
+
+import main
+from input_backend import DEFAULT_INPUT_PROFILE, INPUT_PROFILES, InputBackend, RecordingBackend
+
+
+def test_unknown_profiles_are_refused():
+    with pytest.raises(ValueError):
+        InputBackend("instant")
+
+
+def test_turbo_moves_are_direct_unless_human():
+    assert not InputBackend("turbo").tween
+    assert InputBackend("turbo").get_move_duration() == 0.0
+    human = InputBackend("turbo", human=True)
+    assert human.tween
+    assert human.get_move_duration() > 0.0
+    # the pause between events is still the profile's
+    assert human.pause == INPUT_PROFILES["turbo"]["pause"]
+
+
+@pytest.mark.parametrize("function", [
+    main.HeroManager.__init__,
+    main.get_sensitivity_data,
+    main.set_sensitivity_data,
+    main.save_settings_to_json,
+    main.load_settings_from_json,
+])
+def test_every_entry_point_uses_the_same_default_profile(function):
+    assert inspect.signature(function).parameters["input_profile"].default == DEFAULT_INPUT_PROFILE
+
+
+def test_events_are_recorded_and_counted():
+    backend = RecordingBackend(start_pos=(5, 5))
+    backend.move_to((10.4, 20.6))
+    backend.click()
+    backend.press("enter")
+    backend.write("3.00")
+    assert backend.position() == (10, 20)
+    assert backend.events == [("move_to", (10, 20)), ("click", (10, 20)), ("press", "enter"), ("write", "3.00")]
+
+    report = backend.get_report(1.0)
+    assert report["profile"] == DEFAULT_INPUT_PROFILE
+    assert report["calls"] == 4
+    assert report["input_time"] + report["other_time"] == pytest.approx(1.0, abs=0.002)
+    assert 0.0 <= report["input_share"] < 0.1
+
+
+def test_realtime_recording_pauses_like_the_profile():
+    backend = RecordingBackend("turbo", realtime=True)
+    start = time.perf_counter()
+    for _ in range(5):
+        backend.click()
+    elapsed = time.perf_counter() - start
+    assert elapsed >= 5 * INPUT_PROFILES["turbo"]["pause"]
+    assert backend.get_report(elapsed)["input_share"] > 0.9
+
+
+def test_report_of_an_empty_run():
+    assert InputBackend().get_report(0.0)["input_share"] == 0.0
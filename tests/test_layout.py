@@ -0,0 +1,44 @@
+import pytest
+
+from layout import HERO_NAME_POS, SENSITIVITY_POS, Layout, get_profile_name
+
+
+def scale_rect(rect, scale, offset=(0, 0)):
+    # rounded half to even, like the layout
+    return tuple((round(x * scale + offset[0]), round(y * scale + offset[1])) for x, y in rect)
+
+
+def test_the_recorded_resolution_is_unscaled():
+    layout = Layout((2560, 1440))
+    assert layout.profile == "16:9"
+    assert layout.rect("sensitivity") == SENSITIVITY_POS
+    assert layout.template_scale == 1.0
+
+
+def test_16_9_scales_both_axes():
+    layout = Layout((1280, 720))
+    (left, top), (right, bottom) = scale_rect(HERO_NAME_POS, 0.5)
+    assert layout.rect("hero_name") == ((left, top), (right, bottom))
+    assert layout.area("hero_name") == (left, top, right - left, bottom - top)
+    assert layout.centre("hero_name") == ((left + right) // 2, (top + bottom) // 2)
+    assert layout.template_scale == 0.5
+
+
+def test_21_9_is_scaled_by_height_and_centred():
+    layout = Layout((3440, 1440))
+    assert layout.profile == "21:9"
+    assert layout.rect("sensitivity") == scale_rect(SENSITIVITY_POS, 1.0, (440, 0))
+    assert layout.template_scale == 1.0
+
+
+def test_16_10_is_scaled_by_width_and_centred():
+    layout = Layout((1920, 1200))
+    assert layout.profile == "16:10"
+    assert layout.scale == (0.75, 0.75)
+    assert layout.offset == (0.0, 60.0)
+    assert layout.rect("sensitivity") == scale_rect(SENSITIVITY_POS, 0.75, (0, 60))
+
+
+@pytest.mark.parametrize("resolution, profile", [((1920, 1080), "16:9"), ((2560, 1600), "16:10"), ((5120, 1440), "32:9")])
+def test_profile_names(resolution, profile):
+    assert get_profile_name(*resolution) == profile
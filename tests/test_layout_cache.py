@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+import pytest
+
+from layout_cache import LayoutCache
+
+BOX = (20, 10, 30, 40)
+MATCH = {"box": BOX, "centre": (35, 30), "confidence": 0.9}
+
+
+@pytest.fixture
+def haystack():
+    return np.random.default_rng(0).integers(0, 256, (120, 200), dtype=np.uint8)
+
+
+def test_cards_are_found_again_while_they_have_not_moved(tmp_path, haystack):
+    path = tmp_path / "layout.json"
+    LayoutCache(str(path)).store(haystack, "hash", {"ana": MATCH, "ashe": {"box": BOX, "centre": None, "confidence": 0.1}})
+    assert LayoutCache(str(path)).lookup(haystack, "hash", ["ana", "ashe"]) == {"ana": MATCH}
+
+    moved = np.roll(haystack, 15, axis=1)
+    assert LayoutCache(str(path)).lookup(moved, "hash", ["ana"]) == {}
+
+
+def test_cards_are_kept_per_template_set_scale_and_region(tmp_path, haystack):
+    cache = LayoutCache(str(tmp_path / "layout.json"))
+    cache.store(haystack, "hash", {"ana": MATCH}, scale=0.75, roi=(0, 0, 100, 100))
+    assert cache.lookup(haystack, "hash", ["ana"], scale=0.75, roi=(0, 0, 100, 100)) == {"ana": MATCH}
+    assert cache.lookup(haystack, "other", ["ana"], scale=0.75, roi=(0, 0, 100, 100)) == {}
+    assert cache.lookup(haystack, "hash", ["ana"], scale=1.0, roi=(0, 0, 100, 100)) == {}
+    assert cache.lookup(haystack, "hash", ["ana"], scale=0.75, roi=(0, 0, 200, 120)) == {}
+    assert cache.lookup(haystack, "hash", ["ana"], scale=0.75) == {}
+    assert cache.lookup(haystack[:100], "hash", ["ana"], scale=0.75, roi=(0, 0, 100, 100)) == {}
+
+
+def test_the_cache_file_is_replaced_in_one_step(tmp_path, haystack):
+    path = tmp_path / "layout.json"
+    path.write_text("{not json")
+    cache = LayoutCache(str(path))
+    assert cache.layouts == {}
+    cache.store(haystack, "hash", {"ana": MATCH})
+    assert len(json.loads(path.read_text())) == 1
+    # no temporary file is left behind next to it
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,77 @@
+import pytest
+
+from hero_registry import get_template_path
+from locator import LOCATE_CONFIDENCE, HeroLocator
+from simulator import SimulatedClient
+
+HEROES_ON_GRID = ["ana", "cassidy", "genji", "mercy", "reinhardt", "widowmaker", "zenyatta"]
+
+
+@pytest.fixture(scope="module")
+def screen():
+    return SimulatedClient((1280, 720), heroes=HEROES_ON_GRID)
+
+
+def get_locator(screen, **kwargs):
+    return HeroLocator(
+        confidence=LOCATE_CONFIDENCE, scale=screen.layout.template_scale, roi=screen.layout.area("hero_grid"), **kwargs
+    )
+
+
+def assert_found_on_the_grid(screen, matches):
+    for hero_id in HEROES_ON_GRID:
+        match = matches[get_template_path(hero_id)]
+        left, top, width, height = screen.cards[hero_id]
+        assert match["centre"], hero_id
+        assert abs(match["centre"][0] - (left + width // 2)) <= 2, hero_id
+        assert abs(match["centre"][1] - (top + height // 2)) <= 2, hero_id
+        assert match["confidence"] >= LOCATE_CONFIDENCE
+
+
+def test_every_card_on_the_grid_is_found(workdir, screen):
+    matches = get_locator(screen).locate_all(screen.frames["grid"])
+    assert_found_on_the_grid(screen, matches)
+
+
+def test_coarse_search_finds_the_same_cards(workdir, screen):
+    paths = [get_template_path(hero_id) for hero_id in HEROES_ON_GRID]
+    fine = get_locator(screen, coarse_factor=1).locate_all(screen.frames["grid"], paths)
+    coarse = get_locator(screen).locate_all(screen.frames["grid"], paths)
+    assert_found_on_the_grid(screen, fine)
+    assert {path: match["centre"] for path, match in fine.items()} == {
+        path: match["centre"] for path, match in coarse.items()
+    }
+
+
+def test_paths_saved_on_windows_are_found(workdir, screen):
+    path = "C:\\Users\\me\\heroes\\ana.png"
+    matches = get_locator(screen).locate_all(screen.frames["grid"], [path])
+    assert matches[path]["centre"]
+
+
+def test_cards_outside_the_region_of_interest_are_not_found(workdir, screen):
+    left, top, width, height = screen.cards["ana"]
+    # only the top left of the grid, which holds a single card
+    locator = HeroLocator(scale=screen.layout.template_scale, roi=(left, top, width + 2, height + 2))
+    matches = locator.locate_all(screen.frames["grid"], [get_template_path("ana"), get_template_path("zenyatta")])
+    assert matches[get_template_path("ana")]["centre"]
+    assert not matches[get_template_path("zenyatta")]["centre"]
+
+
+def test_templates_which_do_not_fit_are_not_searched_for(workdir, screen):
+    left, top, width, height = screen.cards["ana"]
+    locator = HeroLocator(scale=screen.layout.template_scale, roi=(left, top, width // 2, height))
+    assert locator.locate_all(screen.frames["grid"], [get_template_path("ana")]) == {get_template_path("ana"): None}
+    assert locator.match_template(screen.frames["grid"][:, :, 0], "heroes/nobody.png") is None
+
+
+def test_coarse_windows_clipped_by_the_edge_fall_back_to_a_full_search(workdir, screen):
+    left, top, width, height = screen.cards["ana"]
+    locator = get_locator(screen)
+    key = locator.get_template_key(get_template_path("ana"))
+    haystack = screen.frames["grid"][top:top + height, left:left + width, 0].copy()
+    # a coarse frame whose best positions are past the right edge of the haystack
+    coarse = haystack[:, ::locator.coarse_factor][:, ::-1].copy()
+    match = locator.match_template(haystack, key, coarse)
+    assert match["box"] == (0, 0, width, height)
+    assert match["centre"]
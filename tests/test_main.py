@@ -0,0 +1,43 @@
+from main import get_account_checkpoint, get_sensitivity_changes
+
+
+def test_matching_heroes_are_skipped_regardless_of_formatting():
+    data = [{"id": "ana", "sensitivity": "3.5"}, {"id": "ashe", "sensitivity": "4.00"}]
+    current = [{"id": "ana", "sensitivity": "3.50"}, {"id": "ashe", "sensitivity": "4.10"}]
+    changes, skipped = get_sensitivity_changes(data, current)
+    assert skipped == ["ana"]
+    assert changes == [{"id": "ashe", "sensitivity": "4.00"}]
+
+
+def test_heroes_missing_from_the_account_are_changed():
+    data = [{"id": "ana", "sensitivity": "3.50"}]
+    changes, skipped = get_sensitivity_changes(data, [])
+    assert changes == data
+    assert skipped == []
+
+
+def test_unknown_heroes_and_unreadable_values_are_kept():
+    data = [{"name": "NOT A HERO", "sensitivity": "3.50"}, {"id": "ana", "sensitivity": "abc"}]
+    current = [{"id": "ana", "sensitivity": "abc"}]
+    changes, skipped = get_sensitivity_changes(data, current)
+    assert changes == data
+    assert skipped == []
+
+
+def test_records_without_ids_are_resolved_by_name():
+    data = [{"id": "ana", "sensitivity": "3.50"}]
+    current = [{"name": "ANA", "sensitivity": "3.50"}]
+    assert get_sensitivity_changes(data, current) == ([], ["ana"])
+
+
+def test_runs_against_an_unnamed_account_are_not_checkpointed(tmp_path):
+    assert get_account_checkpoint(str(tmp_path / "settings.json"), "set", None) is None
+    assert get_account_checkpoint(str(tmp_path / "settings.json"), "set", "") is None
+
+
+def test_checkpoints_are_kept_per_account(tmp_path):
+    filename = str(tmp_path / "settings.json")
+    get_account_checkpoint(filename, "set", "one").add({"id": "ana", "sensitivity": "3.00"})
+    assert "ana" in get_account_checkpoint(filename, "set", "one")
+    assert len(get_account_checkpoint(filename, "set", "two")) == 0
+    assert len(get_account_checkpoint(filename, "get", "one")) == 0
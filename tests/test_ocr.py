@@ -0,0 +1,233 @@
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import ocr
+from ocr import STRIP_PADDING, BatchOCR, OCRCache, OCRWorkerPool, get_tesseract_config
+
+# each crop is a flat patch whose shade stands for the text drawn in it
+TEXTS = {10: "3.45", 20: "12.00", 30: "WRECKING BALL", 40: "D.VA"}
+
+
+class FakeTesseract:
+    """
+    Stands in for tesseract reading a stitched strip, reporting every patch as the words of its text
+    with the rows it covers.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def image_to_data(self, strip, config="", output_type=None):
+        self.calls.append(config)
+        column = np.asarray(strip)[:, STRIP_PADDING]
+        words = {"text": [], "top": [], "height": [], "block_num": [], "par_num": [], "line_num": []}
+        top = 0
+        while top < len(column):
+            if column[top] == 255:
+                top += 1
+                continue
+            bottom = top
+            while bottom < len(column) and column[bottom] == column[top]:
+                bottom += 1
+            for word in TEXTS[int(column[top])].split(" "):
+                words["text"].append(word)
+                words["top"].append(top)
+                words["height"].append(bottom - top)
+                words["block_num"].append(1)
+                words["par_num"].append(1)
+                words["line_num"].append(top)
+            # tesseract also reports empty boxes
+            words["text"].append(" ")
+            for key in ("top", "height", "block_num", "par_num", "line_num"):
+                words[key].append(0)
+            top = bottom
+        return words
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    fake = FakeTesseract()
+    monkeypatch.setattr(ocr.pytesseract, "image_to_data", fake.image_to_data)
+    return fake
+
+
+def make_crop(shade, width=40, height=12):
+    return Image.new("L", (width, height), shade)
+
+
+def test_crops_are_stitched_below_each_other():
+    batch = BatchOCR()
+    crops = [("a", make_crop(10, 30, 10), "default"), ("b", make_crop(20, 50, 12), "default")]
+    strip, bands = batch.stitch(crops)
+    assert strip.size == (50 + 2 * STRIP_PADDING, 10 + 12 + 3 * STRIP_PADDING)
+    assert bands == [(STRIP_PADDING, STRIP_PADDING + 10), (2 * STRIP_PADDING + 10, 2 * STRIP_PADDING + 22)]
+    for (_, img, _), (top, bottom) in zip(crops, bands):
+        assert np.array_equal(np.asarray(strip)[top:bottom, STRIP_PADDING:STRIP_PADDING + img.width], np.asarray(img))
+
+
+def test_every_crop_of_a_profile_is_read_in_one_call(tesseract):
+    batch = BatchOCR()
+    batch.add("ana", make_crop(10), "sensitivity")
+    batch.add("ashe", make_crop(20), "sensitivity")
+    batch.add("wreckingball", make_crop(30), "hero_name")
+    batch.add("dva", make_crop(40), "hero_name")
+    assert batch.run() == {"ana": "3.45", "ashe": "12.00", "wreckingball": "WRECKING BALL", "dva": "D.VA"}
+    assert len(tesseract.calls) == 2
+    assert any("tessedit_char_whitelist=0123456789." in config for config in tesseract.calls)
+    # the queue is emptied by every run
+    assert batch.run() == {}
+
+
+def test_batches_are_split_at_the_batch_size(tesseract):
+    batch = BatchOCR(batch_size=2)
+    for i, shade in enumerate([10, 20, 10, 20, 10]):
+        batch.add(i, make_crop(shade), "sensitivity")
+    assert batch.run() == {0: "3.45", 1: "12.00", 2: "3.45", 3: "12.00", 4: "3.45"}
+    assert len(tesseract.calls) == 3
+
+
+def test_numpy_crops_are_read_like_images(tesseract):
+    batch = BatchOCR()
+    batch.add("rgb", np.full((12, 40, 3), 10, dtype=np.uint8), "sensitivity")
+    assert batch.run() == {"rgb": "3.45"}
+
+
+class FakeEngine:
+    """
+    Stands in for a tesserocr engine, reading a patch as the text its shade stands for.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.img = None
+        self.ended = False
+        self.busy = threading.Lock()
+
+    def SetImage(self, img):
+        # an engine is never handed to two reads at once
+        assert self.busy.acquire(blocking=False)
+        self.img = img
+
+    def GetUTF8Text(self):
+        time.sleep(0.01)
+        self.busy.release()
+        return TEXTS[self.img.getpixel((0, 0))] + "\n"
+
+    def End(self):
+        self.ended = True
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    created = []
+
+    def create_engine(self, profile):
+        created.append(FakeEngine(profile))
+        return created[-1]
+
+    monkeypatch.setattr(ocr, "tesserocr", object())
+    monkeypatch.setattr(OCRWorkerPool, "create_engine", create_engine)
+    return created
+
+
+def test_profiles_restrict_what_tesseract_reads():
+    assert get_tesseract_config("default") == "--psm 3"
+    assert get_tesseract_config("sensitivity") == "--psm 7 -c tessedit_char_whitelist=0123456789."
+    assert get_tesseract_config("sensitivity", psm=6).startswith("--psm 6 ")
+    # spaces cannot be whitelisted on the command line
+    assert " " not in get_tesseract_config("hero_name").split("=")[1]
+
+
+def test_engines_are_kept_between_reads_up_to_the_number_of_workers(engines):
+    pool = OCRWorkerPool(workers=2)
+    assert pool.in_process
+    crops = [make_crop(shade) for shade in (10, 20, 40) * 4]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
+        texts = list(executor.map(lambda img: pool.read(img, "sensitivity"), crops))
+    assert texts == [TEXTS[shade] for shade in (10, 20, 40) * 4]
+    assert len(engines) == 2
+    assert {engine.profile for engine in engines} == {"sensitivity"}
+
+    pool.read(make_crop(10), "hero_name")
+    assert len(engines) == 3
+    pool.close()
+    assert all(engine.ended for engine in engines)
+
+
+def test_reads_fall_back_to_pytesseract_when_engines_cannot_start(monkeypatch):
+    def create_engine(self, profile):
+        raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+    monkeypatch.setattr(ocr, "tesserocr", object())
+    monkeypatch.setattr(OCRWorkerPool, "create_engine", create_engine)
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda img, config="": TEXTS[img.getpixel((0, 0))] + "\n")
+    pool = OCRWorkerPool(workers=1)
+    assert pool.read(make_crop(20), "sensitivity") == "12.00"
+    assert not pool.in_process
+    assert pool.read(make_crop(10), "sensitivity") == "3.45"
+
+
+def test_batches_are_read_by_the_engines_when_they_run_in_process(engines, tesseract):
+    batch = BatchOCR(OCRWorkerPool(workers=2))
+    batch.add("ana", make_crop(10), "sensitivity")
+    batch.add("dva", make_crop(40), "hero_name")
+    assert batch.run() == {"ana": "3.45", "dva": "D.VA"}
+    assert tesseract.calls == []
+
+
+def test_identical_crops_are_only_read_once(engines):
+    cache = OCRCache()
+    pool = OCRWorkerPool(cache=cache)
+    for _ in range(3):
+        assert pool.read(make_crop(20), "sensitivity") == "12.00"
+    # the same pixels read with another profile may read differently
+    assert pool.read(make_crop(20), "hero_name") == "12.00"
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_keys_change_with_the_pixels_and_the_profile():
+    key = OCRCache.get_key(make_crop(10), "sensitivity")
+    assert key == OCRCache.get_key(make_crop(10), "sensitivity")
+    assert key != OCRCache.get_key(make_crop(11), "sensitivity")
+    assert key != OCRCache.get_key(make_crop(10, width=41), "sensitivity")
+    assert key != OCRCache.get_key(make_crop(10), "hero_name")
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = OCRCache(size=2)
+    cache.put("a", "1.00")
+    cache.put("b", "2.00")
+    assert cache.get("a") == "1.00"
+    cache.put("c", "3.00")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1.00"
+    assert cache.get("c") == "3.00"
+
+
+def test_saved_time_is_estimated_from_the_reads_it_replaced():
+    cache = OCRCache()
+    cache.put("a", "1.00", elapsed=0.2)
+    cache.put("b", "2.00", elapsed=0.4)
+    for _ in range(3):
+        cache.get("a")
+    assert cache.stats() == {"hits": 3, "misses": 2, "saved": pytest.approx(0.9)}
+
+
+def test_results_persist_between_runs(tmp_path):
+    path = str(tmp_path / "ocr_cache")
+    cache = OCRCache(path=path)
+    cache.put("a", "1.00")
+    cache.close()
+
+    cache = OCRCache(size=1, path=path)
+    assert cache.get("a") == "1.00"
+    cache.put("b", "2.00")
+    # evicted from memory, but still on disk
+    assert cache.get("a") == "1.00"
+    cache.close()
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import ocr
+import runner
+from hero_registry import HEROES
+from runner import SIMULATED_DISPLAY, BatchRunner, link_shared_files, run_job
+from simulator import DEFAULT_SENSITIVITY
+from test_simulator import TARGET, FakeOCR
+
+
+def test_jobs_are_checked_and_completed(tmp_path):
+    jobs = [
+        {"settings": "ana.json", "direction": "set", "display": ":101"},
+        {"settings": "ana.json", "direction": "get", "display": SIMULATED_DISPLAY, "name": "mine",
+         "resolution": [1280, 720]},
+    ]
+    prepared = BatchRunner(jobs, runner_dir=str(tmp_path / "runs"), base_dir=str(tmp_path)).jobs
+    assert prepared[0]["name"] == "set-ana-0"
+    assert prepared[0]["settings"] == str(tmp_path / "ana.json")
+    assert prepared[0]["resolution"] == (2560, 1440)
+    assert prepared[0]["workdir"] == str(tmp_path / "runs" / "set-ana-0")
+    assert prepared[1]["name"] == "mine"
+    assert prepared[1]["resolution"] == (1280, 720)
+
+    for broken in ({"settings": "a.json", "direction": "copy", "display": ":1"},
+                   {"direction": "get", "display": ":1"},
+                   {"settings": "a.json", "direction": "get"}):
+        with pytest.raises(ValueError):
+            BatchRunner([broken])
+
+
+def test_shared_files_are_linked_into_each_job(workdir, tmp_path):
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    link_shared_files(str(job_dir))
+    assert os.path.samefile(job_dir / "heroes", workdir / "heroes")
+    # linking again leaves the links alone
+    link_shared_files(str(job_dir))
+
+
+def test_a_simulated_job_runs_from_its_own_directory(workdir, monkeypatch):
+    settings = workdir / "settings.json"
+    data = [{"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": value} for hero_id, value in TARGET.items()]
+    settings.write_text(json.dumps(data))
+
+    get_session_kwargs = runner.get_session_kwargs
+
+    def get_simulated_session_kwargs(job):
+        kwargs, screen = get_session_kwargs(job)
+        fake = FakeOCR(screen, {DEFAULT_SENSITIVITY, *TARGET.values()})
+        monkeypatch.setattr(ocr.OCRWorkerPool, "read_raw", lambda self, img, profile="default": fake.read_raw(img, profile))
+        return kwargs, screen
+
+    monkeypatch.setattr(ocr.OCRWorkerPool, "in_process", property(lambda self: True))
+    monkeypatch.setattr(runner, "get_session_kwargs", get_simulated_session_kwargs)
+    job = BatchRunner(
+        [{"settings": "settings.json", "direction": "set", "display": SIMULATED_DISPLAY, "resolution": [1280, 720]}],
+        runner_dir=str(workdir / "runs"),
+    ).jobs[0]
+    result = run_job(job)
+
+    assert result["ok"], open(result["log"]).read()
+    assert sorted(result["changed"]) == sorted(TARGET)
+    assert result["failed"] == []
+    assert result["mismatches"] == []
+    assert os.path.dirname(result["log"]) == job["workdir"]
+    # the checkpoint of a finished job is removed
+    assert not [name for name in os.listdir(workdir) if "checkpoint" in name]
+
+
+def test_failed_jobs_are_reported_in_order(workdir):
+    jobs = [
+        {"settings": f"missing{i}.json", "direction": "set", "display": SIMULATED_DISPLAY, "resolution": [1280, 720]}
+        for i in range(3)
+    ]
+    results = BatchRunner(jobs, concurrency=2, runner_dir=str(workdir / "runs")).run()
+    assert [result["name"] for result in results] == ["set-missing0-0", "set-missing1-1", "set-missing2-2"]
+    for result in results:
+        assert not result["ok"]
+        assert result["error"].startswith("FileNotFoundError")
+        assert "FileNotFoundError" in open(result["log"]).read()
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from layout import Layout
+from scheduler import VisitScheduler, get_path_length
+
+
+@pytest.mark.parametrize("count", [1, 2, 7, 37])
+def test_every_card_is_visited_exactly_once(count):
+    layout = Layout((2560, 1440))
+    rng = np.random.default_rng(count)
+    (left, top), (right, bottom) = layout.rect("hero_grid")
+    cards = [tuple(point) for point in rng.integers((left, top), (right, bottom), (count, 2))]
+
+    scheduler = VisitScheduler(layout.rect("change_hero"), layout.centre("sensitivity"))
+    order, hubs, travel = scheduler.schedule(cards, (0, 0))
+
+    assert sorted(int(i) for i in order) == list(range(count))
+    assert len(hubs) == count
+    (hub_left, hub_top), (hub_right, hub_bottom) = layout.rect("change_hero")
+    for x, y in hubs:
+        assert hub_left <= x <= hub_right and hub_top <= y <= hub_bottom
+    assert travel > 0
+
+
+def test_no_cards():
+    assert VisitScheduler(((0, 0), (10, 10))).schedule([], (0, 0)) == ([], [], 0.0)
+
+
+def test_path_length():
+    assert get_path_length([(0, 0), (3, 4), (3, 0)]) == 9.0
+    assert get_path_length([(5, 5)]) == 0.0
+
+
+def get_route(cards, start_pos, order, hubs, via=None):
+    """
+    Every position the cursor is moved to on a schedule, in order.
+    """
+    points = [start_pos]
+    for i, hub in zip(order, hubs):
+        points.append(cards[i])
+        if via is not None:
+            points.append(via)
+        points.append(hub)
+    return points
+
+
+def get_cards(count, seed):
+    layout = Layout((2560, 1440))
+    (left, top), (right, bottom) = layout.rect("hero_grid")
+    rng = np.random.default_rng(seed)
+    return layout, [tuple(int(v) for v in point) for point in rng.integers((left, top), (right, bottom), (count, 2))]
+
+
+@pytest.mark.parametrize("via", [False, True])
+def test_estimate_is_the_length_of_the_route(via):
+    layout, cards = get_cards(12, 0)
+    via = layout.centre("sensitivity") if via else None
+    order, hubs, travel = VisitScheduler(layout.rect("change_hero"), via).schedule(cards, (0, 0))
+    assert travel == pytest.approx(get_path_length(get_route(cards, (0, 0), order, hubs, via)))
+
+
+def test_cards_are_visited_in_any_order_when_every_visit_ends_in_the_same_place():
+    layout, cards = get_cards(6, 1)
+    via = layout.centre("sensitivity")
+    scheduler = VisitScheduler(layout.rect("change_hero"), via)
+    order, hubs, travel = scheduler.schedule(cards, (0, 0))
+
+    # only the first card changes the length of the route, the rest keep the order they were given in
+    assert order[1:] == [i for i in range(len(cards)) if i != order[0]]
+    def get_length(route):
+        _, route_hubs, _ = scheduler.finish(np.asarray(cards, dtype=np.float64), np.array(route), 0.0)
+        return get_path_length(get_route(cards, (0, 0), route, route_hubs, via))
+
+    shortest = {}
+    for first in range(len(cards)):
+        rest = [i for i in range(len(cards)) if i != first]
+        shortest[first] = get_length([first] + rest)
+        assert get_length([first] + rest[::-1]) == pytest.approx(shortest[first])
+    assert travel == pytest.approx(min(shortest.values()))
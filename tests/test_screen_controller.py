@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pytest
+
+import main
+from input_backend import RecordingBackend
+from simulator import SimulatedClient
+
+
+class ScriptedCapture:
+    """
+    A capture backend showing a frame which is swapped for another a fixed time after it is armed.
+    """
+
+    def __init__(self, before, after=None, delay=0.0):
+        self.before = before
+        self.after = before if after is None else after
+        self.delay = delay
+        self.changes_at = None
+
+    def arm(self):
+        self.changes_at = time.perf_counter() + self.delay
+
+    def grab(self, area=None):
+        frame = self.before if self.changes_at is None or time.perf_counter() < self.changes_at else self.after
+        if area is None:
+            return frame
+        left, top, width, height = area
+        return frame[top:top + height, left:left + width]
+
+    def close(self):
+        pass
+
+
+def make_controller(capture, screen=None):
+    layout = screen.layout if screen is not None else main.Layout((64, 64))
+    return main.ScreenController(False, layout=layout, backend=RecordingBackend("turbo", screen=screen), capture=capture)
+
+
+AREA = (0, 0, 64, 64)
+DARK = np.zeros((64, 64, 3), dtype=np.uint8)
+LIGHT = np.full((64, 64, 3), 200, dtype=np.uint8)
+
+
+def test_wait_until_changed_waits_for_the_new_frame():
+    capture = ScriptedCapture(DARK, LIGHT, delay=0.1)
+    ctrl = make_controller(capture)
+    reference = ctrl.get_frame_signature(AREA)
+    capture.arm()
+    start = time.perf_counter()
+    assert ctrl.wait_until_changed(AREA, reference)
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_wait_until_changed_times_out_when_nothing_changes():
+    ctrl = make_controller(ScriptedCapture(DARK))
+    assert not ctrl.wait_until_changed(AREA, ctrl.get_frame_signature(AREA), timeout=0.1)
+
+
+def test_a_stable_frame_before_the_change_is_not_mistaken_for_the_result():
+    capture = ScriptedCapture(DARK, LIGHT, delay=0.1)
+    ctrl = make_controller(capture)
+    reference = ctrl.get_frame_signature(AREA)
+    capture.arm()
+    # the old frame is stable straight away, only waiting for the change sees the new one
+    assert ctrl.wait_until_stable(AREA)
+    assert np.array_equal(ctrl.get_cropped_screenshot(AREA, False), DARK)
+    assert ctrl.wait_until_redrawn(AREA, reference)
+    assert np.array_equal(ctrl.get_cropped_screenshot(AREA, False), LIGHT)
+
+
+def test_wait_until_stable_times_out_while_the_area_keeps_changing():
+    class Flicker(ScriptedCapture):
+        grabs = 0
+
+        def grab(self, area=None):
+            self.grabs += 1
+            return DARK if self.grabs % 2 else LIGHT
+
+    ctrl = make_controller(Flicker(DARK))
+    assert not ctrl.wait_until_stable(AREA, timeout=0.2)
+
+
+@pytest.fixture
+def screen(workdir):
+    return SimulatedClient((1280, 720), heroes=["ana"], latency=0.1, seed=0)
+
+
+def test_click_waits_for_the_next_page(screen):
+    ctrl = make_controller(screen, screen)
+    assert ctrl.click_in_area(screen.layout.rect("options_btn"), screen.layout.area("controls_btn"))
+    # the options page is on screen, not just chosen
+    assert screen.get_visible_frame(time.perf_counter()) is screen.frames["options"]
+
+
+def test_click_reports_when_nothing_is_redrawn(screen, monkeypatch):
+    monkeypatch.setattr(main, "WAIT_TIMEOUT", 0.1)
+    monkeypatch.setattr(main.ScreenController.wait_until_redrawn, "__defaults__", (0.1,))
+    ctrl = make_controller(screen, screen)
+    # the menu has nothing at the safe edge to click
+    assert not ctrl.click_on_pos(screen.layout.point("safe_edge"), screen.layout.area("controls_btn"))
+
+
+def test_press_waits_for_the_field_to_be_redrawn(screen):
+    ctrl = make_controller(screen, screen)
+    screen.page = ("panel", "ana")
+    ctrl.click_on_pos(screen.layout.centre("sensitivity"))
+    ctrl.input.key_down("ctrl")
+    ctrl.input.press("a")
+    ctrl.input.key_up("ctrl")
+    ctrl.input.write("7.5")
+    assert ctrl.press("enter", screen.layout.area("sensitivity"))
+    assert screen.field is None
+    assert screen.get_visible_frame(time.perf_counter()) is screen.render_panel("ana", "7.50", False)
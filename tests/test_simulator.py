@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+
+import main
+import ocr
+from capture import crop
+from hero_registry import HEROES
+from input_backend import RecordingBackend
+from simulator import DEFAULT_SENSITIVITY, SimulatedClient
+from utils import preprocess
+
+HEROES_ON_GRID = ["ana", "ashe", "genji", "mercy", "reinhardt", "widowmaker"]
+TARGET = {"ana": "3.45", "ashe": "12.00", "genji": "5.00", "mercy": "0.50", "reinhardt": "7.77", "widowmaker": "2.10"}
+
+
+class FakeOCR:
+    """
+    Stands in for tesseract, which is not needed to test a session. Every crop the simulator can show
+    is rendered up front, and a crop is read as the text it is pixel for pixel identical to.
+    """
+
+    def __init__(self, screen, values):
+        self.references = {"sensitivity": [], "hero_name": []}
+        sensitivity, name = screen.layout.area("sensitivity"), screen.layout.area("hero_name")
+        for hero_id in screen.cards:
+            panel = screen.render_panel(hero_id, DEFAULT_SENSITIVITY, False)
+            self.references["hero_name"].append((HEROES[hero_id]["name"], self.to_key(crop(panel, name))))
+        for value in values:
+            for focused in (False, True):
+                panel = screen.render_panel(next(iter(screen.cards)), value, focused)
+                self.references["sensitivity"].append((value, self.to_key(preprocess(crop(panel, sensitivity)))))
+
+    @staticmethod
+    def to_key(img):
+        return np.asarray(ocr.to_ocr_image(img)).tobytes()
+
+    def read_raw(self, img, profile="default"):
+        key = self.to_key(img)
+        for text, reference in self.references.get(profile, []):
+            if reference == key:
+                # tesseract ends what it reads with a newline
+                return text + "\n"
+        return "\n"
+
+
+@pytest.fixture
+def make_screen(workdir, monkeypatch):
+    """
+    Make a simulated client with OCR stubbed to read it.
+    """
+    def make_screen(**kwargs):
+        screen = SimulatedClient((1280, 720), heroes=HEROES_ON_GRID, seed=0, **kwargs)
+        fake = FakeOCR(screen, {DEFAULT_SENSITIVITY, *TARGET.values()})
+        monkeypatch.setattr(ocr.OCRWorkerPool, "in_process", property(lambda self: True))
+        monkeypatch.setattr(ocr.OCRWorkerPool, "read_raw", lambda self, img, profile="default": fake.read_raw(img, profile))
+        return screen
+    return make_screen
+
+
+@pytest.fixture
+def screen(make_screen):
+    return make_screen()
+
+
+def get_session_kwargs(screen):
+    screen.reset()
+    return {"layout": screen.layout, "backend": RecordingBackend("turbo", screen=screen), "capture": screen}
+
+
+def test_set_then_get_round_trip(screen):
+    data = [{"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": value} for hero_id, value in TARGET.items()]
+
+    summary = main.set_sensitivity_data(data, False, **get_session_kwargs(screen))
+    assert sorted(summary["changed"]) == sorted(TARGET)
+    assert summary["failed"] == []
+    assert screen.check(data) == []
+
+    read = main.get_sensitivity_data(False, **get_session_kwargs(screen))
+    assert {record["id"]: record["sensitivity"] for record in read} == TARGET
+
+
+def test_diff_only_visits_changed_heroes(screen):
+    data = [{"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": value} for hero_id, value in TARGET.items()]
+
+    summary = main.set_sensitivity_data(data, False, diff=True, **get_session_kwargs(screen))
+    # genji already has the default sensitivity
+    assert summary["skipped"] == ["genji"]
+    assert sorted(summary["changed"]) == sorted(hero_id for hero_id in TARGET if hero_id != "genji")
+    assert screen.check(data) == []
+
+
+def test_values_are_confirmed_once_redrawn(make_screen):
+    # every change takes a while to reach the screen, so a read straight after enter sees the old value
+    screen = make_screen(latency=0.1)
+    data = [{"id": hero_id, "name": HEROES[hero_id]["name"], "sensitivity": value} for hero_id, value in TARGET.items()]
+
+    summary = main.set_sensitivity_data(data, False, **get_session_kwargs(screen))
+    assert summary["failed"] == []
+    assert sorted(summary["changed"]) == sorted(TARGET)
+    assert screen.check(data) == []
+
+
+def test_snapshot_keeps_the_heroes_that_were_not_set(screen, tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    kept = {"id": "pharah", "name": "PHARAH", "sensitivity": "9.00"}
+    snapshot.write_text(json.dumps([kept, {"id": "ana", "name": "ANA", "sensitivity": "1.00"}]))
+    data = [{"id": "ana", "name": "ANA", "sensitivity": TARGET["ana"]}]
+
+    summary = main.set_sensitivity_data(data, False, snapshot=str(snapshot), **get_session_kwargs(screen))
+    assert summary["changed"] == ["ana"]
+    saved = {record["id"]: record["sensitivity"] for record in json.loads(snapshot.read_text())}
+    assert saved == {"pharah": "9.00", "ana": TARGET["ana"]}
@@ -0,0 +1,73 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from locator import load_templates
+from template_bundle import BUNDLE_ALIGNMENT, build_bundle, hash_templates, is_bundle_current, load_bundle, read_bundle_index
+
+
+@pytest.fixture
+def heroes_dir(tmp_path):
+    heroes_dir = tmp_path / "heroes"
+    heroes_dir.mkdir()
+    rng = np.random.default_rng(0)
+    # odd sizes, so the templates do not end on the alignment by chance
+    for name, shape in (("ana", (37, 51)), ("ashe", (40, 33)), ("zenyatta", (13, 7))):
+        cv2.imwrite(str(heroes_dir / f"{name}.png"), rng.integers(0, 256, (*shape, 3), dtype=np.uint8))
+    (heroes_dir / "notes.txt").write_text("not a template")
+    return str(heroes_dir)
+
+
+def touch_later(path, bundle_path):
+    mtime = os.path.getmtime(bundle_path) + 10
+    os.utime(path, (mtime, mtime))
+
+
+def test_bundled_templates_are_the_decoded_templates(tmp_path, heroes_dir):
+    bundle_path = str(tmp_path / "heroes.bundle")
+    assert build_bundle(heroes_dir, bundle_path) == 3
+
+    templates, templates_hash = load_bundle(bundle_path)
+    assert templates_hash == hash_templates(heroes_dir)
+    assert sorted(templates) == ["ana.png", "ashe.png", "zenyatta.png"]
+    for name, template in templates.items():
+        assert np.array_equal(template, cv2.imread(os.path.join(heroes_dir, name), cv2.IMREAD_GRAYSCALE))
+        assert not template.flags.writeable
+    for entry in read_bundle_index(bundle_path)["templates"]:
+        assert entry["offset"] % BUNDLE_ALIGNMENT == 0
+
+
+def test_a_bundle_is_only_used_while_it_is_current(tmp_path, heroes_dir):
+    bundle_path = str(tmp_path / "heroes.bundle")
+    build_bundle(heroes_dir, bundle_path)
+    assert is_bundle_current(bundle_path, heroes_dir)
+    bundled, bundled_hash = load_templates(heroes_dir, bundle_path)
+    assert bundled_hash is not None
+    assert isinstance(bundled[os.path.join(heroes_dir, "ana.png")], np.memmap)
+
+    touch_later(os.path.join(heroes_dir, "ana.png"), bundle_path)
+    assert not is_bundle_current(bundle_path, heroes_dir)
+    decoded, decoded_hash = load_templates(heroes_dir, bundle_path)
+    assert decoded_hash is None
+    assert decoded.keys() == bundled.keys()
+    for path, template in decoded.items():
+        assert np.array_equal(template, bundled[path])
+
+
+def test_a_new_template_makes_the_bundle_stale(tmp_path, heroes_dir):
+    bundle_path = str(tmp_path / "heroes.bundle")
+    build_bundle(heroes_dir, bundle_path)
+    cv2.imwrite(os.path.join(heroes_dir, "mercy.png"), np.zeros((10, 10, 3), dtype=np.uint8))
+    assert not is_bundle_current(bundle_path, heroes_dir)
+
+
+def test_files_which_are_not_bundles_are_refused(tmp_path, heroes_dir):
+    path = tmp_path / "heroes.bundle"
+    path.write_bytes(b"PNG not a bundle")
+    assert read_bundle_index(str(path)) is None
+    assert not is_bundle_current(str(path), heroes_dir)
+    assert read_bundle_index(str(tmp_path / "missing.bundle")) is None
+    with pytest.raises(ValueError):
+        load_bundle(str(path))
@@ -0,0 +1,71 @@
+import concurrent.futures
+import json
+
+import pytest
+
+from tracing import NULL_SPAN, TRACER, carry_context, span, trace_to, traced, visit
+
+
+@traced("work")
+def work(value):
+    with span("inner", value=value):
+        return value * 2
+
+
+def load_events(path):
+    with open(path) as fn:
+        trace = json.load(fn)
+    return [event for event in trace["traceEvents"] if event["ph"] == "X"], trace
+
+
+def test_nothing_is_recorded_without_tracing():
+    assert not TRACER.enabled
+    assert span("anything") is NULL_SPAN
+    assert work(2) == 4
+    with trace_to(None):
+        work(1)
+    assert not TRACER.enabled
+
+
+def test_spans_are_exported_as_chrome_trace_events(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace_to(str(path)):
+        work(3)
+    assert not TRACER.enabled
+
+    events, trace = load_events(path)
+    assert [event["name"] for event in events] == ["inner", "work"]
+    inner, outer = events
+    assert inner["args"] == {"value": 3}
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert {event["name"] for event in trace["traceEvents"] if event["ph"] == "M"} == {"thread_name"}
+
+
+def test_the_trace_is_exported_when_the_run_fails(tmp_path):
+    path = tmp_path / "trace.json"
+    with pytest.raises(ZeroDivisionError):
+        with trace_to(str(path)):
+            with span("failing"):
+                1 / 0
+    events, _ = load_events(path)
+    assert [event["name"] for event in events] == ["failing"]
+
+
+def test_work_handed_to_another_thread_keeps_its_hero(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace_to(str(path)):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            futures = []
+            for hero in ("ana", "ashe"):
+                with visit(hero):
+                    futures.append(executor.submit(carry_context(work), 1))
+                    # submitted without its context, it is not tagged with the hero
+                    futures.append(executor.submit(work, 1))
+            assert [future.result() for future in futures] == [2, 2, 2, 2]
+
+    events, _ = load_events(path)
+    heroes = [event["args"].get("hero") for event in events if event["name"] == "work"]
+    assert sorted(heroes, key=str) == [None, None, "ana", "ashe"]
+    visits = [event for event in events if event["name"] == "visit"]
+    assert [event["args"]["hero"] for event in visits] == ["ana", "ashe"]
+    assert len({event["tid"] for event in events}) == 2
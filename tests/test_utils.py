@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks import legacy_preprocess
+from utils import PreprocessBuffers, get_frame_difference, get_frame_signature, preprocess, to_grayscale
+
+
+def get_frames():
+    rng = np.random.default_rng(0)
+    # mostly near white, where the colour threshold decides each pixel
+    yield rng.integers(150, 256, (30, 100, 3), dtype=np.uint8)
+    yield rng.integers(0, 256, (45, 315, 3), dtype=np.uint8)
+    text = np.full((30, 100, 3), 20, dtype=np.uint8)
+    text[10:20, 10:90] = 255
+    text[12:18, 30:40] = (230, 240, 250)
+    yield text
+
+
+@pytest.mark.parametrize("frame", list(get_frames()))
+def test_preprocess_matches_the_legacy_output(frame):
+    expected = np.asarray(legacy_preprocess(Image.fromarray(frame)))[:, :, 0]
+    assert np.array_equal(np.asarray(preprocess(Image.fromarray(frame))), expected)
+    assert np.array_equal(preprocess(frame, as_array=True), expected)
+
+
+def test_preprocess_reuses_buffers():
+    buffers = PreprocessBuffers()
+    for frame in get_frames():
+        expected = np.asarray(legacy_preprocess(Image.fromarray(frame)))[:, :, 0]
+        assert np.array_equal(np.asarray(preprocess(frame, buffers=buffers, as_array=True)), expected)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+def test_every_image_is_converted_to_the_same_grayscale(mode):
+    rgb = np.random.default_rng(0).integers(0, 256, (12, 20, 3), dtype=np.uint8)
+    expected = to_grayscale(rgb)
+    img = Image.fromarray(rgb).convert(mode)
+    assert to_grayscale(img).shape == (12, 20)
+    assert to_grayscale(img).dtype == np.uint8
+    if mode != "L":
+        assert np.abs(to_grayscale(np.asarray(img)).astype(int) - expected).max() <= 1
+    assert np.abs(to_grayscale(img).astype(int) - expected).max() <= 1
+
+
+def test_frame_signatures_of_a_frame_match_whatever_its_format():
+    rgb = np.random.default_rng(1).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    signature = get_frame_signature(rgb)
+    assert signature.shape == (16, 16)
+    assert get_frame_difference(signature, get_frame_signature(Image.fromarray(rgb))) < 1.0
+    assert get_frame_difference(signature, get_frame_signature(to_grayscale(rgb))) == 0.0
@@ -0,0 +1,208 @@
+"""
+Lightweight tracing of where a run spends its time, exported as Chrome trace events.
+
+Open the exported file in chrome://tracing or https://ui.perfetto.dev. Every span records the thread it ran on
+and the hero it was recorded for. While tracing is disabled, spans do nothing but check a flag.
+
+The hero is held in a context variable, so work handed to another thread keeps the hero it was started for
+when it is wrapped with carry_context.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+# the hero being visited, or the hero work running on another thread was started for
+current_hero = contextvars.ContextVar("current_hero", default=None)
+
+
+class NullSpan:
+    """The span handed out while tracing is disabled, it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        """
+        Initialize a Tracer object. Tracing starts disabled.
+        """
+        self.enabled = False
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        """
+        Start recording spans, discarding any recorded before.
+        """
+        self.events = []
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording spans.
+        """
+        self.enabled = False
+
+    def span(self, name, **args):
+        """
+        Get a context manager which records the time spent inside it.
+
+        :param name: The name of the span.
+        :type name: str
+        :param args: Extra values to record with the span.
+        :return: The span.
+        :rtype: Span
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def add(self, name, start, end, args):
+        """
+        Record a finished span as a complete ("X") trace event.
+        """
+        hero = current_hero.get()
+        if hero is not None:
+            args = dict(args, hero=hero)
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def export(self, path):
+        """
+        Write the recorded spans as Chrome trace event JSON, naming each thread.
+
+        :param path: The path of the trace file.
+        :type path: str
+        :return: None
+        """
+        with self.lock:
+            events = list(self.events)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": names.get(tid, str(tid))}}
+            for tid in {event["tid"] for event in events}
+        ]
+        with open(path, "w") as fn:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, fn)
+
+
+TRACER = Tracer()
+
+
+def span(name, **args):
+    """
+    Get a span from the shared tracer, see Tracer.span.
+    """
+    return TRACER.span(name, **args)
+
+
+def traced(name):
+    """
+    Decorate a function to record a span named after it every time it is called.
+
+    :param name: The name of the span.
+    :type name: str
+    :return: The decorator.
+    :rtype: callable
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            with Span(TRACER, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def trace_to(path):
+    """
+    Trace the block and export the trace once it exits, even when it raises.
+
+    :param path: The path to export the trace to, or None to not trace.
+    :type path: str
+    """
+    if not path:
+        yield
+        return
+    TRACER.enable()
+    try:
+        yield
+    finally:
+        TRACER.disable()
+        TRACER.export(path)
+
+
+@contextlib.contextmanager
+def visit(hero):
+    """
+    Record a span around the visit of a hero, tagging every span recorded during it with the hero.
+
+    :param hero: The id of the hero.
+    :type hero: str
+    """
+    token = current_hero.set(hero)
+    try:
+        with TRACER.span("visit"):
+            yield
+    finally:
+        current_hero.reset(token)
+
+
+def carry_context(fn):
+    """
+    Wrap a function to run in the context it was wrapped in, for handing it to another thread.
+    Spans it records are then tagged with the hero being visited when it was handed over,
+    rather than whichever hero is visited by the time it runs.
+
+    :param fn: The function.
+    :type fn: callable
+    :return: The wrapped function, which can be called from several threads at once.
+    :rtype: callable
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # a context can only be entered by one thread at a time, so every call runs in its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
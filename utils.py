@@ -1,6 +1,7 @@
 import random
 import cv2
 import ctypes
+import functools
 from PIL import Image
 import numpy as np
 import re
@@ -10,37 +11,86 @@ SET_WIDTH = 2560
 SET_HEIGHT = 1440
 
 
-def preprocess(img):
-    img = img.convert("RGB")
+# text is white, matching pixels within COLOUR_THRESHOLD of these colours are kept
+COLOUR_CODES = ((255, 255, 255),)
+COLOUR_THRESHOLD = 60
 
-    # Convert the image to a NumPy array
-    img_np = np.array(img)
 
-    # Define the color codes to filter for
-    color_codes = [
-        (255, 255, 255),
-    ]
+class PreprocessBuffers:
+    """Working memory for preprocess, reused across calls on images of the same size.
 
-    # Define the color similarity threshold
-    threshold = 60  # Adjust this value to control the leeway in color matching
+    The buffers are (re)allocated whenever the image size or number of colours changes.
+    A single set of buffers must not be shared between threads.
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.diff = None
+        self.distance = None
+        self.nearest = None
+        self.out = None
+
+    def get(self, height, width, colours):
+        """
+        Get the buffers for an image, allocating them if they do not fit.
+
+        Args:
+        height (int): The height of the image.
+        width (int): The width of the image.
+        colours (int): The number of colours being filtered for.
+
+        Returns:
+        PreprocessBuffers: The buffers, sized for the image.
+        """
+        shape = (height, width, colours)
+        if self.shape != shape:
+            self.shape = shape
+            self.diff = np.empty((height, width, colours, 3), dtype=np.int16)
+            self.distance = np.empty((height, width, colours), dtype=np.int16)
+            self.nearest = np.empty((height, width), dtype=np.int16)
+            self.out = np.empty((height, width), dtype=np.uint8)
+        return self
+
+
+def preprocess(img, colour_codes=COLOUR_CODES, threshold=COLOUR_THRESHOLD, buffers=None, as_array=False):
+    """
+    Binarize an image for OCR, keeping only the pixels close to the given colours.
+
+    The colour distance of each pixel to every colour is computed in a single broadcast in int16,
+    so it cannot wrap around, and written straight into a single channel uint8 output.
+    Matching pixels become black (0) and everything else white (255).
 
-    # Filter for colors in the screenshot using NumPy operations
-    filtered_mask = np.zeros_like(img_np[:, :, 0], dtype=bool)
-    for color_code in color_codes:
-        color_code_np = np.array(color_code)
-        color_difference = np.sum(np.abs(img_np[:, :, :3] - color_code_np), axis=2)
-        matches = color_difference <= threshold
-        filtered_mask |= matches
+    Args:
+    img (PIL.Image or numpy.ndarray): The image to binarize, in RGB or RGBA.
+    colour_codes (tuple): The (r, g, b) colours to keep.
+    threshold (int): The largest sum of absolute channel differences for a pixel to match a colour.
+    buffers (PreprocessBuffers): Optional working memory to reuse across calls.
+    as_array (bool): Whether to return the output as a NumPy array rather than a PIL image.
+                     When buffers are given, the array is only valid until they are next used.
+
+    Returns:
+    PIL.Image or numpy.ndarray: The single channel binarized image.
+    """
+    rgb = img if isinstance(img, np.ndarray) else np.asarray(img.convert("RGB"))
+    rgb = rgb[:, :, :3]
+    colours = np.asarray(colour_codes, dtype=np.int16).reshape(-1, 3)
+    height, width = rgb.shape[:2]
 
-    # Expand the filtered mask to have the same shape as the screenshot image array
-    filtered_mask_expanded = np.expand_dims(filtered_mask, axis=2)
-    filtered_mask_expanded = np.repeat(filtered_mask_expanded, 3, axis=2)
+    bufs = (buffers or PreprocessBuffers()).get(height, width, len(colours))
+    np.subtract(rgb[:, :, None, :], colours, out=bufs.diff, dtype=np.int16)
+    np.abs(bufs.diff, out=bufs.diff)
+    # adding the channels explicitly is much faster than reducing over the short last axis
+    np.add(bufs.diff[..., 0], bufs.diff[..., 1], out=bufs.distance)
+    np.add(bufs.distance, bufs.diff[..., 2], out=bufs.distance)
+    np.min(bufs.distance, axis=2, out=bufs.nearest)
 
-    # Create a filtered image using the filtered mask
-    filtered_image_np = np.where(filtered_mask_expanded, img_np, 0)
-    thres_img = cv2.threshold(filtered_image_np, 127, 255, cv2.THRESH_BINARY_INV)[1]
+    # text is black on a white background, the same as the inverted threshold this used to apply
+    np.greater(bufs.nearest, threshold, out=bufs.out)
+    np.multiply(bufs.out, 255, out=bufs.out)
 
-    return Image.fromarray(thres_img)
+    if as_array:
+        return bufs.out
+    return Image.fromarray(bufs.out.copy() if buffers else bufs.out)
 
 
 def get_left_top_width_height(pos):
@@ -67,38 +117,50 @@ def get_left_top_width_height(pos):
     return (l_x, l_y, r_x - l_x, r_y - l_y)
 
 
+@functools.lru_cache(maxsize=None)
 def get_monitor_resolution():
     """
     Returns the resolution of the primary monitor in pixels as a tuple (width, height).
-    This function uses the `GetSystemMetrics()` function from the Windows user32.dll library,
-    so it is only compatible with Windows operating systems.
+    On Windows this uses the `GetSystemMetrics()` function from the user32.dll library,
+    elsewhere pyautogui asks the display server (Xlib on X11, Quartz on macOS).
+    The resolution is looked up once and cached for the rest of the session.
+    Without a display, the resolution the UI positions were recorded at is assumed.
 
     Returns:
     - tuple: A tuple of integers representing the width and height of the primary monitor's resolution.
     """
-    user32 = ctypes.windll.user32
-    return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+    if hasattr(ctypes, "windll"):
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
 
+    try:
+        import pyautogui
+    except Exception:
+        # importing pyautogui fails when there is no display to connect to
+        return SET_WIDTH, SET_HEIGHT
+    width, height = pyautogui.size()
+    return width, height
 
-def get_scalars():
+
+def get_scalars(resolution=None):
     """
-    Returns the scaling factors to fit the desired width and height
-    (SET_WIDTH and SET_HEIGHT) into the user's monitor resolution.
+    Returns the scaling factors from the resolution the UI positions were recorded at
+    (SET_WIDTH and SET_HEIGHT) to the user's monitor resolution.
+
+    This used to return the inverse factors for monitors larger than the recorded resolution,
+    shrinking positions when they should have grown.
+
+    Args:
+    - resolution (tuple): The (width, height) to scale to. Defaults to the user's monitor resolution.
 
     Returns:
     - w_scalar (float): The scaling factor for the width dimension.
     - h_scalar (float): The scaling factor for the height dimension.
     """
-    u_width, u_height = get_monitor_resolution()
+    u_width, u_height = resolution or get_monitor_resolution()
 
-    w_scalar = SET_WIDTH / u_width
-    h_scalar = SET_HEIGHT / u_height
-
-    if u_width < SET_WIDTH:
-        w_scalar = u_width / SET_WIDTH
-
-    if u_height < SET_HEIGHT:
-        h_scalar = u_height / SET_HEIGHT
+    w_scalar = u_width / SET_WIDTH
+    h_scalar = u_height / SET_HEIGHT
 
     return w_scalar, h_scalar
 
@@ -161,6 +223,26 @@ def clean_string(str):
     return res[0].strip("\n") if len(res) else ""
 
 
+def get_sensitivity_value(text):
+    """
+    Parse a sensitivity as shown in the settings, so values can be compared regardless of formatting.
+
+    Args:
+        text (str): The sensitivity, as saved or read by OCR.
+
+    Returns:
+        float: The sensitivity rounded to two decimal places, or None if it is not a number.
+
+    Example:
+    >>> get_sensitivity_value("3.50") == get_sensitivity_value("3.5")
+    True
+    """
+    try:
+        return round(float(text), 2)
+    except (TypeError, ValueError):
+        return None
+
+
 def get_pos_in_area(area):
     """
     Generate a random position within the given area.
@@ -210,3 +292,95 @@ def get_distance(pos1, pos2):
     return math.sqrt(((x1 - x2) ** 2) + ((y1 - y2) ** 2))
 
 
+def to_grayscale(img):
+    """Convert a screenshot, crop or template to a single channel uint8 array.
+
+    Args:
+        img (PIL.Image or numpy.ndarray): The image, in RGB, RGBA or grayscale.
+
+    Returns:
+        numpy.ndarray: A contiguous 2D uint8 array.
+    """
+    if not isinstance(img, np.ndarray):
+        return np.ascontiguousarray(np.asarray(img.convert("L")))
+    if img.ndim == 2:
+        return np.ascontiguousarray(img, dtype=np.uint8)
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+def crop_to_text(img):
+    """Crop an image of light text on a dark background to the bounding box of the text,
+    so the same text gives the same crop wherever it is drawn.
+
+    Args:
+        img (PIL.Image or numpy.ndarray): The image.
+
+    Returns:
+        numpy.ndarray: The grayscale crop, or the whole image if no text stands out from the background.
+    """
+    img = to_grayscale(img)
+    _, mask = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ys, xs = np.nonzero(mask)
+    if not len(xs) or len(xs) == mask.size:
+        return img
+    return img[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+
+def get_text_thumbnail(img, size=(32, 8)):
+    """Shrink the text of an image down to a small grayscale thumbnail which keeps the shape of the text.
+    The text is cropped to its bounding box first, so where it is drawn and the resolution do not matter.
+
+    Args:
+        img (PIL.Image or numpy.ndarray): The image of light text on a dark background.
+        size (tuple): The (width, height) of the thumbnail.
+
+    Returns:
+        numpy.ndarray: The thumbnail as uint8.
+    """
+    return cv2.resize(crop_to_text(img), size, interpolation=cv2.INTER_AREA)
+
+
+def get_correlation(a, b):
+    """Calculate the normalised correlation of two images of the same size, which ignores brightness and contrast.
+
+    Args:
+        a (numpy.ndarray): The first image.
+        b (numpy.ndarray): The second image.
+
+    Returns:
+        float: The correlation between -1 and 1, or 0 if either image is blank.
+    """
+    a = a.astype(np.float32).ravel()
+    b = b.astype(np.float32).ravel()
+    a -= a.mean()
+    b -= b.mean()
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a @ b / norm) if norm else 0.0
+
+
+def get_frame_signature(img, size=(16, 16)):
+    """Shrink a frame down to a tiny grayscale thumbnail, cheap enough to compare on every poll.
+
+    Args:
+        img (PIL.Image or numpy.ndarray): The frame.
+        size (tuple): The (width, height) of the thumbnail.
+
+    Returns:
+        numpy.ndarray: The thumbnail as float32.
+    """
+    return cv2.resize(to_grayscale(img), size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def get_frame_difference(signature1, signature2):
+    """Get the mean absolute difference between two frame signatures.
+
+    Args:
+        signature1 (numpy.ndarray): The first signature.
+        signature2 (numpy.ndarray): The second signature.
+
+    Returns:
+        float: The mean difference in grey levels, from 0 to 255.
+    """
+    return float(np.abs(signature1 - signature2).mean())